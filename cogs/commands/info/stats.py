@@ -6,7 +6,6 @@ from math import floor
 
 import discord
 import humanize
-import psutil
 from asyncio import sleep
 import cogs.utils.context as context
 import cogs.utils.permission_checks as permissions
@@ -76,6 +75,7 @@ class Stats(commands.Cog):
 
         """
 
+        import psutil
         process = psutil.Process(os.getpid())
         diff = datetime.datetime.now() - self.start_time
         diff = humanize.naturaldelta(diff)
@@ -88,6 +88,13 @@ class Stats(commands.Cog):
         embed.add_field(name="Memory Usage",
                         value=f"{floor(process.memory_info().rss/1000/1000)} MB")
         embed.add_field(name="Python Version", value=platform.python_version())
+        profile = self.bot.cache_profile
+        embed.add_field(name="Cache Profile", value=profile.name)
+        if profile.ready_after is not None:
+            startup = f"Ready in {profile.ready_after:.1f}s"
+            if profile.chunked_after is not None:
+                startup += f"\nMembers cached in {profile.chunked_after:.1f}s"
+            embed.add_field(name="Startup", value=startup)
 
         await ctx.message.reply(embed=embed)
 
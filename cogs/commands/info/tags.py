@@ -1,4 +1,3 @@
-import aiohttp
 import traceback
 from io import BytesIO
 
@@ -7,17 +6,22 @@ from data.tag import Tag
 import datetime
 import cogs.utils.permission_checks as permissions
 import cogs.utils.context as context
+from cogs.utils.pagination import ListPageSource, MenuPages
 from discord.ext import commands
-from discord.ext import menus
+from discord.ext import tasks
 
+# Discord's upload limit, tag images are sent as attachments
+MAX_IMAGE_SIZE = 8 * 1024 * 1024
 
-class TagsSource(menus.GroupByPageSource):
-    async def format_page(self, menu, entry):
+
+class TagsSource(ListPageSource):
+    async def format_page(self, menu, entries):
         embed = discord.Embed(
             title=f'All tags', color=discord.Color.blurple())
-        for tag in entry.items:
+        for tag in entries:
             desc = f"Added by: {tag.added_by_tag}\nUsed {tag.use_count} times"
-            if tag.image.read() is not None:
+            # only checks the GridFS ID, so browsing the list never reads any images
+            if tag.image:
                 desc += "\nHas image attachment"
             embed.add_field(name=tag.name, value=desc)
         embed.set_footer(
@@ -25,15 +29,6 @@ class TagsSource(menus.GroupByPageSource):
         return embed
 
 
-class MenuPages(menus.MenuPages):
-    async def update(self, payload):
-        if self._can_remove_reactions:
-            if payload.event_type == 'REACTION_ADD':
-                await self.message.remove_reaction(payload.emoji, payload.member)
-            elif payload.event_type == 'REACTION_REMOVE':
-                return
-        await super().update(payload)
-
 class CustomBucketType(commands.BucketType):
     custom = 7
     
@@ -74,6 +69,18 @@ class Tags(commands.Cog):
         self.bot = bot
         
         self.tag_cooldown = CustomCooldownMapping.from_cooldown(1, 5, CustomBucketType.custom)
+        self.flush_tag_uses.start()
+
+    def cog_unload(self):
+        self.flush_tag_uses.cancel()
+
+    @tasks.loop(seconds=60)
+    async def flush_tag_uses(self):
+        await self.bot.settings.flush_tag_uses()
+
+    @flush_tag_uses.after_loop
+    async def after_flush_tag_uses(self):
+        await self.bot.settings.flush_tag_uses()
 
     @commands.guild_only()
     @permissions.genius_or_submod_and_up()
@@ -110,37 +117,39 @@ class Tags(commands.Cog):
             if _type is None:
                 raise commands.BadArgument("Attached file was not an image.")
             tag.image.put(image, content_type=_type)
+            ctx.settings.tag_images.put(tag.image.grid_id, image, _type)
 
         await ctx.settings.add_tag(tag)
         
-        file = tag.image.read()
-        if file is not None:
-            file = discord.File(BytesIO(file), filename="image.gif" if tag.image.content_type == "image/gif" else "image.png")
-
-        await ctx.message.reply(f"Added new tag!", file=file, embed=await self.tag_embed(tag), delete_after=10)
+        file, content_type = await self.tag_image(tag)
+        await ctx.message.reply(f"Added new tag!", file=file, embed=await self.tag_embed(tag, content_type), delete_after=10)
         await ctx.message.delete(delay=10)
     
     async def do_content_parsing(self, url):
-        async with aiohttp.ClientSession() as session:
-            async with session.head(url) as resp:
-                if resp.status != 200:
-                    return None, None
-                elif resp.headers["CONTENT-TYPE"] not in ["image/png", "image/jpeg", "image/gif", "image/webp"]:
-                    return None, None
-                else:
-                    async with session.get(url) as resp2:
-                        if resp2.status != 200:
-                            return None
-                        return await resp2.read(), resp2.headers['CONTENT-TYPE']
-                        
-    async def tag_embed(self, tag):
+        return await self.bot.image_ingest.fetch(url, MAX_IMAGE_SIZE)
+
+    async def tag_image(self, tag):
+        """Get a tag's image as a file to upload, from the image cache if possible
+
+        Returns
+        -------
+        tuple
+            (discord.File, content type), or (None, None) if the tag has no image
+        """
+
+        image, content_type = await self.bot.settings.tag_images.read(tag.image)
+        if image is None:
+            return None, None
+        return discord.File(BytesIO(image), filename="image.gif" if content_type == "image/gif" else "image.png"), content_type
+
+    async def tag_embed(self, tag, content_type=None):
         embed = discord.Embed(title=tag.name)
         embed.description = tag.content
         embed.timestamp = tag.added_date
         embed.color = discord.Color.blue()
 
-        if tag.image.read() is not None:
-            embed.set_image(url="attachment://image.gif" if tag.image.content_type == "image/gif" else "attachment://image.png")
+        if content_type is not None:
+            embed.set_image(url="attachment://image.gif" if content_type == "image/gif" else "attachment://image.png")
         embed.set_footer(text=f"Added by {tag.added_by_tag} | Used {tag.use_count} times")
         return embed
 
@@ -151,13 +160,13 @@ class Tags(commands.Cog):
         """List all tags
         """
 
-        tags = sorted(ctx.settings.guild().tags, key=lambda tag: tag.name)
+        # the index is already sorted by name
+        tags = list(ctx.settings.tags().values())
 
         if len(tags) == 0:
             raise commands.BadArgument("There are no tags defined.")
         
-        menus = MenuPages(source=TagsSource(
-            tags, key=lambda t: 1, per_page=12), clear_reactions_after=True)
+        menus = MenuPages(source=TagsSource(tags, per_page=12), clear_reactions_after=True)
 
         await menus.start(ctx)
 
@@ -204,7 +213,7 @@ class Tags(commands.Cog):
         """
 
         name = name.lower()
-        tag = await ctx.settings.get_tag(name)
+        tag = await ctx.settings.use_tag(name)
         
         if tag is None:
             raise commands.BadArgument("That tag does not exist.")
@@ -214,11 +223,8 @@ class Tags(commands.Cog):
         if bucket.update_rate_limit(current) and not (ctx.permissions.hasAtLeast(ctx.guild, ctx.author, 5) or ctx.guild.get_role(ctx.settings.guild().role_sub_mod) in ctx.author.roles):
             raise commands.BadArgument("That tag is on cooldown.")
 
-        file = tag.image.read()
-        if file is not None:
-            file = discord.File(BytesIO(file), filename="image.gif" if tag.image.content_type == "image/gif" else "image.png")
-        
-        await ctx.message.reply(embed=await self.tag_embed(tag), file=file, mention_author=False)
+        file, content_type = await self.tag_image(tag)
+        await ctx.message.reply(embed=await self.tag_embed(tag, content_type), file=file, mention_author=False)
     
     @commands.guild_only()
     @permissions.genius_or_submod_and_up()
@@ -248,17 +254,15 @@ class Tags(commands.Cog):
             if _type is None:
                 raise commands.BadArgument("Attached file was not an image.")
             tag.image.put(image, content_type=_type)
+            ctx.settings.tag_images.put(tag.image.grid_id, image, _type)
         else:
             tag.image = None
 
         if not await ctx.settings.edit_tag(tag):
             raise commands.BadArgument("An error occurred editing that tag.")
         
-        file = tag.image.read()
-        if file is not None:
-            file = discord.File(BytesIO(file), filename="image.gif" if tag.image.content_type == "image/gif" else "image.png")
-        
-        await ctx.message.reply(embed=await self.tag_embed(tag), delete_after=10, file=file, mention_author=False)
+        file, content_type = await self.tag_image(tag)
+        await ctx.message.reply(embed=await self.tag_embed(tag, content_type), delete_after=10, file=file, mention_author=False)
         await ctx.message.delete(delay=10)
 
     @edittag.error
@@ -5,36 +5,37 @@ from math import floor
 import cogs.utils.permission_checks as permissions
 import cogs.utils.context as context
 import discord
-from discord.ext import commands, menus
+from cogs.utils.pagination import FilteredQueryPageSource, MenuPages, QueryPageSource
+from discord.ext import commands
 
 
-class LeaderboardSource(menus.GroupByPageSource):
-    async def format_page(self, menu, entry):
+class LeaderboardSource(FilteredQueryPageSource):
+    async def format_page(self, menu, entries):
         embed = discord.Embed(
             title=f'Leaderboard', color=discord.Color.blurple())
-        for i, user in entry.items:
+        trophies = [':first_place:', ':second_place:', ':third_place:']
+        for i, user in entries:
             member = menu.ctx.guild.get_member(user._id)
             trophy = ''
-            if menu.current_page == 0:
-                if i == entry.items[0][0]:
-                    trophy = ':first_place:'
+            if i < len(trophies):
+                trophy = trophies[i]
+                if i == 0:
                     embed.set_thumbnail(url=member.avatar_url)
-                if i == entry.items[1][0]:
-                    trophy = ':second_place:'
-                if i == entry.items[2][0]:
-                    trophy = ':third_place:'
-            
-            
+
             embed.add_field(name=f"#{i+1} - Level {user.level}",
                             value=f"{trophy} {member.mention}", inline=False)
-            
-        embed.set_footer(
-            text=f"Page {menu.current_page +1} of {self.get_max_pages()}")
+
+        embed.set_footer(text=self.footer(menu))
         return embed
 
 
-class CasesSource(menus.GroupByPageSource):
-    async def format_page(self, menu, entry):
+class CasesSource(QueryPageSource):
+    def __init__(self, query, user, warn_points):
+        super().__init__(query, per_page=9, cursor_field='_id')
+        self.user = user
+        self.warn_points = warn_points
+
+    async def format_page(self, menu, cases):
         pun_map = {
             "KICK": "Kicked",
             "BAN": "Banned",
@@ -44,12 +45,10 @@ class CasesSource(menus.GroupByPageSource):
             "REMOVEPOINTS": "Points removed"
         }
 
-        user = menu.ctx.args[2] or menu.ctx.author
-        u = await menu.ctx.bot.settings.user(user.id)
         embed = discord.Embed(
-            title=f'Cases - {u.warn_points} warn points', color=discord.Color.blurple())
-        embed.set_author(name=user, icon_url=user.avatar_url)
-        for case in entry.items:
+            title=f'Cases - {self.warn_points} warn points', color=discord.Color.blurple())
+        embed.set_author(name=self.user, icon_url=self.user.avatar_url)
+        for case in cases:
             timestamp = case.date.strftime("%B %d, %Y, %I:%M %p")
             if case._type == "WARN" or case._type == "LIFTWARN":
                 if case.lifted:
@@ -70,21 +69,10 @@ class CasesSource(menus.GroupByPageSource):
             else:
                 embed.add_field(name=f'{await determine_emoji(case._type)} Case #{case._id}',
                                 value=f'**Reason**: {case.reason}\n**Moderator**: {case.mod_tag}\n**Time**: {timestamp} UTC', inline=True)
-        embed.set_footer(
-            text=f"Page {menu.current_page +1} of {self.get_max_pages()} - newest cases first")
+        embed.set_footer(text=f"{self.footer(menu)} - newest cases first")
         return embed
 
 
-class MenuPages(menus.MenuPages):
-    async def update(self, payload):
-        if self._can_remove_reactions:
-            if payload.event_type == 'REACTION_ADD':
-                await self.message.remove_reaction(payload.emoji, payload.member)
-            elif payload.event_type == 'REACTION_REMOVE':
-                return
-        await super().update(payload)
-
-
 class UserInfo(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -211,11 +199,9 @@ class UserInfo(commands.Cog):
 
         """
 
-        results = enumerate(await ctx.settings.leaderboard())
-        # ctx.user_cache = self.user_cache
-        results = [ (i, m) for (i, m) in results if ctx.guild.get_member(m._id) is not None][0:100]
-        menus = MenuPages(source=LeaderboardSource(
-            results, key=lambda t: 1, per_page=10), clear_reactions_after=True)
+        source = LeaderboardSource(await ctx.settings.leaderboard(), per_page=10,
+                                   check=lambda user: ctx.guild.get_member(user._id) is not None, limit=100)
+        menus = MenuPages(source=source, clear_reactions_after=True)
 
         await menus.start(ctx)
 
@@ -273,7 +259,6 @@ class UserInfo(commands.Cog):
 
         if user is None:
             user = ctx.author
-            ctx.args[2] = user
 
         bot_chan = ctx.settings.guild().channel_botspam
         if not ctx.permissions.hasAtLeast(ctx.guild, ctx.author, 5) and ctx.channel.id != bot_chan:
@@ -295,20 +280,18 @@ class UserInfo(commands.Cog):
             except Exception:
                 raise commands.BadArgument(
                     f"Couldn't find user with ID {user}")
-            ctx.args[2] = user
 
-        results = await ctx.settings.cases(user.id)
-        if len(results.cases) == 0:
+        u = await ctx.settings.user(user.id)
+        source = CasesSource(await ctx.settings.cases(user.id), user, u.warn_points)
+        await source.prepare()
+        if source.total == 0:
             if isinstance(user, int):
                 raise commands.BadArgument(
                     f'User with ID {user.id} had no cases.')
             else:
                 raise commands.BadArgument(f'{user.mention} had no cases.')
-        cases = [case for case in results.cases if case._type != "UNMUTE"]
-        cases.reverse()
 
-        menus = MenuPages(source=CasesSource(
-            cases, key=lambda t: 1, per_page=9), clear_reactions_after=True)
+        menus = MenuPages(source=source, clear_reactions_after=True)
         await ctx.message.delete()
         await menus.start(ctx)
 
@@ -23,7 +23,35 @@ class Admin(commands.Cog):
         
         await self.bot.user.edit(avatar=await ctx.message.attachments[0].read())
         await ctx.send_success("Done!", delete_after=5)
-        
+
+    @commands.command(name="migratecontent")
+    @commands.guild_only()
+    @permissions.guild_owner_and_up()
+    async def migratecontent(self, ctx: context.Context):
+        """Move tags and filter words out of the guild document into their own collections (admin only).
+        Safe to run more than once.
+        """
+
+        async with ctx.typing():
+            tags, words = await ctx.settings.migrate_guild_content()
+
+        await ctx.send_success(f"Moved {tags} tags and {words} filter words to their own collections.")
+
+    @commands.command(name="migratecases")
+    @commands.guild_only()
+    @permissions.guild_owner_and_up()
+    async def migratecases(self, ctx: context.Context):
+        """Move cases out of the old per-user lists into one document per case (admin only).
+        Safe to run more than once.
+        """
+
+        async with ctx.typing():
+            moved, skipped = await ctx.settings.migrate_cases()
+
+        await ctx.send_success(f"Moved {moved} cases to their own documents, skipped {skipped} that were already moved.")
+
+    @migratecases.error
+    @migratecontent.error
     @setpfp.error
     async def info_error(self,  ctx: context.Context, error):
         await ctx.message.delete(delay=5)
@@ -1,5 +1,6 @@
 import asyncio
 import datetime
+import heapq
 import random
 import traceback
 
@@ -10,17 +11,128 @@ import humanize
 import pytimeparse
 from cogs.utils.tasks import end_giveaway
 from data.giveaway import Giveaway as GiveawayDB
-from discord.ext import commands, tasks
+from discord.ext import commands
+
+# how many giveaway messages we edit at the same time
+EDIT_CONCURRENCY = 3
+# the least time between two edits of a giveaway, and the least time as a part of the time left.
+# The text says "Less than ...", so it stays true between edits, it just gets less precise
+MIN_EDIT_INTERVAL = 60
+MIN_EDIT_FRACTION = 0.1
+
+
+def time_remaining(end_time: datetime.datetime, now: datetime.datetime) -> str:
+    return f"Less than {humanize.naturaldelta(end_time - now)}"
+
+
+def next_change(end_time: datetime.datetime, now: datetime.datetime) -> datetime.datetime:
+    """Find when the "Less than ..." text of a giveaway should next be edited. The text only depends
+    on the time left and changes in steps as it goes down, so we can binary search for the
+    shortest time left that still gives the current text. Steps get as short as a second near the end,
+    so edits are spaced out by at least MIN_EDIT_INTERVAL, or MIN_EDIT_FRACTION of the time left.
+    The last edit is done by end_giveaway when the giveaway ends.
+
+    Returns
+    -------
+    datetime.datetime
+        When to edit the text, or None if the giveaway is over by then
+    """
+
+    remaining = int((end_time - now).total_seconds())
+    earliest = now + datetime.timedelta(seconds=max(MIN_EDIT_INTERVAL, remaining * MIN_EDIT_FRACTION))
+    if earliest >= end_time:
+        return None
+
+    current = humanize.naturaldelta(datetime.timedelta(seconds=remaining))
+    low, high = 1, remaining
+    while low < high:
+        middle = (low + high) // 2
+        if humanize.naturaldelta(datetime.timedelta(seconds=middle)) == current:
+            high = middle
+        else:
+            low = middle + 1
+
+    # `low` seconds left still shows the current text, one second later it changes
+    return max(end_time - datetime.timedelta(seconds=low - 1), earliest)
+
+
+class ActiveGiveaway():
+    __slots__ = ('id', 'channel_id', 'end_time', 'embed', 'text')
+
+    def __init__(self, id: int, channel_id: int, end_time: datetime.datetime, embed: discord.Embed = None):
+        self.id = id
+        self.channel_id = channel_id
+        self.end_time = end_time
+        # only the embed is kept, edits go through partial messages
+        self.embed = embed
+        self.text = None if embed is None else embed.fields[0].value
 
 
 class Giveaway(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.giveaway_messages = {}
-        self.time_updater_loop.start()
+        # giveaways that haven't ended yet, by message ID
+        self.active = {}
+        # (time of the next text change, giveaway ID)
+        self.refresh_queue = []
+        self.wakeup = asyncio.Event()
+        self.edit_semaphore = asyncio.Semaphore(EDIT_CONCURRENCY)
+        self.updater = bot.loop.create_task(self.time_updater())
 
     def cog_unload(self):
-        self.time_updater_loop.cancel()
+        self.updater.cancel()
+
+    def track(self, giveaway: ActiveGiveaway) -> None:
+        """Start keeping the time remaining of a giveaway up to date
+        """
+
+        self.active[giveaway.id] = giveaway
+        self.queue_refresh(giveaway, datetime.datetime.now())
+
+    def queue_refresh(self, giveaway: ActiveGiveaway, now: datetime.datetime) -> None:
+        when = next_change(giveaway.end_time, now)
+        if when is None:
+            return
+        heapq.heappush(self.refresh_queue, (when, giveaway.id))
+        self.wakeup.set()
+
+    @commands.Cog.listener()
+    async def on_giveaway_end(self, message_id: int):
+        # the refresh queue entry is skipped when it comes up
+        self.active.pop(message_id, None)
+
+    async def time_updater(self):
+        """Edit the time remaining of giveaways, but only when the text would actually change
+        """
+
+        await self.bot.wait_until_ready()
+
+        now = datetime.datetime.now()
+        for giveaway in GiveawayDB.objects(is_ended=False, end_time__gt=now):
+            self.track(ActiveGiveaway(giveaway._id, giveaway.channel, giveaway.end_time))
+
+        while True:
+            now = datetime.datetime.now()
+            due = []
+            while self.refresh_queue and self.refresh_queue[0][0] <= now:
+                _, id = heapq.heappop(self.refresh_queue)
+                giveaway = self.active.get(id)
+                if giveaway is not None:
+                    due.append(giveaway)
+
+            if due:
+                await asyncio.gather(*[self.do_giveaway_update(giveaway, now) for giveaway in due])
+                for giveaway in due:
+                    self.queue_refresh(giveaway, now)
+
+            self.wakeup.clear()
+            timeout = None
+            if self.refresh_queue:
+                timeout = max(0, (self.refresh_queue[0][0] - datetime.datetime.now()).total_seconds())
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
 
     @commands.guild_only()
     @permissions.admin_and_up()
@@ -110,7 +222,7 @@ class Giveaway(commands.Cog):
 
         embed = discord.Embed(title="New giveaway!")
         embed.description = f"**{responses['name']}** is being given away by {responses['sponsor'].mention} to **{responses['winners']}** lucky {'winner' if responses['winners'] == 1 else 'winners'}!"
-        embed.add_field(name="Time remaining", value=f"Less than {humanize.naturaldelta(end_time - now)}")
+        embed.add_field(name="Time remaining", value=time_remaining(end_time, now))
         embed.timestamp = end_time
         embed.color = discord.Color.random()
         embed.set_footer(text="Ends")
@@ -127,45 +239,36 @@ class Giveaway(commands.Cog):
             await ctx.send(f"Giveaway started!", embed=embed, delete_after=10)
 
         ctx.tasks.schedule_end_giveaway(channel_id=responses['channel'].id, message_id=message.id, date=end_time, winners=responses['winners'])
+        self.track(ActiveGiveaway(message.id, responses['channel'].id, end_time, embed))
 
-    @tasks.loop(seconds=360)
-    async def time_updater_loop(self):
-        guild = self.bot.get_guild(self.bot.settings.guild_id)
-        if guild is None:
+    async def do_giveaway_update(self, giveaway: ActiveGiveaway, now: datetime.datetime):
+        if giveaway.end_time <= now:
             return
 
-        giveaways = GiveawayDB.objects(is_ended=False)
-        for giveaway in giveaways:
-            await self.do_giveaway_update(giveaway, guild)
-
-    async def do_giveaway_update(self, giveaway: GiveawayDB, guild: discord.Guild):
-        if giveaway is None:
-            return
-        if giveaway.is_ended:
+        channel = self.bot.get_channel(giveaway.channel_id)
+        if channel is None:
             return
 
-        now = datetime.datetime.now()
-        end_time = giveaway.end_time
-        if end_time is None or end_time < now:
+        text = time_remaining(giveaway.end_time, now)
+        if text == giveaway.text:
             return
 
-        channel = guild.get_channel(giveaway.channel)
-
-        if giveaway._id in self.giveaway_messages:
-            message = self.giveaway_messages[giveaway._id]
-        else:
+        async with self.edit_semaphore:
             try:
-                message = await channel.fetch_message(giveaway._id)
-                self.giveaway_messages[giveaway._id] = message
-            except Exception:
-                return
-
-        if len(message.embeds) == 0:
-            return
-
-        embed = message.embeds[0]
-        embed.set_field_at(0, name="Time remaining", value=f"Less than {humanize.naturaldelta(end_time - now)}")
-        await message.edit(embed=embed)
+                if giveaway.embed is None:
+                    # we only need to fetch the message once after a restart, to get the embed
+                    message = await channel.fetch_message(giveaway.id)
+                    if len(message.embeds) == 0:
+                        return
+                    giveaway.embed = message.embeds[0]
+
+                giveaway.embed.set_field_at(0, name="Time remaining", value=text)
+                await channel.get_partial_message(giveaway.id).edit(embed=giveaway.embed)
+                giveaway.text = text
+            except discord.NotFound:
+                self.active.pop(giveaway.id, None)
+            except discord.HTTPException:
+                traceback.print_exc()
 
     @giveaway.command()
     async def reroll(self, ctx: context.Context, message_id: int):
@@ -189,16 +292,13 @@ class Giveaway(commands.Cog):
             raise commands.BadArgument("That giveaway hasn't ended yet!")
         elif len(g.entries) == 0:
             raise commands.BadArgument(f"There are no entries for the giveaway of **{g.name}**.")
-        elif len(g.entries) <= len(g.previous_winners):
+
+        previous_winners = set(g.previous_winners)
+        candidates = [user_id for user_id in g.entries if user_id not in previous_winners and ctx.guild.get_member(user_id) is not None]
+        if not candidates:
             raise commands.BadArgument("No more winners are possible!")
 
-        the_winner = None
-        while the_winner is None:
-            random_id = random.choice(g.entries)
-            the_winner = ctx.guild.get_member(random_id)
-            if the_winner is not None and the_winner.id not in g.previous_winners:
-                break
-            the_winner = None
+        the_winner = ctx.guild.get_member(random.choice(candidates))
 
         g.previous_winners.append(the_winner.id)
         g.save()
@@ -230,12 +330,14 @@ class Giveaway(commands.Cog):
             raise commands.BadArgument("That giveaway has already ended.")
 
         await ctx.message.delete()
-        ctx.tasks.tasks.remove_job(str(message_id + 2), 'default')
+        try:
+            ctx.tasks.cancel_end_giveaway(message_id)
+        except Exception:
+            pass
         await end_giveaway(giveaway.channel, message_id, giveaway.winners)
 
         await ctx.send_success("Giveaway ended!", delete_after=5)
 
-    @time_updater_loop.error
     @giveaway.error
     @start.error
     @end.error
@@ -1,6 +1,4 @@
-import base64
 import datetime
-import json
 import os
 import re
 import traceback
@@ -13,8 +11,8 @@ import humanize
 import pytimeparse
 import cogs.utils.permission_checks as permissions
 import cogs.utils.context as context
+from cogs.utils.emoji_pack import EmojiPack
 from discord.ext import commands
-from PIL import Image
 
 
 class Misc(commands.Cog):
@@ -26,11 +24,20 @@ class Misc(commands.Cog):
         self.cij_baseurl = "https://canijailbreak2.com/v1/pls"
         self.devices_url = "https://api.ipsw.me/v4/devices"
 
-        try:
-            with open('emojis.json') as f:
-                self.emojis = json.loads(f.read())
-        except IOError:
-            raise Exception("Could not find emojis.json. Make sure to run grab_emojis.py")
+        if not os.path.exists('emojis.pack'):
+            raise Exception("Could not find emojis.pack. Make sure to run scrape_emojis.py")
+        # mapped the first time someone uses !jumbo, not while the bot is starting
+        self._emojis = None
+
+    @property
+    def emojis(self) -> EmojiPack:
+        if self._emojis is None:
+            self._emojis = EmojiPack('emojis.pack')
+        return self._emojis
+
+    def cog_unload(self):
+        if self._emojis is not None:
+            self._emojis.close()
 
     @commands.command(name="remindme")
     @commands.guild_only()
@@ -88,16 +95,12 @@ class Misc(commands.Cog):
                 raise commands.BadArgument("This command is on cooldown.")
 
         if isinstance(emoji, str):
-            async with ctx.typing():
-                emoji_url_file = self.emojis.get(emoji)
-                if emoji_url_file is None:
-                    raise commands.BadArgument("Couldn't find a suitable emoji.")
-
-            im = Image.open(BytesIO(base64.b64decode(emoji_url_file)))
-            image_container = BytesIO()
-            im.save(image_container, 'png')
-            image_container.seek(0)
-            _file = discord.File(image_container, filename="image.png")
+            # the pack already holds PNGs, so they're sent as they are
+            png = self.emojis.get(emoji)
+            if png is None:
+                raise commands.BadArgument("Couldn't find a suitable emoji.")
+
+            _file = discord.File(BytesIO(png), filename="image.png")
             await ctx.message.reply(file=_file, mention_author=False)
 
         else:
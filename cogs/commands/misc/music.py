@@ -9,13 +9,64 @@ import discord
 import humanize
 import lavalink
 import spotipy
-from discord.ext import commands, tasks
+from cogs.utils.track_resolver import TrackResolver
+from discord.ext import commands
 from spotipy.oauth2 import SpotifyClientCredentials
 
 url_rx = re.compile(r'https?://(?:www\.)?.+')
 spotify_track = re.compile(r"[\bhttps://open.\b]*spotify[\b.com\b]*[/:]*track[/:]*[A-Za-z0-9?=]+")
 spotify_playlist = re.compile(r"[\bhttps://open.\b]*spotify[\b.com\b]*[/:]*playlist[/:]*[A-Za-z0-9?=]+")
 
+# the progress bar is split in this many segments, the message is only edited when the segment changes
+PROGRESS_SEGMENTS = 10
+# never refresh the progress bar more often than this, in seconds
+MIN_PROGRESS_INTERVAL = 5
+
+
+class ProgressBar:
+    """The now playing progress bar. The bar is built from custom emojis, which are looked up once
+    and used to render every possible bar up front.
+
+    Parameters
+    ----------
+    emojis : list
+        The bot's emojis
+    """
+
+    NAMES = ('progress1', 'progress2', 'progress3', 'progressempty', 'progressempty2')
+
+    def __init__(self, emojis):
+        lookup = {emoji.name: str(emoji) for emoji in emojis if emoji.name in self.NAMES}
+        # emojis we can't find are left out, like before
+        start, full, end, empty, empty_end = (lookup.get(name, "") for name in self.NAMES)
+
+        self.bars = []
+        for segment in range(PROGRESS_SEGMENTS + 1):
+            if segment == 0:
+                bar = f"{start}{empty * 8}{empty_end}"
+            elif segment == PROGRESS_SEGMENTS:
+                bar = f"{start}{full * 8}{end}"
+            else:
+                bar = f"{start}{full * segment}{empty * (8 - segment)}{empty_end}"
+            self.bars.append(f"{segment * 100 // PROGRESS_SEGMENTS}% {bar}")
+
+    @staticmethod
+    def segment(position: int, length: int) -> int:
+        if length <= 0 or position >= length:
+            return 0
+        return min(PROGRESS_SEGMENTS, position * PROGRESS_SEGMENTS // length)
+
+    def render(self, position: int, length: int) -> str:
+        return self.bars[self.segment(position, length)]
+
+    def until_next_segment(self, position: int, length: int) -> float:
+        """How long until the bar changes, in seconds. Longer tracks have longer segments,
+        so they're refreshed less often.
+        """
+
+        boundary = (self.segment(position, length) + 1) * length / PROGRESS_SEGMENTS
+        return max(MIN_PROGRESS_INTERVAL, (boundary - position) / 1000)
+
 
 class Music(commands.Cog):
     def __init__(self, bot):
@@ -27,9 +78,13 @@ class Music(commands.Cog):
         self.clear_votes = set()
         self.clear_vote_msg = None
         self.vote_ratio = 0.5
+        self.progress_bar = None
+        self.progress_task = None
+        self.np_segment = None
 
         self.sp = spotipy.Spotify(auth_manager=SpotifyClientCredentials(client_id=os.environ.get("SPOTIFY_CLIENT_ID"),
                                                            client_secret=os.environ.get("SPOTIFY_CLIENT_SECRET")))
+        self.resolver = TrackResolver(self.sp)
 
         guild = self.bot.get_guild(self.bot.settings.guild_id)
         self.channel = guild.get_channel(self.bot.settings.guild().channel_botspam)
@@ -43,6 +98,7 @@ class Music(commands.Cog):
     def cog_unload(self):
         """ Cog unload handler. This removes any event hooks that were registered. """
         self.bot.lavalink._event_hooks.clear()
+        self.stop_progress()
 
     async def cog_before_invoke(self, ctx):
         """ Command before-invoke handler. """
@@ -129,8 +185,7 @@ class Music(commands.Cog):
             if title is not None:
                 activity = discord.Activity(type=discord.ActivityType.listening, name=title)
                 await self.bot.change_presence(status=discord.Status.online, activity=activity)
-            await asyncio.sleep(5)
-            self.update_progress.start()
+            self.start_progress()
         elif isinstance(event, lavalink.events.TrackEndEvent):
             self.skip_votes = set()
             self.skip_vote_msg = None
@@ -141,7 +196,7 @@ class Music(commands.Cog):
                     await self.np.delete()
                 except Exception:
                     pass
-            self.update_progress.cancel()
+            self.stop_progress()
 
     async def connect_to(self, guild_id: int, channel_id: str):
         """ Connects to the given voicechannel ID. A channel_id of `None` means disconnect. """
@@ -164,7 +219,7 @@ class Music(commands.Cog):
         embed.add_field(name="Duration", value=humanize.naturaldelta(datetime.timedelta(milliseconds=data.get('length'))))
         embed.add_field(name="Requested by", value=f"<@{player.current.requester}>")
         
-        progress = self.get_progress(player, data)  
+        progress, segment = self.get_progress(player, data)
         embed.add_field(name="Progress", value=progress)
         embed.color = discord.Color.random()
         
@@ -172,6 +227,8 @@ class Music(commands.Cog):
             await self.channel.send(embed=embed, delete_after=10)
         else:
             self.np = await self.channel.send(embed=embed)
+            # only the message update_progress keeps editing tracks the segment it shows
+            self.np_segment = segment
 
             for r in self.reactions:
                 try:
@@ -179,51 +236,66 @@ class Music(commands.Cog):
                 except Exception:
                     return
                 
-    def get_progress(self, player, data):
+    def get_progress(self, player, data) -> tuple:
+        """Render the progress bar of the current track
+
+        Returns
+        -------
+        tuple
+            (the bar, the segment it shows)
+        """
+
+        if self.progress_bar is None:
+            self.progress_bar = ProgressBar(self.bot.emojis)
+
         length = int(data.get('length'))
         position = int(player.position)
-        p = int(position / length * 100) if position != length else 0
-        
-        def fix_emojis(desc):
-            custom_emojis = re.findall(r':\w*:', desc)
-            new = ""
-            for e in custom_emojis:
-                e = e.replace(':', '')
-                replacement = discord.utils.get(self.bot.emojis, name=e)
-                if replacement is not None:
-                    new = new + str(replacement)
-            return new
-        
-        percentage = int(((position / length) * 100 / 10) ) if position != length else 0
-        if percentage == 0:
-            progress = f":progress1:{':progressempty:' * 8}:progressempty2:"
-        elif percentage == 10:
-            progress = f":progress1:{'progress2:' * 8}:progress3:"
-        else:
-            progress = f":progress1:{':progress2:' * percentage}{':progressempty:' * (8 - percentage)}:progressempty2:"
+        return self.progress_bar.render(position, length), self.progress_bar.segment(position, length)
+
+    def start_progress(self):
+        self.stop_progress()
+        self.progress_task = self.bot.loop.create_task(self.update_progress())
+
+    def stop_progress(self):
+        if self.progress_task is not None:
+            self.progress_task.cancel()
+            self.progress_task = None
 
-        return str(p) + "% " + fix_emojis(progress)
+    def has_listeners(self, player):
+        vc = self.bot.get_channel(int(player.channel_id)) if player.channel_id is not None else None
+        return vc is not None and any(not m.bot for m in vc.members)
 
-    @tasks.loop(seconds=20)
     async def update_progress(self):
-        player = self.bot.lavalink.player_manager.get(self.channel.guild.id)
-        if self.np is None:
-            return
-        if player is None:
-            return
-        track = player.current
-        if track is None or not player.is_playing:
-            return
-        track = player.fetch(track.identifier)
-        data = track["info"]
-        
-        embed = self.np.embeds[0]
-        embed.set_field_at(4, name="Progress", value=self.get_progress(player, data))
-        
-        try:
-            await self.np.edit(embed=embed)
-        except Exception:
-            pass
+        """Keep the progress bar of the now playing message up to date. We sleep until the bar
+        would change, and stop when playback is paused or nobody is listening.
+        """
+
+        while True:
+            player = self.bot.lavalink.player_manager.get(self.channel.guild.id)
+            if self.np is None or player is None:
+                return
+            track = player.current
+            if track is None or not player.is_playing or player.paused:
+                return
+            if not self.has_listeners(player):
+                return
+            track = player.fetch(track.identifier)
+            data = track["info"]
+
+            length = int(data.get('length'))
+            position = int(player.position)
+            if self.progress_bar.segment(position, length) != self.np_segment:
+                progress, segment = self.get_progress(player, data)
+                embed = self.np.embeds[0]
+                embed.set_field_at(4, name="Progress", value=progress)
+
+                try:
+                    await self.np.edit(embed=embed)
+                    self.np_segment = segment
+                except Exception:
+                    pass
+
+            await asyncio.sleep(self.progress_bar.until_next_segment(position, length))
 
     async def do_skip(self, channel, skipper, player):
         if not player.is_playing:
@@ -298,12 +370,12 @@ class Music(commands.Cog):
         chan = self.bot.get_channel(int(player.channel_id))
         if len(chan.members) == 1 and chan.members[0].id == self.bot.user.id:
             await player.set_pause(True)
-            self.update_progress.stop()
+            self.stop_progress()
             await self.bot.change_presence(status=discord.Status.online, activity=None)
         elif len(chan.members) > 1:
             if player.paused:
                 await player.set_pause(False)
-                self.update_progress.start()
+                self.start_progress()
                 embed = discord.Embed()
                 embed.description = "The player was paused because no one was in the voice channel. Resuming previous!"
                 embed.color = discord.Color.blurple()
@@ -348,6 +420,7 @@ class Music(commands.Cog):
                 await ctx.send(embed=embed, delete_after=5)
             else:
                 await player.set_pause(False)
+                self.start_progress()
                 embed = discord.Embed()
                 embed.description = f"{user.mention}: Resumed the song!"
                 embed.color = discord.Color.blurple()
@@ -378,26 +451,35 @@ class Music(commands.Cog):
         # Remove leading and trailing <>. <> may be used to suppress embedding links in Discord.
         query = query.strip('<>')
         if spotify_track.match(query):
-            track = self.sp.track(query)
-            query = f"ytsearch:{track['name']} - {track['artists'][0]['name']}"
+            query = await self.resolver.spotify_track(query)
             # Get the results for the query from Lavalink.
-            results = await player.node.get_tracks(query)
+            results = await self.resolver.get_tracks(player.node, query)
         elif spotify_playlist.match(query):
-            playlist = self.sp.playlist(query, fields='name,tracks.items.track.name,tracks.items.track.artists')
-            results = {'loadType': "PLAYLIST_LOADED", 'tracks': [], 'playlistInfo':  {'name': playlist['name']}}
-            
+            name, queries = await self.resolver.spotify_playlist(query)
+
+            # tracks are queued as they're found, so the first one can start playing right away
+            count = 0
             async with ctx.channel.typing():
-                for track in playlist['tracks']['items']:
-                    track = track['track']
-                    query = f"ytsearch:{track['name']} - {track['artists'][0]['name']}"
-                    result = await player.node.get_tracks(query)
-                    results['tracks'].append(result['tracks'][0])
-                    results['playlistInfo']
+                async for track in self.resolver.resolve(player.node, queries):
+                    player.add(requester=ctx.author.id, track=track)
+                    player.store(track["info"]["identifier"], track)
+                    count += 1
+                    if not player.is_playing:
+                        await player.play()
+
+            if count == 0:
+                raise commands.BadArgument("Couldn't find a suitable video to play.")
+
+            embed = discord.Embed(color=discord.Color.blurple())
+            embed.title = 'Playlist Enqueued!'
+            embed.description = f'{name} - {count} tracks'
+            await ctx.send(embed=embed, delete_after=5)
+            return
         else:
             if not url_rx.match(query):
                 query = f'ytsearch:{query}'
             # Get the results for the query from Lavalink.
-            results = await player.node.get_tracks(query)
+            results = await self.resolver.get_tracks(player.node, query)
 
         # Results could be None if Lavalink returns an invalid response (non-JSON/non-200 (OK)).
         # ALternatively, resullts['tracks'] could be an empty array if the query yielded no tracks.
@@ -527,6 +609,7 @@ class Music(commands.Cog):
             raise commands.BadArgument('I am not currently playing anything!')
 
         await player.set_pause(False)
+        self.start_progress()
 
     @commands.guild_only()
     @commands.command(name='skip')
@@ -8,6 +8,7 @@ import urllib
 from datetime import datetime
 import cogs.utils.permission_checks as permissions
 import cogs.utils.context as context
+from cogs.utils.pagination import MenuPages
 from discord.ext import commands, menus
 from yarl import URL
 
@@ -68,15 +69,6 @@ class TweakMenu(menus.AsyncIteratorPageSource):
         embed.timestamp = datetime.now()
         return embed
     
-class MenuPages(menus.MenuPages):
-    async def update(self, payload):
-        if self._can_remove_reactions:
-            if payload.event_type == 'REACTION_ADD':
-                await self.message.remove_reaction(payload.emoji, payload.member)
-            elif payload.event_type == 'REACTION_REMOVE':
-                return
-        await super().update(payload)
-
 class Parcility(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
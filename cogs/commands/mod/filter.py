@@ -3,17 +3,17 @@ import traceback
 import discord
 import cogs.utils.permission_checks as permissions
 import cogs.utils.context as context
+from cogs.utils.pagination import ListPageSource, MenuPages
 from data.filterword import FilterWord
 from discord.ext import commands
-from discord.ext import menus
 
 
-class FilterSource(menus.GroupByPageSource):
-    async def format_page(self, menu, entry):
+class FilterSource(ListPageSource):
+    async def format_page(self, menu, entries):
         permissions = menu.ctx.bot.settings.permissions
         embed = discord.Embed(
             title=f'Filtered words', color=discord.Color.blurple())
-        for _, word in entry.items:
+        for word in entries:
             notify_flag = ""
             piracy_flag = ""
             flags_check = ""
@@ -29,16 +29,6 @@ class FilterSource(menus.GroupByPageSource):
         return embed
 
 
-class MenuPages(menus.MenuPages):
-    async def update(self, payload):
-        if self._can_remove_reactions:
-            if payload.event_type == 'REACTION_ADD':
-                await self.message.remove_reaction(payload.emoji, payload.member)
-            elif payload.event_type == 'REACTION_REMOVE':
-                return
-        await super().update(payload)
-
-
 class Filters(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -109,14 +99,13 @@ class Filters(commands.Cog):
 
         """
 
-        filters = ctx.settings.guild().filter_words
+        filters = ctx.settings.filter_words()
         if len(filters) == 0:
             raise commands.BadArgument("The filterlist is currently empty. Please add a word using `!filter`.")
         
         filters = sorted(filters, key=lambda word: word.word.lower())
 
-        menus = MenuPages(source=FilterSource(
-            enumerate(filters), key=lambda t: 1, per_page=12), clear_reactions_after=True)
+        menus = MenuPages(source=FilterSource(filters, per_page=12), clear_reactions_after=True)
 
         await menus.start(ctx)
 
@@ -139,7 +128,7 @@ class Filters(commands.Cog):
 
         word = word.lower()
 
-        words = ctx.settings.guild().filter_words
+        words = ctx.settings.filter_words()
         words = list(filter(lambda w: w.word.lower() == word.lower(), words))
         
         if len(words) > 0:
@@ -170,7 +159,7 @@ class Filters(commands.Cog):
 
         word = word.lower()
 
-        words = ctx.settings.guild().filter_words
+        words = ctx.settings.filter_words()
         words = list(filter(lambda w: w.word.lower() == word.lower(), words))
         
         if len(words) > 0:
@@ -291,7 +280,7 @@ class Filters(commands.Cog):
 
         word = word.lower()
 
-        words = ctx.settings.guild().filter_words
+        words = ctx.settings.filter_words()
         words = list(filter(lambda w: w.word.lower() == word.lower(), words))
         
         if len(words) > 0:
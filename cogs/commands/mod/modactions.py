@@ -7,6 +7,7 @@ import cogs.utils.context as context
 import discord
 import humanize
 import pytimeparse
+from cogs.utils.lockdown import Lockdown
 from data.case import Case
 from discord.ext import commands
 
@@ -80,7 +81,7 @@ class ModActions(commands.Cog):
         log = await logging.prepare_warn_log(ctx.author, user, case)
         log.add_field(name="Current points", value=cur_points, inline=True)
 
-        log_kickban = None
+        kickban_case = log_kickban = None
         dmed = True
 
         if cur_points >= 800:
@@ -90,7 +91,7 @@ class ModActions(commands.Cog):
             except Exception:
                 dmed = False
 
-            log_kickban = await self.add_ban_case(ctx, user, "800 or more warn points reached.")
+            kickban_case, log_kickban = await self.add_ban_case(ctx, user, "800 or more warn points reached.")
             await user.ban(reason="800 or more warn points reached.")
 
         elif cur_points >= 69420 and not results.was_warn_kicked and isinstance(user, discord.Member):
@@ -102,7 +103,7 @@ class ModActions(commands.Cog):
             except Exception:
                 dmed = False
 
-            log_kickban = await self.add_kick_case(ctx, user, "400 or more warn points reached.")
+            kickban_case, log_kickban = await self.add_kick_case(ctx, user, "400 or more warn points reached.")
             await user.kick(reason="400 or more warn points reached.")
 
         else:
@@ -121,12 +122,14 @@ class ModActions(commands.Cog):
         if public_chan:
             log.remove_author()
             log.set_thumbnail(url=user.avatar_url)
-            await public_chan.send(user.mention if not dmed else "", embed=log)
+            message = await public_chan.send(user.mention if not dmed else "", embed=log)
+            await ctx.settings.index_case_log(case._id, message)
 
             if log_kickban:
                 log_kickban.remove_author()
                 log_kickban.set_thumbnail(url=user.avatar_url)
-                await public_chan.send(embed=log_kickban)
+                message = await public_chan.send(embed=log_kickban)
+                await ctx.settings.index_case_log(kickban_case._id, message)
 
     @commands.guild_only()
     @permissions.mod_and_up()
@@ -150,8 +153,7 @@ class ModActions(commands.Cog):
         """
 
         # retrieve user's case with given ID
-        cases = await ctx.settings.get_case(user.id, case_id)
-        case = cases.cases.filter(_id=case_id).first()
+        case = await ctx.settings.get_case(user.id, case_id)
 
         reason = discord.utils.escape_markdown(reason)
         reason = discord.utils.escape_mentions(reason)
@@ -178,7 +180,7 @@ class ModActions(commands.Cog):
         case.lifted_by_tag = str(ctx.author)
         case.lifted_by_id = ctx.author.id
         case.lifted_date = datetime.datetime.now()
-        cases.save()
+        case.save()
 
         # remove the warn points from the user in DB
         await ctx.settings.inc_points(user.id, -1 * int(case.punishment))
@@ -222,8 +224,7 @@ class ModActions(commands.Cog):
         """
 
         # retrieve user's case with given ID
-        cases = await ctx.settings.get_case(user.id, case_id)
-        case = cases.cases.filter(_id=case_id).first()
+        case = await ctx.settings.get_case(user.id, case_id)
 
         new_reason = discord.utils.escape_markdown(new_reason)
         new_reason = discord.utils.escape_mentions(new_reason)
@@ -236,7 +237,7 @@ class ModActions(commands.Cog):
         old_reason = case.reason
         case.reason = new_reason
         case.date = datetime.datetime.now()
-        cases.save()
+        case.save()
 
         dmed = True
         log = await logging.prepare_editreason_log(ctx.author, user, case, old_reason)
@@ -250,35 +251,66 @@ class ModActions(commands.Cog):
             ctx.settings.guild().channel_public)
 
         found = False
-        async with ctx.typing():
-            async for message in public_chan.history(limit=200):
-                if message.author.id != ctx.me.id:
-                    continue
-                if len(message.embeds) == 0:
-                    continue
-                embed = message.embeds[0]
-                # print(embed.footer.text)
-                if embed.footer.text == discord.Embed.Empty:
-                    continue
-                if len(embed.footer.text.split(" ")) < 2:
-                    continue
-
-                if f"#{case_id}" == embed.footer.text.split(" ")[1]:
-                    for i, field in enumerate(embed.fields):
-                        if field.name == "Reason":
-                            embed.set_field_at(i, name="Reason", value=new_reason)
-                            await message.edit(embed=embed)
-                            found = True
+        message = None
+        indexed = await ctx.settings.case_log(case_id, public_chan.id)
+        if indexed is not None:
+            try:
+                message = await public_chan.fetch_message(indexed.message_id)
+            except discord.NotFound:
+                message = None
+
+        if message is None:
+            # cases logged before we started indexing them can only be found by looking through the channel
+            async with ctx.typing():
+                message = await self.find_case_log(ctx, public_chan, case_id)
+            if message is not None:
+                await ctx.settings.index_case_log(case_id, message, replace=True)
+
+        if message is not None and message.embeds:
+            embed = message.embeds[0]
+            for i, field in enumerate(embed.fields):
+                # "New Reason" if the case was logged again by an earlier !editreason
+                if field.name in ("Reason", "New Reason"):
+                    embed.set_field_at(i, name=field.name, value=new_reason)
+                    await message.edit(embed=embed)
+                    found = True
+                    break
+
         if found:
             await ctx.message.reply(f"We updated the case and edited the embed in {public_chan.mention}.", embed=log, delete_after=10)
         else:
             await ctx.message.reply(f"We updated the case but weren't able to find a corresponding message in {public_chan.mention}!", embed=log, delete_after=10)
             log.remove_author()
             log.set_thumbnail(url=user.avatar_url)
-            await public_chan.send(user.mention if not dmed else "", embed=log)
+            message = await public_chan.send(user.mention if not dmed else "", embed=log)
+            await ctx.settings.index_case_log(case_id, message, replace=True)
 
         await ctx.message.delete(delay=10)
 
+    async def find_case_log(self, ctx: context.Context, channel: discord.TextChannel, case_id: int):
+        """Look for the log of a case in the last 200 messages of a channel, by the case ID in its footer
+
+        Returns
+        -------
+        discord.Message
+            The log, or None if it wasn't found
+        """
+
+        async for message in channel.history(limit=200):
+            if message.author.id != ctx.me.id:
+                continue
+            if len(message.embeds) == 0:
+                continue
+
+            embed = message.embeds[0]
+            if embed.footer.text == discord.Embed.Empty:
+                continue
+            if len(embed.footer.text.split(" ")) < 2:
+                continue
+
+            if f"#{case_id}" == embed.footer.text.split(" ")[1]:
+                return message
+        return None
 
     @commands.guild_only()
     @permissions.mod_and_up()
@@ -346,7 +378,8 @@ class ModActions(commands.Cog):
         if public_chan:
             log.remove_author()
             log.set_thumbnail(url=user.avatar_url)
-            await public_chan.send(user.mention if not dmed else "", embed=log)
+            message = await public_chan.send(user.mention if not dmed else "", embed=log)
+            await ctx.settings.index_case_log(case._id, message)
 
     @commands.guild_only()
     @commands.bot_has_guild_permissions(kick_members=True)
@@ -366,7 +399,7 @@ class ModActions(commands.Cog):
         """
 
         reason = "You were kicked for simping"
-        log = await self.add_kick_case(ctx, user, reason)
+        case, log = await self.add_kick_case(ctx, user, reason)
 
         try:
             await user.send(f"You were kicked from {ctx.guild.name}", embed=log)
@@ -383,7 +416,8 @@ class ModActions(commands.Cog):
         if public_chan:
             log.remove_author()
             log.set_thumbnail(url=user.avatar_url)
-            await public_chan.send(embed=log)
+            message = await public_chan.send(embed=log)
+            await ctx.settings.index_case_log(case._id, message)
 
     @commands.guild_only()
     @commands.bot_has_guild_permissions(kick_members=True)
@@ -408,7 +442,7 @@ class ModActions(commands.Cog):
         reason = discord.utils.escape_markdown(reason)
         reason = discord.utils.escape_mentions(reason)
 
-        log = await self.add_kick_case(ctx, user, reason)
+        case, log = await self.add_kick_case(ctx, user, reason)
 
         try:
             await user.send(f"You were kicked from {ctx.guild.name}", embed=log)
@@ -425,7 +459,8 @@ class ModActions(commands.Cog):
         if public_chan:
             log.remove_author()
             log.set_thumbnail(url=user.avatar_url)
-            await public_chan.send(embed=log)
+            message = await public_chan.send(embed=log)
+            await ctx.settings.index_case_log(case._id, message)
 
     async def add_kick_case(self,  ctx: context.Context, user, reason):
         # prepare case for DB
@@ -442,7 +477,7 @@ class ModActions(commands.Cog):
         # add new case to DB
         await ctx.settings.add_case(user.id, case)
 
-        return await logging.prepare_kick_log(ctx.author, user, case)
+        return case, await logging.prepare_kick_log(ctx.author, user, case)
 
     @commands.guild_only()
     @commands.bot_has_guild_permissions(ban_members=True)
@@ -474,7 +509,7 @@ class ModActions(commands.Cog):
                 if user in previous_bans:
                     raise commands.BadArgument("That user is already banned!")
 
-        log = await self.add_ban_case(ctx, user, reason)
+        case, log = await self.add_ban_case(ctx, user, reason)
 
         try:
             await user.send(f"You were banned from {ctx.guild.name}", embed=log)
@@ -495,7 +530,8 @@ class ModActions(commands.Cog):
         if public_chan:
             log.remove_author()
             log.set_thumbnail(url=user.avatar_url)
-            await public_chan.send(embed=log)
+            message = await public_chan.send(embed=log)
+            await ctx.settings.index_case_log(case._id, message)
 
     async def add_ban_case(self,  ctx: context.Context, user, reason):
         # prepare the case to store in DB
@@ -513,7 +549,7 @@ class ModActions(commands.Cog):
         # add case to db
         await ctx.settings.add_case(user.id, case)
         # prepare log embed to send to #public-mod-logs, user and context
-        return await logging.prepare_ban_log(ctx.author, user, case)
+        return case, await logging.prepare_ban_log(ctx.author, user, case)
 
     @commands.guild_only()
     @commands.bot_has_guild_permissions(ban_members=True)
@@ -566,7 +602,8 @@ class ModActions(commands.Cog):
         if public_chan:
             log.remove_author()
             log.set_thumbnail(url=user.avatar_url)
-            await public_chan.send(embed=log)
+            message = await public_chan.send(embed=log)
+            await ctx.settings.index_case_log(case._id, message)
 
     @commands.guild_only()
     @commands.bot_has_guild_permissions(manage_messages=True)
@@ -592,11 +629,27 @@ class ModActions(commands.Cog):
         elif limit >= 100:
             limit = 100
 
-        msgs = await ctx.channel.history(limit=limit+1).flatten()
+        # the Logging cog would otherwise log this purge from the message cache,
+        # which doesn't have every message. we log it ourselves with the full list instead.
+        logs = self.bot.get_cog("Logging")
+        if logs is not None:
+            logs.pending_purges.add(ctx.channel.id)
+        try:
+            msgs = await ctx.channel.purge(limit=limit+1)
+            if logs is not None:
+                # the bulk delete event can still be on its way, so the messages have to be
+                # marked before the channel stops being skipped
+                for message in msgs:
+                    logs.purged_messages[message.id] = True
+        finally:
+            if logs is not None:
+                logs.pending_purges.discard(ctx.channel.id)
 
-        await ctx.channel.purge(limit=limit+1)
         await ctx.send(f'Purged {len(msgs)} messages.', delete_after=10)
 
+        if logs is not None and msgs:
+            await logs.log_bulk_delete(msgs)
+
     @commands.guild_only()
     @commands.bot_has_guild_permissions(manage_roles=True)
     @permissions.mod_and_up()
@@ -684,7 +737,8 @@ class ModActions(commands.Cog):
         public_chan = ctx.guild.get_channel(
             ctx.settings.guild().channel_public)
         if public_chan:
-            await public_chan.send(user.mention if not dmed else "", embed=log)
+            message = await public_chan.send(user.mention if not dmed else "", embed=log)
+            await ctx.settings.index_case_log(case._id, message)
 
 
     @commands.guild_only()
@@ -746,7 +800,8 @@ class ModActions(commands.Cog):
         if public_chan:
             log.remove_author()
             log.set_thumbnail(url=user.avatar_url)
-            await public_chan.send(user.mention if not dmed else "", embed=log)
+            message = await public_chan.send(user.mention if not dmed else "", embed=log)
+            await ctx.settings.index_case_log(case._id, message)
 
     @commands.guild_only()
     @commands.bot_has_guild_permissions(manage_channels=True)
@@ -768,7 +823,8 @@ class ModActions(commands.Cog):
         if channel is None:
             channel = ctx.channel
 
-        if await self.lock_unlock_channel(ctx, channel, True) is not None:
+        report = await Lockdown(ctx.guild, ctx.settings.guild()).run([channel], lock=True)
+        if report.changed:
             await ctx.send_success(f"Locked {channel.mention}!", delete_after=5)
             await ctx.message.delete(delay=5)
         else:
@@ -794,7 +850,8 @@ class ModActions(commands.Cog):
         if channel is None:
             channel = ctx.channel
 
-        if await self.lock_unlock_channel(ctx, channel) is not None:
+        report = await Lockdown(ctx.guild, ctx.settings.guild()).run([channel], lock=False)
+        if report.changed:
             await ctx.send_success(f"Unocked {channel.mention}!", delete_after=5)
             await ctx.message.delete(delay=5)
         else:
@@ -842,17 +899,14 @@ class ModActions(commands.Cog):
         if not channels:
             raise commands.BadArgument("No freezeable channels! Set some using `!freezeable`.")
 
-        locked = []
         with ctx.typing():
-            for channel in channels:
-                channel = ctx.guild.get_channel(channel)
-                if channel is not None:
-                    if await self.lock_unlock_channel(ctx, channel, lock=True):
-                        locked.append(channel)
-
-        if locked:
-            await ctx.send_success(f"Locked {len(locked)} channels!", delete_after=5)
+            report = await Lockdown(ctx.guild, ctx.settings.guild()).run_ids(channels, lock=True)
+
+        if report.changed:
+            await ctx.send_success(f"{report.summary()}!", delete_after=5 if not report.failed else None)
             await ctx.message.delete(delay=5)
+        elif report.failed:
+            raise commands.BadArgument(f"{report.summary()}.")
         else:
             raise commands.BadArgument("Server is already locked or my permissions are wrong.")
 
@@ -874,45 +928,17 @@ class ModActions(commands.Cog):
         if not channels:
             raise commands.BadArgument("No unfreezeable channels! Set some using `!freezeable`.")
 
-        unlocked = []
         with ctx.typing():
-            for channel in channels:
-                channel = ctx.guild.get_channel(channel)
-                if channel is not None:
-                    if await self.lock_unlock_channel(ctx, channel, lock=None):
-                        unlocked.append(channel)
-
-        if unlocked:
-            await ctx.send_success(f"Unlocked {len(unlocked)} channels!", delete_after=5)
+            report = await Lockdown(ctx.guild, ctx.settings.guild()).run_ids(channels, lock=False)
+
+        if report.changed:
+            await ctx.send_success(f"{report.summary()}!", delete_after=5 if not report.failed else None)
             await ctx.message.delete(delay=5)
+        elif report.failed:
+            raise commands.BadArgument(f"{report.summary()}.")
         else:
             raise commands.BadArgument("Server is already unlocked or my permissions are wrong.")
 
-    async def lock_unlock_channel(self,  ctx: context.Context, channel, lock=None):
-        settings = ctx.settings.guild()
-
-        default_role = ctx.guild.default_role
-        member_plus = ctx.guild.get_role(settings.role_memberplus)
-
-        default_perms = channel.overwrites_for(default_role)
-        memberplus_perms = channel.overwrites_for(member_plus)
-
-        if lock and default_perms.send_messages is None and memberplus_perms.send_messages is None:
-            default_perms.send_messages = False
-            memberplus_perms.send_messages = True
-        elif lock is None and (not default_perms.send_messages) and memberplus_perms.send_messages:
-            default_perms.send_messages = None
-            memberplus_perms.send_messages = None
-        else:
-            return
-
-        try:
-            await channel.set_permissions(default_role, overwrite=default_perms, reason="Locked!" if lock else "Unlocked!")
-            await channel.set_permissions(member_plus, overwrite=memberplus_perms, reason="Locked!" if lock else "Unlocked!")
-            return True
-        except Exception:
-            return
-
     @lock.error
     @unlock.error
     @freezeable.error
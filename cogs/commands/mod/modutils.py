@@ -1,12 +1,14 @@
 import datetime
-import pytz
+import re
 import traceback
 import typing
 import humanize
+import pytimeparse
 
 import discord
 import cogs.utils.permission_checks as permissions
 import cogs.utils.context as context
+from cogs.monitors.birthday import VALID_BIRTHDAYS, eastern, next_midnight
 from data.case import Case
 from discord.ext import commands
 
@@ -245,9 +247,7 @@ class ModUtils(commands.Cog):
             await ctx.message.add_reaction("🤔")
             raise commands.BadArgument("You can't call that on me :(")
 
-        try:
-            datetime.datetime(year=2020, month=month, day=date, hour=12)
-        except ValueError:
+        if (month, date) not in VALID_BIRTHDAYS:
             raise commands.BadArgument("You gave an invalid date.")
 
         results = await ctx.settings.user(user.id)
@@ -260,26 +260,106 @@ class ModUtils(commands.Cog):
         if results.birthday_excluded:
             return
 
-        eastern = pytz.timezone('US/Eastern')
-        today = datetime.datetime.today().astimezone(eastern)
+        today = datetime.datetime.now(eastern)
         if today.month == month and today.day == date:
             birthday_role = ctx.guild.get_role(ctx.settings.guild().role_birthday)
             if birthday_role is None:
                 return
             if birthday_role in user.roles:
                 return
-            now = datetime.datetime.now(eastern)
-            h = now.hour / 24
-            m = now.minute / 60 / 24
 
             try:
-                time = now + datetime.timedelta(days=1-h-m)
-                ctx.settings.tasks.schedule_remove_bday(user.id, time)
+                ctx.settings.tasks.schedule_remove_bday(user.id, next_midnight())
             except Exception as e:
                 return
             await user.add_roles(birthday_role)
             await user.send(f"According to my calculations, today is your birthday! We've given you the {birthday_role} role for 24 hours.")
 
+    @commands.guild_only()
+    @permissions.mod_and_up()
+    @commands.command(name="searchmessages", aliases=["msgsearch"])
+    async def searchmessages(self, ctx: context.Context, *, query: str) -> None:
+        """Search the message archive, which includes deleted and edited messages (mod only)
+
+        Example usage
+        -------------
+        !searchmessages user:<@user/ID> channel:<#channel/ID> after:<1d> before:<2h> <text>
+
+        Parameters
+        ----------
+        query : str
+            Filters and text to search for. Every part is optional, but at least one is needed.
+            `after` and `before` are durations relative to now
+        """
+
+        author_id = None
+        channel_id = None
+        after = None
+        before = None
+        words = []
+
+        for word in query.split():
+            match = re.match(r"^(user|channel|after|before):(.+)$", word, re.IGNORECASE)
+            if match is None:
+                words.append(word)
+                continue
+
+            key, value = match.group(1).lower(), match.group(2)
+            if key in ["user", "channel"]:
+                value = re.sub(r"\D", "", value)
+                if not value:
+                    raise commands.BadArgument(f"Invalid {key}, use a mention or an ID.")
+                if key == "user":
+                    author_id = int(value)
+                else:
+                    channel_id = int(value)
+            else:
+                delta = pytimeparse.parse(value)
+                if delta is None:
+                    raise commands.BadArgument(f"Invalid duration for `{key}`, use something like `2h` or `3d`.")
+                when = datetime.datetime.utcnow() - datetime.timedelta(seconds=delta)
+                if key == "after":
+                    after = when
+                else:
+                    before = when
+
+        text = " ".join(words) or None
+        if text is None and author_id is None and channel_id is None and after is None and before is None:
+            raise commands.BadArgument("You need to give me something to search for.")
+
+        async with ctx.typing():
+            results = await ctx.settings.message_archive.search(text=text, author_id=author_id, channel_id=channel_id, after=after, before=before)
+
+        if not results:
+            raise commands.BadArgument("No archived messages matched that search.")
+
+        embed = discord.Embed(title="Message archive")
+        embed.color = discord.Color.blurple()
+        for record in results:
+            author = ctx.guild.get_member(record.author_id) or self.bot.get_user(record.author_id) or record.author_id
+            channel = ctx.guild.get_channel(record.channel_id)
+            flags = []
+            if record.event == "edit":
+                flags.append("edited")
+            if record.deleted:
+                flags.append("deleted")
+
+            content = record.content or "*No content*"
+            if len(content) > 200:
+                content = content[0:200] + "..."
+            for attachment in record.attachments:
+                content += f"\n{attachment}"
+            content += f"\n[Link to message]({record.jump_url(ctx.guild.id)})"
+
+            name = f"{author} in #{channel.name if channel is not None else record.channel_id}"
+            name += f" | {record.created_at.strftime('%B %d, %Y, %I:%M %p')} UTC"
+            if flags:
+                name += f" ({', '.join(flags)})"
+            embed.add_field(name=name, value=content[:1024], inline=False)
+
+        embed.set_footer(text=f"Showing the {len(results)} newest results")
+        await ctx.message.reply(embed=embed)
+
     async def prepare_rundown_embed(self,  ctx: context.Context, user):
         user_info = await ctx.settings.user(user.id)
         joined = user.joined_at.strftime("%B %d, %Y, %I:%M %p")
@@ -333,6 +413,7 @@ class ModUtils(commands.Cog):
 
         return embed
 
+    @searchmessages.error
     @musicban.error
     @birthdayexclude.error
     @removebirthday.error
@@ -6,42 +6,28 @@ from discord import member
 import cogs.utils.permission_checks as permissions
 import cogs.utils.context as context
 import discord
-from discord.ext import commands, menus
+from cogs.utils.pagination import FilteredQueryPageSource, MenuPages
+from discord.ext import commands
 
 
-class LeaderboardSource(menus.GroupByPageSource):
-    async def format_page(self, menu, entry):
+class LeaderboardSource(FilteredQueryPageSource):
+    async def format_page(self, menu, entries):
         embed = discord.Embed(
             title=f'Trivia leaderboard', color=discord.Color.blurple())
-        for i, user in entry.items:
+        trophies = [':first_place:', ':second_place:', ':third_place:']
+        for i, user in entries:
             member = menu.ctx.guild.get_member(user._id)
             trophy = ''
-            if menu.current_page == 0:
-                if i == entry.items[0][0]:
-                    trophy = ':first_place:'
+            if i < len(trophies):
+                trophy = trophies[i]
+                if i == 0:
                     embed.set_thumbnail(url=member.avatar_url)
-                elif i == entry.items[1][0]:
-                    trophy = ':second_place:'
-                elif i == entry.items[2][0]:
-                    trophy = ':third_place:'
-            
-            
+
             embed.add_field(name=f"#{i+1} - {user.trivia_points} points",
                             value=f"{trophy} {member.mention}", inline=False)
-            
-        embed.set_footer(
-            text=f"Page {menu.current_page +1} of {self.get_max_pages()}")
-        return embed
 
-
-class MenuPages(menus.MenuPages):
-    async def update(self, payload):
-        if self._can_remove_reactions:
-            if payload.event_type == 'REACTION_ADD':
-                await self.message.remove_reaction(payload.emoji, payload.member)
-            elif payload.event_type == 'REACTION_REMOVE':
-                return
-        await super().update(payload)
+        embed.set_footer(text=self.footer(menu))
+        return embed
 
 
 class Giveaway(commands.Cog):
@@ -139,15 +125,14 @@ class Giveaway(commands.Cog):
         """Show trivia leaderboard for top 100, ranked highest to lowest.
         """
 
-        results = enumerate(await ctx.settings.trivia_leaderboard())
-        # ctx.user_cache = self.user_cache
-        results = [ (i, m) for (i, m) in results if ctx.guild.get_member(m._id) is not None and m.trivia_points != 0][0:100]
-        if len(results) == 0:
+        source = LeaderboardSource(await ctx.settings.trivia_leaderboard(), per_page=10,
+                                   check=lambda user: ctx.guild.get_member(user._id) is not None, limit=100)
+        await source.prepare()
+        if not source.entries:
             raise commands.BadArgument("The leaderboard is currently empty.")
-        
-        menus = MenuPages(source=LeaderboardSource(
-            results, key=lambda t: 1, per_page=10), clear_reactions_after=True)
-        
+
+        menus = MenuPages(source=source, clear_reactions_after=True)
+
         await menus.start(ctx)
 
     @points.error
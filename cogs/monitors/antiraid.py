@@ -6,6 +6,7 @@ from re import U
 import cogs.utils.logs as logger
 import cogs.utils.context as context
 import discord
+from cogs.utils.lockdown import Lockdown
 from data.case import Case
 from discord.ext import commands
 from expiringdict import ExpiringDict
@@ -307,31 +308,12 @@ class AntiRaidMonitor(commands.Cog):
             if public_logs:
                 log.remove_author()
                 log.set_thumbnail(url=user.avatar_url)
-                await public_logs.send(embed=log)
+                message = await public_logs.send(embed=log)
+                await self.bot.settings.index_case_log(case._id, message)
 
     async def freeze_server(self, guild):
         settings = self.bot.settings.guild()
-        
-        for channel in settings.locked_channels:
-            channel = guild.get_channel(channel)
-            if channel is None:
-                continue
-            
-            default_role = guild.default_role
-            member_plus = guild.get_role(settings.role_memberplus)   
-            
-            default_perms = channel.overwrites_for(default_role)
-            memberplus_perms = channel.overwrites_for(member_plus)
-
-            if default_perms.send_messages is None and memberplus_perms.send_messages is None:
-                default_perms.send_messages = False
-                memberplus_perms.send_messages = True
-
-                try:
-                    await channel.set_permissions(default_role, overwrite=default_perms, reason="Locked!")
-                    await channel.set_permissions(member_plus, overwrite=memberplus_perms, reason="Locked!")
-                except Exception:
-                    pass
+        await Lockdown(guild, settings).run_ids(settings.locked_channels, lock=True)
 
 
 def setup(bot):
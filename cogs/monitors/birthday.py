@@ -1,56 +1,94 @@
+import asyncio
 import discord
+from calendar import monthrange
 from datetime import datetime, timedelta
 import pytz
 import traceback
 import cogs.utils.permission_checks as permissions
 import cogs.utils.context as context
-from discord.ext import tasks, commands
+from discord.ext import commands
+
+eastern = pytz.timezone('US/Eastern')
+
+# every (month, day) pair someone can have as their birthday, including February 29th
+VALID_BIRTHDAYS = {(month, day) for month in range(1, 13) for day in range(1, monthrange(2020, month)[1] + 1)}
+
+# how many members get their birthday role at the same time
+ROLE_CONCURRENCY = 5
+
+
+def next_midnight() -> datetime:
+    """The start of the next day in US/Eastern, which is when birthdays change
+    """
+
+    tomorrow = datetime.now(eastern).date() + timedelta(days=1)
+    return eastern.localize(datetime(tomorrow.year, tomorrow.month, tomorrow.day))
+
 
 class Birthday(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.birthday.start()
+        self.birthday_task = bot.loop.create_task(self.birthday_loop())
 
     def cog_unload(self):
-        self.birthday.cancel()
+        self.birthday_task.cancel()
+
+    async def birthday_loop(self):
+        """Hand out birthday roles once when we start up, in case we were offline at midnight,
+        and then once at the start of every day.
+        """
+
+        await self.bot.wait_until_ready()
+        await self.bot.cache_profile.members_ready.wait()
+        while self.bot.settings.tasks is None:
+            await asyncio.sleep(1)
+
+        while not self.bot.is_closed():
+            try:
+                await self.birthday()
+            except Exception:
+                traceback.print_exc()
+            await discord.utils.sleep_until(next_midnight())
 
-    @tasks.loop(seconds=900)
     async def birthday(self):
-        eastern = pytz.timezone('US/Eastern')
-        today = datetime.today().astimezone(eastern)
-        date = [today.month, today.day]
-        birthdays = await self.bot.settings.retrieve_birthdays(date)
         guild = self.bot.get_guild(self.bot.settings.guild_id)
-
         if not guild:
             return
         birthday_role = guild.get_role(self.bot.settings.guild().role_birthday)
         if not birthday_role:
             return
+
+        today = datetime.now(eastern)
+        birthdays = await self.bot.settings.retrieve_birthdays([today.month, today.day])
+
+        members = []
         for person in birthdays:
-            if person.birthday_excluded:
-                continue
             user = guild.get_member(person._id)
-            if user is None:
-                return
-            if birthday_role in user.roles:
-                continue
-            
-            now = datetime.now(eastern)
-            h = now.hour / 24
-            m = now.minute / 60 / 24
-
-            try:
-                time = now + timedelta(days=1-h-m)
-                self.bot.settings.tasks.schedule_remove_bday(user.id, time)
-            except Exception as e:
+            if user is None or birthday_role in user.roles:
                 continue
-            await user.add_roles(birthday_role)
+            members.append(user)
+
+        # users who already have a removal scheduled got their role earlier today
+        until = next_midnight()
+        scheduled = set(self.bot.settings.tasks.schedule_many([("remove_bday", user.id, until, [user.id]) for user in members]))
+        members = [user for user in members if f"remove_bday:{user.id}" in scheduled]
+
+        semaphore = asyncio.Semaphore(ROLE_CONCURRENCY)
+
+        async def give_role(user):
+            async with semaphore:
+                try:
+                    await user.add_roles(birthday_role)
+                except discord.HTTPException:
+                    traceback.print_exc()
+                    return
             try:
-                await user.send(f"According to my calculations, today is your birthday! We've given you the {birthday_role} role for 36 hours.")
+                await user.send(f"According to my calculations, today is your birthday! We've given you the {birthday_role} role for 24 hours.")
             except Exception:
                 pass
-            
+
+        await asyncio.gather(*[give_role(user) for user in members])
+
     @commands.guild_only()
     @permissions.bot_channel_only_unless_mod()
     @commands.command(name="mybirthday")
@@ -74,9 +112,7 @@ class Birthday(commands.Cog):
         if not (ctx.permissions.hasAtLeast(ctx.guild, ctx.author, 1) or user.premium_since is not None):
             raise commands.BadArgument(
                 "You need to be at least Member+ or a Nitro booster to use that command.")
-        try:
-            datetime(year=2020, month=month, day=date, hour=12)
-        except ValueError:
+        if (month, date) not in VALID_BIRTHDAYS:
             raise commands.BadArgument("You gave an invalid date.")
 
         results = await ctx.settings.user(user.id)
@@ -94,8 +130,7 @@ class Birthday(commands.Cog):
         await ctx.message.reply(f"{user.mention}'s birthday was set.", allowed_mentions=discord.AllowedMentions(everyone=False, users=False, roles=False), delete_after=5)
         await ctx.message.delete(delay=5)
 
-        eastern = pytz.timezone('US/Eastern')
-        today = datetime.today().astimezone(eastern)
+        today = datetime.now(eastern)
         if today.month == month and today.day == date:
             birthday_role = ctx.guild.get_role(ctx.settings.guild().role_birthday)
             if birthday_role is None:
@@ -103,14 +138,9 @@ class Birthday(commands.Cog):
 
             if birthday_role in user.roles:
                 return
-            
-            now = datetime.now(eastern)
-            h = now.hour / 24
-            m = now.minute / 60 / 24
 
             try:
-                time = now + timedelta(days=1-h-m)
-                ctx.tasks.schedule_remove_bday(user.id, time)
+                ctx.tasks.schedule_remove_bday(user.id, next_midnight())
             except Exception:
                 return
             await user.add_roles(birthday_role)
@@ -1,10 +1,16 @@
 import discord
 from discord.ext import commands
-import aiohttp
 import re
 import cogs.utils.context as context
 import asyncio
 
+# Discord's limit for emojis
+MAX_EMOJI_SIZE = 256000
+# a custom emoji, or a link to an image
+CONTENT_PATTERN = re.compile(
+    r"<(?P<animated>a?):(?P<name>\w+):(?P<id>\d+)>"
+    r"|(?P<link>https?:\/\/(www\.)?[-a-zA-Z0-9@:%._\+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}\b([-a-zA-Z0-9()@:%_\+.~#?&//=]*))")
+
 
 class BoosterEmojis(commands.Cog):
     def __init__(self, bot):
@@ -103,32 +109,22 @@ class BoosterEmojis(commands.Cog):
             pass
 
     async def get_bytes(self, msg):
-        custom_emojis = re.findall(r'<:\d+>|<:.+?:\d+>', msg.content)
-        if len(custom_emojis) == 1:
-            name = custom_emojis[0].split(':')[1]
-        custom_emojis = [int(e.split(':')[2].replace('>', '')) for e in custom_emojis]
-        custom_emojis = [f"https://cdn.discordapp.com/emojis/{e}.png?v=1" for e in custom_emojis]
-
-        custom_emojis_gif = re.findall(r'<a:.+:\d+>|<:.+?:\d+>', msg.content)
-        if len(custom_emojis_gif) == 1:
-            name = custom_emojis_gif[0].split(':')[1]
-        custom_emojis_gif = [int(e.split(':')[2].replace('>', '')) for e in custom_emojis_gif]
-        custom_emojis_gif = [f"https://cdn.discordapp.com/emojis/{e}.gif?v=1" for e in custom_emojis_gif]
-        pattern = re.compile(
-            r"(https?:\/\/(www\.)?[-a-zA-Z0-9@:%._\+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}\b([-a-zA-Z0-9()@:%_\+.~#?&//=]*))")
-        link = pattern.search(msg.content)
-        if (link):
-            if link.group(0):
-                link = link.group(0)
-
-        if len(custom_emojis) > 1 or len(custom_emojis_gif) > 1 or len(msg.attachments) > 1:
+        emojis = []
+        link = None
+        for match in CONTENT_PATTERN.finditer(msg.content):
+            if match.group('id') is not None:
+                emojis.append(match)
+                if len(emojis) > 1:
+                    break
+            elif link is None:
+                link = match.group('link')
+
+        if len(emojis) > 1 or len(msg.attachments) > 1:
             return None, None
-        elif len(custom_emojis) == 1:
-            emoji = custom_emojis[0]
-            return await self.do_content_parsing(emoji), name
-        elif len(custom_emojis_gif) == 1:
-            emoji = custom_emojis_gif[0]
-            return await self.do_content_parsing(emoji), name
+        elif len(emojis) == 1:
+            emoji = emojis[0]
+            extension = "gif" if emoji.group('animated') else "png"
+            return await self.do_content_parsing(f"https://cdn.discordapp.com/emojis/{emoji.group('id')}.{extension}?v=1"), emoji.group('name')
         elif len(msg.attachments) == 1:
             url = msg.attachments[0].url
             return await self.do_content_parsing(url), None
@@ -145,20 +141,8 @@ class BoosterEmojis(commands.Cog):
             await msg.add_reaction('❓')
 
     async def do_content_parsing(self, url):
-        async with aiohttp.ClientSession() as session:
-            async with session.head(url) as resp:
-                if resp.status != 200:
-                    return None
-                elif resp.headers["CONTENT-TYPE"] not in ["image/png", "image/jpeg", "image/gif", "image/webp"]:
-                    return None
-                elif int(resp.headers['CONTENT-LENGTH']) > 257000:
-                    raise commands.BadArgument(f"Image was too big ({int(int(resp.headers['CONTENT-LENGTH'])/1000)}KB)")
-                else:
-                    async with session.get(url) as resp2:
-                        if resp2.status != 200:
-                            return None
-
-                        return await resp2.read()
+        image, _ = await self.bot.image_ingest.fetch(url, MAX_EMOJI_SIZE)
+        return image
 
 
 def setup(bot):
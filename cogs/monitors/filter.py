@@ -12,7 +12,24 @@ class FilterMonitor(commands.Cog):
         self.bot = bot
 
     @commands.Cog.listener()
-    async def on_message_edit(self, _: discord.Message, after: discord.Message):
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent):
+        # on_message_edit only fires for messages in discord.py's cache, which we keep small.
+        # Content edits come with the whole message, so we can rebuild it from the payload instead
+        data = payload.data
+        if "content" not in data or "author" not in data:
+            return
+        if data.get("guild_id") is None or int(data["guild_id"]) != self.bot.settings.guild_id:
+            return
+
+        channel = self.bot.get_channel(payload.channel_id)
+        if channel is None:
+            return
+
+        try:
+            after = discord.Message(state=self.bot._connection, channel=channel, data=data)
+        except KeyError:
+            return
+
         await self.bot.filter(after)
 
     @commands.Cog.listener()
@@ -46,7 +63,6 @@ class FilterMonitor(commands.Cog):
         if member.guild.id != self.bot.settings.guild_id:
             return
 
-        guild = self.bot.settings.guild()
         nick = member.display_name
 
         symbols = (u"абвгдеёжзийклмнопрстуфхцчшщъыьэюяАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ",
@@ -58,7 +74,7 @@ class FilterMonitor(commands.Cog):
         folded_without_spaces = "".join(folded_message.split())
         folded_without_spaces_and_punctuation = folded_without_spaces.translate(str.maketrans('', '', string.punctuation))
         if folded_message:
-            for word in guild.filter_words:
+            for word in self.bot.settings.filter_words():
                 if not self.bot.settings.permissions.hasAtLeast(member.guild, member, word.bypass):
                     if (word.word.lower() in folded_message) or \
                         (not word.false_positive and word.word.lower() in folded_without_spaces) or \
@@ -1,19 +1,163 @@
 import traceback
 from datetime import datetime
-from io import BytesIO
 
 import discord
 from discord.ext import commands
-from collections import defaultdict
+from discord.ext import tasks
+from expiringdict import ExpiringDict
 import cogs.utils.context as context
+from cogs.utils.archive import ArchiveWriter
+from cogs.utils.message_archive import ArchivedMessage
+from cogs.utils.message_cooldown import BucketType, MessageCooldownMapping
 from fold_to_ascii import fold
 from typing import List
 
+# a webhook message can hold at most 10 embeds, with at most 6000 characters between them
+MAX_EMBEDS = 10
+MAX_EMBEDS_LENGTH = 6000
+
 class Logging(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.webhook_dict = defaultdict(lambda: False)
-        self.emoji_webhook = defaultdict(lambda: False)
+        self.emoji_webhook = None
+
+        # reactions are logged one by one until a single user or the whole guild gets noisy,
+        # after which they are collapsed into a periodic digest
+        self.reaction_user_rate = MessageCooldownMapping.from_cooldown(3, 30.0, BucketType.message)
+        self.reaction_guild_rate = commands.CooldownMapping.from_cooldown(15, 60.0, commands.BucketType.guild)
+        self.reaction_digest = {}
+        self.reaction_digest_loop.start()
+
+        # channels with a !purge in progress, and the messages it deleted
+        self.pending_purges = set()
+        self.purged_messages = ExpiringDict(max_len=1000, max_age_seconds=60)
+
+    def cog_unload(self):
+        self.reaction_digest_loop.cancel()
+        self.bot.loop.create_task(self.bot.settings.message_archive.flush())
+
+    async def get_emoji_webhook(self, guild: discord.Guild):
+        """Returns the webhook used for emoji logging, creating it if we don't have one yet.
+        The webhook is cached after the first lookup, so after that we don't touch the database
+        or the API to find it.
+
+        Parameters
+        ----------
+        guild : discord.Guild
+            The main guild
+
+        Returns
+        -------
+        discord.Webhook
+            The webhook, or None if the emoji log channel isn't set up
+        """
+
+        if self.emoji_webhook is not None:
+            return self.emoji_webhook
+
+        db_guild = self.bot.settings.guild()
+        if db_guild.emoji_logging_webhook is not None:
+            try:
+                self.emoji_webhook = await self.bot.fetch_webhook(db_guild.emoji_logging_webhook)
+                return self.emoji_webhook
+            except Exception:
+                pass
+
+        channel = guild.get_channel(db_guild.channel_emoji_log)
+        if channel is None:
+            return None
+
+        self.emoji_webhook = await channel.create_webhook(name="logging emojis")
+        await self.bot.settings.save_emoji_webhook(self.emoji_webhook.id)
+        return self.emoji_webhook
+
+    async def send_to_emoji_webhook(self, embeds):
+        guild = self.bot.get_guild(self.bot.settings.guild_id)
+        if guild is None:
+            return
+
+        webhook = await self.get_emoji_webhook(guild)
+        if webhook is None:
+            return
+
+        for batch in self.batch_embeds(embeds):
+            try:
+                await webhook.send(
+                    username=str(self.bot.user.name),
+                    avatar_url=self.bot.user.avatar_url,
+                    embeds=batch
+                )
+            except discord.NotFound:
+                # webhook was deleted, make a new one next time
+                self.emoji_webhook = None
+                return
+            except discord.HTTPException:
+                print(f"Couldn't send {len(batch)} embeds to the emoji log")
+                traceback.print_exc()
+
+    @staticmethod
+    def batch_embeds(embeds):
+        """Split embeds into groups that fit in a single message, by count and by total length
+        """
+
+        batch = []
+        length = 0
+        for embed in embeds:
+            if batch and (len(batch) == MAX_EMBEDS or length + len(embed) > MAX_EMBEDS_LENGTH):
+                yield batch
+                batch = []
+                length = 0
+            batch.append(embed)
+            length += len(embed)
+
+        if batch:
+            yield batch
+
+    def add_to_reaction_digest(self, reaction: discord.Reaction, member: discord.Member):
+        key = (member.id, str(reaction.emoji), reaction.message.id)
+        entry = self.reaction_digest.get(key)
+        if entry is None:
+            self.reaction_digest[key] = {
+                "member": f"{member} ({member.id})",
+                "emoji": str(reaction.emoji),
+                "message": f"[Link to message]({reaction.message.jump_url}) by {reaction.message.author} ({reaction.message.author.id})",
+                "count": 1
+            }
+        else:
+            entry["count"] += 1
+
+    @tasks.loop(seconds=60)
+    async def reaction_digest_loop(self):
+        await self.flush_reaction_digest()
+
+    @reaction_digest_loop.before_loop
+    async def before_reaction_digest_loop(self):
+        await self.bot.wait_until_ready()
+
+    @reaction_digest_loop.after_loop
+    async def after_reaction_digest_loop(self):
+        await self.flush_reaction_digest()
+
+    async def flush_reaction_digest(self):
+        if not self.reaction_digest:
+            return
+
+        entries = list(self.reaction_digest.values())
+        self.reaction_digest = {}
+        total = sum(entry["count"] for entry in entries)
+
+        embeds = []
+        for i in range(0, len(entries), 10):
+            embed = discord.Embed(title="Reaction digest")
+            embed.color = discord.Color.dark_green()
+            embed.description = f"{total} reactions were collapsed into this digest because a lot of reactions were being added."
+            for entry in entries[i:i+10]:
+                embed.add_field(
+                    name=entry["member"], value=f'{entry["emoji"]} x{entry["count"]}\n{entry["message"]}', inline=False)
+            embed.timestamp = datetime.now()
+            embeds.append(embed)
+
+        await self.send_to_emoji_webhook(embeds)
 
     @commands.Cog.listener()
     async def on_reaction_add(self, reaction: discord.Reaction, member: discord.Member):
@@ -24,26 +168,15 @@ class Logging(commands.Cog):
         if member.guild.id != self.bot.settings.guild_id:
             return
 
-        webhook_id = self.bot.settings.guild().emoji_logging_webhook
-        webhook = None
-
-        if webhook_id is not None:
-            webhook = self.webhook_dict[webhook_id]
-            if not webhook:
-                try:
-                    webhook = await self.bot.fetch_webhook(webhook_id)
-                    self.webhook_dict[webhook_id] = webhook
-                except Exception:
-                    pass
-
-        if webhook_id is None or webhook is None:
-            channel = member.guild.get_channel(self.bot.settings.guild().channel_emoji_log)
-            if channel:
-                webhook = await channel.create_webhook(name="logging emojis")
-                self.webhook_dict[webhook.id] = webhook_id
-                await self.bot.settings.save_emoji_webhook(webhook.id)
-            else:
-                return
+        current = datetime.now().timestamp()
+        # check both buckets so each keeps counting, even if the first one is already exhausted
+        user_storm = self.reaction_user_rate.get_bucket(member.id).update_rate_limit(current) is not None
+        guild_storm = self.reaction_guild_rate.get_bucket(reaction.message).update_rate_limit(current) is not None
+
+        if user_storm or guild_storm:
+            # too many reactions right now, collapse them into the next digest
+            self.add_to_reaction_digest(reaction, member)
+            return
 
         embed = discord.Embed(title="Member added reaction")
         embed.color = discord.Color.green()
@@ -56,14 +189,7 @@ class Logging(commands.Cog):
         embed.timestamp = datetime.now()
         embed.set_footer(text=member.id)
 
-        try:
-            await webhook.send(
-                username=str(self.bot.user.name),
-                avatar_url=self.bot.user.avatar_url,
-                embed=embed
-            )
-        except Exception:
-            pass
+        await self.send_to_emoji_webhook([embed])
 
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member) -> None:
@@ -126,31 +252,81 @@ class Logging(commands.Cog):
         await channel.send(embed=embed)
 
     @commands.Cog.listener()
-    async def on_message_edit(self, before: discord.Message, after: discord.Message) -> None:
-        """Log message edits with before and after content
+    async def on_message(self, message: discord.Message) -> None:
+        """Keep every message in the main guild in the message cache and the message archive
+
+        Parameters
+        ----------
+        message : discord.Message
+            The message that was sent
+        """
+
+        if not message.guild:
+            return
+        if message.guild.id != self.bot.settings.guild_id:
+            return
+        if message.author.bot:
+            return
+        if not message.content and not message.attachments:
+            return
+
+        self.bot.message_cache.add(message)
+        self.bot.settings.message_archive.add(ArchivedMessage.from_message(message))
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent) -> None:
+        """Log message edits with before and after content, and store the new content in the message archive.
+        The old content comes from the message cache, or the archive if the message isn't cached anymore.
 
         Parameters
         ----------
-        before : discord.Message
-            Before edit message data
-        after : discord.Message
-            Aftere edit message data
+        payload : discord.RawMessageUpdateEvent
+            The raw edit event
         """
 
-        if not before.guild:
+        data = payload.data
+        if "content" not in data or "author" not in data:
+            # embed-only updates don't carry the message content
             return
-        if before.guild.id != self.bot.settings.guild_id:
+        if data.get("guild_id") is None or int(data["guild_id"]) != self.bot.settings.guild_id:
+            return
+        if data["author"].get("bot"):
+            return
+
+        after = ArchivedMessage(
+            payload.message_id,
+            payload.channel_id,
+            int(data["author"]["id"]),
+            discord.utils.snowflake_time(payload.message_id),
+            datetime.utcnow(),
+            "edit",
+            data["content"],
+            [attachment["url"] for attachment in data.get("attachments", [])])
+
+        archive = self.bot.settings.message_archive
+        before = self.bot.message_cache.update(payload.message_id, after.content, tuple(after.attachments))
+        if before is None:
+            before = payload.cached_message or await archive.lookup(payload.message_id)
+        archive.add(after)
+
+        if before is None:
             return
         if not before.content or not after.content or before.content == after.content:
             return
 
-        channel = before.guild.get_channel(self.bot.settings.guild().channel_private)
+        guild = self.bot.get_guild(self.bot.settings.guild_id)
+        channel = guild.get_channel(self.bot.settings.guild().channel_private)
+        author = guild.get_member(after.author_id) or self.bot.get_user(after.author_id)
 
         embed = discord.Embed(title="Message Updated")
         embed.color = discord.Color.orange()
-        embed.set_thumbnail(url=before.author.avatar_url)
-        embed.add_field(
-            name="User", value=f'{before.author} ({before.author.mention})', inline=False)
+        if author is not None:
+            embed.set_thumbnail(url=author.avatar_url)
+            embed.add_field(
+                name="User", value=f'{author} ({author.mention})', inline=False)
+        else:
+            embed.add_field(
+                name="User", value=f'<@{after.author_id}>', inline=False)
         before_content = before.content
         if len(before.content) > 400:
             before_content = before_content[0:400] + "..."
@@ -160,57 +336,123 @@ class Logging(commands.Cog):
         embed.add_field(name="Old message", value=before_content, inline=False)
         embed.add_field(name="New message", value=after_content, inline=False)
         embed.add_field(
-            name="Channel", value=before.channel.mention + f"\n\n[Link to message]({before.jump_url})", inline=False)
+            name="Channel", value=f"<#{after.channel_id}>" + f"\n\n[Link to message]({after.jump_url(guild.id)})", inline=False)
         embed.timestamp = datetime.now()
-        embed.set_footer(text=before.author.id)
+        embed.set_footer(text=after.author_id)
         await channel.send(embed=embed)
 
     @commands.Cog.listener()
     async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent) -> None:
-        """Log message deletes
+        """Log message deletes. The content comes from the message cache, or the message archive
+        if the message isn't cached anymore.
 
         Parameters
         ----------
-        message : discord.Message
-            Message that was deleted
+        payload : discord.RawMessageDeleteEvent
+            The raw delete event
         """
 
-        message = payload.cached_message
-
-        if not message or not message.guild:
-            return
-        if message.guild.id != self.bot.settings.guild_id:
-            return
-        if message.author.bot:
+        if payload.guild_id != self.bot.settings.guild_id:
             return
-        if message.content == "" or not message.content:
+
+        archive = self.bot.settings.message_archive
+        # only messages from users are cached and archived, so no need to check for bots
+        # unless we have to fall back to discord.py's cache
+        cached = self.bot.message_cache.pop(payload.message_id)
+        if cached is not None:
+            record = ArchivedMessage(cached.id, cached.channel_id, cached.author_id, cached.created_at,
+                                     datetime.utcnow(), "create", cached.content, list(cached.attachments))
+        elif payload.cached_message is not None:
+            if payload.cached_message.author.bot:
+                return
+            record = ArchivedMessage.from_message(payload.cached_message)
+        else:
+            record = await archive.lookup(payload.message_id)
+            if record is None:
+                return
+
+        archive.add(ArchivedMessage(record.message_id, record.channel_id, record.author_id,
+                                    record.created_at, datetime.utcnow(), "delete"))
+
+        if not record.content:
             return
 
-        channel = message.guild.get_channel(self.bot.settings.guild().channel_private)
+        guild = self.bot.get_guild(payload.guild_id)
+        channel = guild.get_channel(self.bot.settings.guild().channel_private)
+        author = guild.get_member(record.author_id) or self.bot.get_user(record.author_id)
 
         embed = discord.Embed(title="Message Deleted")
         embed.color = discord.Color.red()
-        embed.set_thumbnail(url=message.author.avatar_url)
-        embed.add_field(
-            name="User", value=f'{message.author} ({message.author.mention})', inline=True)
+        if author is not None:
+            embed.set_thumbnail(url=author.avatar_url)
+            embed.add_field(
+                name="User", value=f'{author} ({author.mention})', inline=True)
+        else:
+            embed.add_field(
+                name="User", value=f'<@{record.author_id}>', inline=True)
         embed.add_field(
-            name="Channel", value=message.channel.mention, inline=True)
-        content = message.content
-        if len(message.content) > 400:
+            name="Channel", value=f'<#{record.channel_id}>', inline=True)
+        content = record.content
+        if len(record.content) > 400:
             content = content[0:400] + "..."
-        embed.add_field(name="Message", value=content + f"\n\n[Link to message]({message.jump_url})", inline=False)
-        embed.set_footer(text=message.author.id)
+        embed.add_field(name="Message", value=content + f"\n\n[Link to message]({record.jump_url(payload.guild_id)})", inline=False)
+        if cached is None and payload.cached_message is None:
+            embed.add_field(name="Sent", value=f"{record.created_at.strftime('%B %d, %Y, %I:%M %p')} UTC (from archive)", inline=False)
+        embed.set_footer(text=record.author_id)
         embed.timestamp = datetime.now()
         await channel.send(embed=embed)
 
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent) -> None:
+        """Log bulk message deletes. Messages are outputted to file and sent to #server-logs.
+        The content comes from the message cache, or the message archive for messages that
+        aren't cached anymore, so we don't depend on discord.py's much smaller cache.
+
+        Parameters
+        ----------
+        payload : discord.RawBulkMessageDeleteEvent
+            The raw bulk delete event
+        """
+
+        if payload.guild_id != self.bot.settings.guild_id:
+            return
+
+        archive = self.bot.settings.message_archive
+        now = datetime.utcnow()
+        records = {}
+        for message_id in payload.message_ids:
+            cached = self.bot.message_cache.pop(message_id)
+            if cached is not None:
+                records[message_id] = ArchivedMessage(cached.id, cached.channel_id, cached.author_id, cached.created_at,
+                                                      now, "create", cached.content, list(cached.attachments))
+        records.update(await archive.lookup_many([message_id for message_id in payload.message_ids if message_id not in records]))
+
+        for message_id in payload.message_ids:
+            record = records.get(message_id)
+            archive.add(ArchivedMessage(message_id, payload.channel_id, record.author_id if record is not None else 0,
+                                        discord.utils.snowflake_time(message_id), now, "delete"))
+
+        # !purge logs its own deletes, with the full list of messages
+        if payload.channel_id in self.pending_purges or any(message_id in self.purged_messages for message_id in payload.message_ids):
+            return
+        if not records:
+            return
+
+        guild = self.bot.get_guild(payload.guild_id)
+        writer = ArchiveWriter()
+        for message_id in sorted(records):
+            record = records[message_id]
+            writer.write_record(record, guild.get_member(record.author_id) or self.bot.get_user(record.author_id))
+
+        await self.post_bulk_delete(guild, writer)
+
     @commands.Cog.listener()
     async def on_command_error(self, ctx: context.Context, error):
         if isinstance(error, commands.CommandNotFound):
             return
 
-    @commands.Cog.listener()
-    async def on_bulk_message_delete(self, messages: List[discord.Message]):
-        """Log bulk message deletes. Messages are outputted to file and sent to #server-logs
+    async def log_bulk_delete(self, messages: List[discord.Message]):
+        """Write a transcript of deleted messages, save it to the archive and post it in #server-logs
 
         Parameters
         ----------
@@ -218,44 +460,32 @@ class Logging(commands.Cog):
             List of messages that were deleted
         """
 
-        if not messages[0].guild:
-            return
-        if messages[0].guild.id != self.bot.settings.guild_id:
+        if not messages:
             return
 
-        members = set()
-        channel = messages[0].guild.get_channel(self.bot.settings.guild().channel_private)
-        output = BytesIO()
+        writer = ArchiveWriter()
         for message in messages:
-            members.add(message.author)
-
-            string = f'{message.author} ({message.author.id}) [{message.created_at.strftime("%B %d, %Y, %I:%M %p")}]) UTC\n'
-            string += message.content
-            for attachment in message.attachments:
-                string += f'\n{attachment.url}'
-
-            string += "\n\n"
-            output.write(string.encode('UTF-8'))
-        output.seek(0)
-
-        member_string = ""
-        for i, member in enumerate(members):
-            if i == len(members) - 1 and i == 0:
-                member_string += f"{member.mention}"
-            elif i == len(members) - 1 and i != 0:
-                member_string += f"and {member.mention}"
-            else:
-                member_string += f"{member.mention}, "
+            writer.write(message)
+
+        await self.post_bulk_delete(messages[0].guild, writer)
+
+    async def post_bulk_delete(self, guild: discord.Guild, writer: ArchiveWriter):
+        await self.bot.settings.bulk_archives.save(writer.channel_id, writer)
+
+        channel = guild.get_channel(self.bot.settings.guild().channel_private)
+        if channel is None:
+            return
 
         embed = discord.Embed(title="Bulk Message Deleted")
         embed.color = discord.Color.red()
         embed.add_field(
-            name="Users", value=f'This batch included {len(messages)} messages from {member_string}', inline=True)
+            name="Users", value=f'This batch included {writer.message_count} messages from {writer.member_string()}', inline=True)
         embed.add_field(
-            name="Channel", value=message.channel.mention, inline=True)
+            name="Channel", value=f'<#{writer.channel_id}>', inline=True)
         embed.timestamp = datetime.now()
         await channel.send(embed=embed)
-        await channel.send(file=discord.File(output, 'message.txt'))
+        for file in writer.files():
+            await channel.send(file=file)
 
     @commands.Cog.listener()
     async def on_member_update(self, before: discord.Message, after: discord.Message):
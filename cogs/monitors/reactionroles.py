@@ -2,15 +2,62 @@ import discord
 from discord.ext import commands
 import cogs.utils.permission_checks as permissions
 import cogs.utils.context as context
+from cogs.utils.reaction_sync import ReactionSync
 import traceback
 import asyncio
 import re
+import time
+
+# how long we wait for more reactions from someone before editing their roles
+TOGGLE_DELAY = 1.5
+# how often repostreactions updates its progress message
+PROGRESS_INTERVAL = 2
+
+
+class RoleToggles:
+    """Collects the roles people toggle with reactions, so someone who picks five roles in a row
+    gets a single edit with all of them instead of one request per role. Toggling the same role
+    twice before the edit cancels out.
+
+    Parameters
+    ----------
+    delay : float, optional
+        How long to wait for more toggles from a member, by default TOGGLE_DELAY
+    """
+
+    def __init__(self, delay: float = TOGGLE_DELAY):
+        self.delay = delay
+        # member ID -> IDs of the roles to toggle
+        self.pending = {}
+
+    def toggle(self, member: discord.Member, role: discord.Role) -> None:
+        toggles = self.pending.get(member.id)
+        if toggles is None:
+            toggles = self.pending[member.id] = set()
+            asyncio.ensure_future(self.flush(member.guild, member.id))
+        toggles ^= {role.id}
+
+    async def flush(self, guild: discord.Guild, member_id: int) -> None:
+        await asyncio.sleep(self.delay)
+        toggles = self.pending.pop(member_id)
+        member = guild.get_member(member_id)
+        if not toggles or member is None:
+            return
+
+        roles = [role for role in member.roles[1:] if role.id not in toggles]
+        current = {role.id for role in member.roles}
+        roles += [guild.get_role(role_id) for role_id in toggles if role_id not in current]
+
+        try:
+            await member.edit(roles=[role for role in roles if role is not None])
+        except Exception:
+            pass
 
 
 class ReactionRoles(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.cached_messages = {}
+        self.role_toggles = RoleToggles()
 
     @commands.command(name='setreactions', hidden=True)
     @commands.guild_only()
@@ -32,7 +79,7 @@ class ReactionRoles(commands.Cog):
         if not ctx.guild.id == ctx.settings.guild_id:
             return
 
-        channel = ctx.guild.get_channel(ctx.settings.guild().channel_reaction_roles)
+        channel = ctx.guild.get_channel(ctx.settings.rero_channel())
 
         if channel is None:
             return
@@ -108,12 +155,11 @@ class ReactionRoles(commands.Cog):
 
         await ctx.settings.add_rero_mapping(reaction_mapping)
         the_string = "Done! We added the following emotes:\n"
-        await message.clear_reactions()
 
         async with ctx.channel.typing():
             for r in reactions:
                 the_string += f"Reaction {str(r)} will give role <@&{reaction_mapping[message.id][str(r.emoji)]}>\n"
-                await message.add_reaction(r)
+            await ReactionSync().run(channel, reaction_mapping)
 
         await ctx.send(the_string, delete_after=10)
 
@@ -137,7 +183,7 @@ class ReactionRoles(commands.Cog):
         if not ctx.guild.id == ctx.settings.guild_id:
             return
 
-        channel = ctx.guild.get_channel(ctx.settings.guild().channel_reaction_roles)
+        channel = ctx.guild.get_channel(ctx.settings.rero_channel())
 
         if channel is None:
             return
@@ -222,7 +268,8 @@ class ReactionRoles(commands.Cog):
         async with ctx.channel.typing():
             for r in reactions:
                 the_string += f"Reaction {str(r)} will give role <@&{reaction_mapping[message.id][str(r.emoji)]}>\n"
-                await message.add_reaction(r)
+            # only adds the new ones, unless the reactions on the message were out of order
+            await ReactionSync().run(channel, {message.id: await ctx.settings.get_rero_mapping(message.id)})
 
         await ctx.send(the_string, delete_after=10)
 
@@ -251,7 +298,7 @@ class ReactionRoles(commands.Cog):
         if before == after:
             raise commands.BadArgument("I can't move to the same message.")
 
-        channel = ctx.guild.get_channel(ctx.settings.guild().channel_reaction_roles)
+        channel = ctx.guild.get_channel(ctx.settings.rero_channel())
 
         if channel is None:
             return
@@ -277,13 +324,11 @@ class ReactionRoles(commands.Cog):
         await ctx.settings.add_rero_mapping(rero_mapping)
         await ctx.settings.delete_rero_mapping(before)
 
-        await after_message.clear_reactions()
-
         the_string = "Done! We added the following emotes:\n"
         async with ctx.channel.typing():
             for r in rero_mapping[after]:
                 the_string += f"Reaction {str(r)} will give role <@&{rero_mapping[after][r]}>\n"
-                await after_message.add_reaction(r)
+            await ReactionSync().run(channel, {after_message.id: rero_mapping[after]})
 
         await ctx.send(the_string, delete_after=10)
 
@@ -291,13 +336,14 @@ class ReactionRoles(commands.Cog):
     @permissions.admin_and_up()
     @commands.guild_only()
     async def repostreactions(self, ctx: context.Context):
-        """Repost all reactions to messages with reaction roles (admin only)
+        """Repost all reactions to messages with reaction roles (admin only). Only reactions that
+        are missing, out of order or not ours are changed, so it can be run again if it was interrupted.
         """
 
         if not ctx.guild.id == ctx.settings.guild_id:
             return
 
-        channel = ctx.guild.get_channel(ctx.settings.guild().channel_reaction_roles)
+        channel = ctx.guild.get_channel(ctx.settings.rero_channel())
 
         if channel is None:
             return
@@ -306,56 +352,50 @@ class ReactionRoles(commands.Cog):
         if rero_mapping is None or rero_mapping == {}:
             raise commands.BadArgument("Nothing to do.")
 
+        status = await ctx.send(f"Syncing reactions... (0/{len(rero_mapping)} messages)")
+        last_update = time.monotonic()
+
+        async def progress(done, total):
+            nonlocal last_update
+            if time.monotonic() - last_update < PROGRESS_INTERVAL:
+                return
+            last_update = time.monotonic()
+            try:
+                await status.edit(content=f"Syncing reactions... ({done}/{total} messages)")
+            except discord.HTTPException:
+                pass
+
         async with ctx.channel.typing():
-            for m in rero_mapping:
-                try:
-                    message = await channel.fetch_message(int(m))
-                except Exception:
-                    continue
-                await message.clear_reactions()
-                for r in rero_mapping[m]:
-                    await message.add_reaction(r)
+            report = await ReactionSync(progress).run(channel, dict(rero_mapping))
 
         await ctx.message.delete()
-        await ctx.send("Done!", delete_after=5)
+        await status.edit(content=report.summary(), delete_after=10)
 
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload):
+        if not payload.guild_id:
+            return
         if payload.member.bot:
             return
-        if not payload.guild_id:
+        if payload.guild_id != self.bot.settings.guild_id:
             return
-        if payload.channel_id != self.bot.settings.guild().channel_reaction_roles:
+
+        # everything we need is in memory, so a rush of reactions doesn't touch the database
+        mapping = self.bot.settings.rero_mappings().get(payload.message_id)
+        if mapping is None and payload.channel_id != self.bot.settings.rero_channel():
             return
 
         channel = payload.member.guild.get_channel(payload.channel_id)
-        if payload.message_id not in self.cached_messages:
-            message = await channel.fetch_message(payload.message_id)
-            self.cached_messages[payload.message_id] = message
-        else:
-            message = self.cached_messages[payload.message_id]
-
-        mapping = await self.bot.settings.get_rero_mapping(str(payload.message_id))
-        if mapping is None:
-            await message.remove_reaction(payload.emoji, payload.member)
-            return
+        # removing a reaction only needs the IDs, so the message is never fetched
+        message = channel.get_partial_message(payload.message_id)
 
-        if str(payload.emoji) not in mapping:
+        if mapping is None or str(payload.emoji) not in mapping:
             await message.remove_reaction(payload.emoji, payload.member)
             return
 
         role = payload.member.guild.get_role(mapping[str(payload.emoji)])
-        if role is None:
-            await message.remove_reaction(payload.emoji)
-            return
-
-        try:
-            if role not in payload.member.roles:
-                await payload.member.add_roles(role)
-            else:
-                await payload.member.remove_roles(role)
-        except Exception:
-            pass
+        if role is not None:
+            self.role_toggles.toggle(payload.member, role)
 
         await message.remove_reaction(payload.emoji, payload.member)
 
@@ -370,7 +410,7 @@ class ReactionRoles(commands.Cog):
         if not ctx.guild.id == ctx.settings.guild_id:
             return
 
-        channel = ctx.guild.get_channel(ctx.settings.guild().channel_reaction_roles)
+        channel = ctx.guild.get_channel(ctx.settings.rero_channel())
 
         if channel is None:
             return
@@ -0,0 +1,242 @@
+import asyncio
+import gzip
+import json
+import os
+from datetime import datetime
+from io import BytesIO
+
+import discord
+
+# Discord rejects uploads above 8MB for non-boosted guilds, leave some room for the multipart overhead
+MAX_PART_SIZE = 7 * 1024 * 1024
+# transcripts bigger than this are gzipped before they're uploaded
+COMPRESS_THRESHOLD = 512 * 1024
+
+
+class ArchiveWriter:
+    """Writes a transcript of deleted messages incrementally instead of building the whole
+    thing in memory first. Once the transcript grows past `compress_threshold` it is gzipped
+    on the fly, and it is split into several parts so that no single part goes over `max_part_size`.
+    """
+
+    def __init__(self, max_part_size: int = MAX_PART_SIZE, compress_threshold: int = COMPRESS_THRESHOLD):
+        self.max_part_size = max_part_size
+        self.compress_threshold = compress_threshold
+
+        self.parts = []
+        self.message_count = 0
+        # mentions of the authors, by user ID
+        self.authors = {}
+        self.channel_id = None
+        self.compressed = False
+
+        self._raw = BytesIO()
+        self._gzip = None
+
+    def write(self, message: discord.Message) -> None:
+        """Append a message to the transcript
+
+        Parameters
+        ----------
+        message : discord.Message
+            Message to add
+        """
+
+        self._write_message(message.channel.id, message.author.id, message.author, message.created_at,
+                            message.content, [attachment.url for attachment in message.attachments])
+
+    def write_record(self, record, author=None) -> None:
+        """Append a message from the message cache or the message archive
+
+        Parameters
+        ----------
+        record : ArchivedMessage
+            Message to add
+        author : discord.User, optional
+            Author of the message, by default None if we can't find them
+        """
+
+        self._write_message(record.channel_id, record.author_id, author, record.created_at,
+                            record.content or "", record.attachments)
+
+    def _write_message(self, channel_id, author_id, author, created_at, content, attachments) -> None:
+        self.message_count += 1
+        self.authors.setdefault(author_id, author.mention if author is not None else f"<@{author_id}>")
+        if self.channel_id is None:
+            self.channel_id = channel_id
+
+        string = f'{author if author is not None else "Unknown user"} ({author_id}) [{created_at.strftime("%B %d, %Y, %I:%M %p")}] UTC\n'
+        string += content
+        for url in attachments:
+            string += f'\n{url}'
+        string += "\n\n"
+
+        self._write(string.encode('UTF-8'))
+
+    def _write(self, data: bytes) -> None:
+        if self._gzip is None:
+            self._raw.write(data)
+            if self._raw.tell() > self.compress_threshold:
+                # the transcript is getting big, switch over to compressing everything
+                self.compressed = True
+                raw = self._raw.getvalue()
+                self._raw = BytesIO()
+                self._new_gzip_part()
+                self._gzip.write(raw)
+            elif self._raw.tell() > self.max_part_size:
+                self._finish_raw_part()
+            return
+
+        self._gzip.write(data)
+        # the gzip stream buffers a bit internally, so we check the compressed
+        # size against the limit with some slack
+        if self._gzip_fileobj.tell() > self.max_part_size - 64 * 1024:
+            self._finish_gzip_part()
+            self._new_gzip_part()
+
+    def _new_gzip_part(self) -> None:
+        self._gzip_fileobj = BytesIO()
+        self._gzip = gzip.GzipFile(fileobj=self._gzip_fileobj, mode='wb')
+
+    def _finish_gzip_part(self) -> None:
+        self._gzip.close()
+        self.parts.append(self._gzip_fileobj.getvalue())
+        self._gzip = None
+
+    def _finish_raw_part(self) -> None:
+        self.parts.append(self._raw.getvalue())
+        self._raw = BytesIO()
+
+    def close(self) -> list:
+        """Finish the transcript.
+
+        Returns
+        -------
+        list
+            The parts of the transcript, as bytes
+        """
+
+        if self._gzip is not None:
+            self._finish_gzip_part()
+        elif self._raw.tell() > 0:
+            self._finish_raw_part()
+
+        return self.parts
+
+    def files(self) -> list:
+        """Get the transcript as a list of discord.File objects, ready to be uploaded
+        """
+
+        parts = self.close()
+        extension = "txt.gz" if self.compressed else "txt"
+        if len(parts) == 1:
+            return [discord.File(BytesIO(parts[0]), f"message.{extension}")]
+
+        return [discord.File(BytesIO(part), f"message-{i+1}.{extension}") for i, part in enumerate(parts)]
+
+    def member_string(self, limit: int = 20) -> str:
+        """Human readable list of the authors in this transcript, i.e "@a, @b and @c"
+
+        Parameters
+        ----------
+        limit : int, optional
+            How many mentions to show before summarizing the rest, by default 20
+        """
+
+        mentions = list(self.authors.values())
+        if len(mentions) > limit:
+            return f"{', '.join(mentions[:limit])} and {len(mentions) - limit} others"
+        if len(mentions) == 1:
+            return mentions[0]
+        return f"{', '.join(mentions[:-1])} and {mentions[-1]}"
+
+
+class ArchiveStore:
+    """Keeps a copy of every bulk delete transcript on disk. Transcripts are stored
+    as `<root>/<channel ID>/<timestamp>-<part>.txt(.gz)`, and every archive is also
+    recorded in `<root>/index.jsonl` so they can be looked up by channel and time.
+    """
+
+    def __init__(self, root: str = "archive/bulk"):
+        self.root = root
+
+    async def save(self, channel_id: int, writer: ArchiveWriter, when: datetime = None) -> list:
+        """Write the parts of a finished transcript to disk, without blocking the event loop
+
+        Parameters
+        ----------
+        channel_id : int
+            Channel the messages were deleted from
+        writer : ArchiveWriter
+            The finished transcript
+        when : datetime, optional
+            Time of the bulk delete, by default now
+
+        Returns
+        -------
+        list
+            Paths of the files that were written
+        """
+
+        when = when or datetime.now()
+        parts = writer.close()
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self._save, channel_id, parts, writer.compressed, writer.message_count, when)
+
+    def _save(self, channel_id, parts, compressed, message_count, when):
+        directory = os.path.join(self.root, str(channel_id))
+        os.makedirs(directory, exist_ok=True)
+
+        extension = "txt.gz" if compressed else "txt"
+        stamp = when.strftime("%Y%m%d-%H%M%S")
+        paths = []
+        for i, part in enumerate(parts):
+            path = os.path.join(directory, f"{stamp}-{i+1}.{extension}")
+            with open(path, 'wb') as f:
+                f.write(part)
+            paths.append(path)
+
+        with open(os.path.join(self.root, "index.jsonl"), 'a') as f:
+            f.write(json.dumps({
+                "channel_id": channel_id,
+                "time": when.timestamp(),
+                "messages": message_count,
+                "files": paths
+            }) + "\n")
+
+        return paths
+
+    def find(self, channel_id: int = None, after: datetime = None, before: datetime = None) -> list:
+        """Look up archived bulk deletes
+
+        Parameters
+        ----------
+        channel_id : int, optional
+            Only return archives from this channel
+        after : datetime, optional
+            Only return archives newer than this
+        before : datetime, optional
+            Only return archives older than this
+
+        Returns
+        -------
+        list
+            Index entries of the matching archives, oldest first
+        """
+
+        results = []
+        try:
+            with open(os.path.join(self.root, "index.jsonl")) as f:
+                for line in f:
+                    entry = json.loads(line)
+                    if channel_id is not None and entry["channel_id"] != channel_id:
+                        continue
+                    if after is not None and entry["time"] < after.timestamp():
+                        continue
+                    if before is not None and entry["time"] > before.timestamp():
+                        continue
+                    results.append(entry)
+        except FileNotFoundError:
+            pass
+
+        return results
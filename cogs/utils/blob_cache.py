@@ -0,0 +1,93 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class BlobCache:
+    """LRU cache for files stored in GridFS, keyed by their GridFS ID. Since a file in GridFS
+    never changes (replacing an image gives it a new ID), entries never go stale.
+    The cache is bounded by the total size of the files it holds rather than their count.
+    It works with any other key too, with `max_age` for keys like URLs that can go stale.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Total size of the files kept in memory
+    max_age : float, optional
+        Seconds a file is kept, for keys that can go stale like URLs, by default forever
+    """
+
+    def __init__(self, max_bytes: int, max_age: float = None):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.size = 0
+        self._blobs = OrderedDict()
+        # when every file was added, only kept if they expire
+        self._added = {}
+
+    def get(self, grid_id):
+        """Get a cached file
+
+        Returns
+        -------
+        tuple
+            (bytes, content type) of the file, or None if it isn't cached
+        """
+
+        blob = self._blobs.get(grid_id)
+        if blob is None:
+            return None
+        if self.max_age is not None and time.monotonic() - self._added[grid_id] > self.max_age:
+            self.pop(grid_id)
+            return None
+
+        self._blobs.move_to_end(grid_id)
+        return blob
+
+    def put(self, grid_id, data: bytes, content_type: str) -> None:
+        self.pop(grid_id)
+        if len(data) > self.max_bytes:
+            return
+
+        self._blobs[grid_id] = (data, content_type)
+        self.size += len(data)
+        if self.max_age is not None:
+            self._added[grid_id] = time.monotonic()
+        while self.size > self.max_bytes:
+            self.pop(next(iter(self._blobs)))
+
+    def pop(self, grid_id) -> None:
+        blob = self._blobs.pop(grid_id, None)
+        if blob is not None:
+            self.size -= len(blob[0])
+            self._added.pop(grid_id, None)
+
+    async def read(self, proxy) -> tuple:
+        """Read a file from a mongoengine FileField, from memory if we can.
+        GridFS is only hit when the file isn't cached, and then without blocking the event loop.
+
+        Parameters
+        ----------
+        proxy : mongoengine.fields.GridFSProxy
+            The FileField to read
+
+        Returns
+        -------
+        tuple
+            (bytes, content type) of the file, or (None, None) if there is no file
+        """
+
+        if proxy is None or proxy.grid_id is None:
+            return None, None
+
+        blob = self.get(proxy.grid_id)
+        if blob is not None:
+            return blob
+
+        loop = asyncio.get_event_loop()
+        data, content_type = await loop.run_in_executor(None, lambda: (proxy.read(), proxy.content_type))
+        if data is None:
+            return None, None
+
+        self.put(proxy.grid_id, data, content_type)
+        return data, content_type
@@ -0,0 +1,157 @@
+import asyncio
+import os
+import time
+import traceback
+
+import discord
+
+PROFILES = ["full", "lean"]
+
+
+class CacheProfile:
+    """Controls how much of the guild discord.py keeps in memory, set with BOTTY_CACHE_PROFILE.
+
+    - `full` is discord.py's default: every member is chunked before the bot is ready
+      and presences are tracked for everyone who's online.
+    - `lean` only caches members we've seen (joins, messages, voice, the lazy chunk)
+      without their presence, chunks the main guild in the background after ready,
+      and drops presence updates and chunked presences for everyone but moderators, who are the only ones
+      we need a status for (see Report.prepare_ping_string).
+
+    It also keeps track of how long startup took, so profiles can be compared in !stats.
+    """
+
+    def __init__(self, name: str):
+        if name not in PROFILES:
+            raise ValueError(f"Unknown cache profile {name}, expected one of {', '.join(PROFILES)}")
+
+        self.name = name
+        self.started_at = time.monotonic()
+        self.ready_after = None
+        self.chunked_after = None
+        self.moderator_role_id = None
+        self.guild_id = None
+        self._members_ready = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(os.environ.get("BOTTY_CACHE_PROFILE", "full").lower())
+
+    @property
+    def members_ready(self) -> asyncio.Event:
+        """Set once the member cache of the main guild is complete. Made the first time it's used,
+        which is always from a coroutine, so it belongs to the bot's running loop.
+        """
+
+        if self._members_ready is None:
+            self._members_ready = asyncio.Event()
+        return self._members_ready
+
+    @property
+    def lean(self) -> bool:
+        return self.name == "lean"
+
+    def client_options(self) -> dict:
+        """Keyword arguments to pass to the bot's constructor for this profile
+        """
+
+        if not self.lean:
+            return {}
+
+        return {
+            "member_cache_flags": discord.MemberCacheFlags(online=False),
+            "chunk_guilds_at_startup": False,
+        }
+
+    def install(self, bot: discord.Client) -> None:
+        """Wrap the gateway's presence parser so only moderators' presences are processed. Until the
+        bot is ready we don't know who the moderators are, so every presence update is dropped, but
+        moderators' initial status comes in with the chunk after ready anyway.
+
+        Parameters
+        ----------
+        bot : discord.Client
+            The bot
+        """
+
+        if not self.lean:
+            return
+
+        state = bot._connection
+        parse_presence_update = state.parsers["PRESENCE_UPDATE"]
+
+        def parse_moderator_presence_update(data):
+            if self.moderator_role_id is None:
+                return
+            if data.get("guild_id") is None or int(data["guild_id"]) != self.guild_id:
+                return
+
+            guild = state._get_guild(self.guild_id)
+            member = guild.get_member(int(data["user"]["id"])) if guild is not None else None
+            if member is None or not member._roles.has(self.moderator_role_id):
+                return
+
+            parse_presence_update(data)
+
+        state.parsers["PRESENCE_UPDATE"] = parse_moderator_presence_update
+
+        parse_members_chunk = state.parsers["GUILD_MEMBERS_CHUNK"]
+
+        def parse_moderator_members_chunk(data):
+            # chunking asks for everyone's presence, keep only the moderators'
+            presences = data.get("presences")
+            if presences:
+                moderator_role = str(self.moderator_role_id)
+                moderators = {member["user"]["id"] for member in data.get("members", [])
+                              if moderator_role in member.get("roles", [])}
+                data["presences"] = [presence for presence in presences if presence["user"]["id"] in moderators]
+
+            parse_members_chunk(data)
+
+        state.parsers["GUILD_MEMBERS_CHUNK"] = parse_moderator_members_chunk
+
+    async def on_ready(self, bot: discord.Client) -> None:
+        """Record the startup time and, for the lean profile, start chunking the main guild
+        in the background.
+
+        Parameters
+        ----------
+        bot : discord.Client
+            The bot, once it's ready
+        """
+
+        self.ready_after = time.monotonic() - self.started_at
+        print(f"Ready after {self.ready_after:.1f}s using the {self.name} cache profile ({self.rss()} MB RSS)")
+
+        if not self.lean:
+            self.members_ready.set()
+            return
+
+        self.guild_id = bot.settings.guild_id
+        self.moderator_role_id = bot.settings.guild().role_moderator
+        asyncio.ensure_future(self.chunk(bot))
+
+    async def chunk(self, bot: discord.Client) -> None:
+        guild = bot.get_guild(self.guild_id)
+        if guild is None:
+            self.members_ready.set()
+            return
+
+        try:
+            await guild.chunk()
+        except Exception:
+            print("Chunking the main guild failed, continuing with the members we have")
+            traceback.print_exc()
+            return
+        finally:
+            # whatever happened, nothing should wait on this forever
+            self.members_ready.set()
+
+        self.chunked_after = time.monotonic() - self.started_at
+        print(f"Chunked {guild.member_count} members after {self.chunked_after:.1f}s ({self.rss()} MB RSS)")
+
+    @staticmethod
+    def rss() -> int:
+        # psutil takes a while to import and is only needed once we print this
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss // 1000 // 1000
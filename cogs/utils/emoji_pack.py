@@ -0,0 +1,95 @@
+import mmap
+import os
+import struct
+
+MAGIC = b"EMJP"
+VERSION = 1
+# magic, version, number of emojis
+HEADER = struct.Struct("<4sHI")
+# length of the emoji's UTF-8 bytes, offset and length of its PNG
+ENTRY = struct.Struct("<HQI")
+
+
+def write_pack(path: str, emojis: dict) -> None:
+    """Write emoji images to a pack file: a header, an index of every emoji with the offset
+    and length of its image, then all the PNGs back to back. The file is replaced atomically,
+    so the bot never sees half a pack.
+
+    Parameters
+    ----------
+    path : str
+        Where to write the pack
+    emojis : dict
+        PNG bytes by emoji
+    """
+
+    keys = [(emoji.encode("utf-8"), png) for emoji, png in emojis.items()]
+    offset = HEADER.size + sum(ENTRY.size + len(key) for key, _ in keys)
+
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(keys)))
+        for key, png in keys:
+            f.write(ENTRY.pack(len(key), offset, len(png)))
+            f.write(key)
+            offset += len(png)
+        for _, png in keys:
+            f.write(png)
+    os.replace(tmp, path)
+
+
+class EmojiPack:
+    """Read-only view of a pack written by `write_pack`. The file is memory-mapped, so only
+    the index lives in our memory and images are read straight from the page cache.
+
+    Parameters
+    ----------
+    path : str
+        Path to the pack
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not an emoji pack, run scrape_emojis.py again")
+
+        self._index = {}
+        position = HEADER.size
+        for _ in range(count):
+            key_length, offset, length = ENTRY.unpack_from(self._map, position)
+            position += ENTRY.size
+            key = self._map[position:position + key_length].decode("utf-8")
+            position += key_length
+            self._index[key] = (offset, length)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, emoji):
+        return emoji in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def get(self, emoji: str) -> bytes:
+        """Get the PNG of an emoji. It's copied out of the map, so the pack can be closed
+        while the image is still in use.
+
+        Returns
+        -------
+        bytes
+            The image, or None if the emoji isn't in the pack
+        """
+
+        entry = self._index.get(emoji)
+        if entry is None:
+            return None
+
+        offset, length = entry
+        return self._map[offset:offset + length]
+
+    def close(self) -> None:
+        self._map.close()
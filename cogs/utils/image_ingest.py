@@ -0,0 +1,137 @@
+import asyncio
+
+import aiohttp
+from discord.ext import commands
+from expiringdict import ExpiringDict
+
+from cogs.utils.blob_cache import BlobCache
+
+# what the start of a file looks like for every image type Discord takes
+IMAGE_TYPES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+# the longest signature, plus WEBP's which is 8 bytes in
+SNIFF_SIZE = 12
+# how many downloads run at the same time, across every cog
+MAX_CONNECTIONS = 10
+CHUNK_SIZE = 16 * 1024
+# how long downloads are kept, the same URL can point to a different image later
+CACHE_AGE = 600
+
+
+def sniff(data: bytes) -> str:
+    """Work out the type of an image from its first bytes, whatever the server says it is
+
+    Returns
+    -------
+    str
+        The content type, or None if it isn't an image we know
+    """
+
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    for magic, content_type in IMAGE_TYPES:
+        if data.startswith(magic):
+            return content_type
+    return None
+
+
+class ImageIngest:
+    """Downloads images people give us, like booster emojis and tag images, with one GET each.
+    The type comes from the image's own bytes instead of the headers, and downloads stop as soon
+    as they go over the size limit. Everything goes through a single session with a bounded
+    connection pool, and results are kept for a while so the same URL isn't downloaded twice
+    when it's checked on message and again on approval.
+
+    Parameters
+    ----------
+    cache_bytes : int
+        Total size of the images kept in memory
+    """
+
+    def __init__(self, cache_bytes: int):
+        self.session = None
+        self.cache = BlobCache(max_bytes=cache_bytes, max_age=CACHE_AGE)
+        # URLs that turned out not to be images, so they don't take up any of the budget
+        self.not_images = ExpiringDict(max_len=200, max_age_seconds=CACHE_AGE)
+
+    def get_session(self) -> aiohttp.ClientSession:
+        # sessions should be made inside the event loop, so this waits for the first download
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=MAX_CONNECTIONS),
+                timeout=aiohttp.ClientTimeout(total=30))
+        return self.session
+
+    async def fetch(self, url: str, max_bytes: int) -> tuple:
+        """Download an image
+
+        Parameters
+        ----------
+        url : str
+            URL of the image
+        max_bytes : int
+            Largest image we take
+
+        Returns
+        -------
+        tuple
+            (image bytes, content type), or (None, None) if the URL isn't an image
+
+        Raises
+        ------
+        commands.BadArgument
+            If the image is bigger than max_bytes
+        """
+
+        if url in self.not_images:
+            return None, None
+
+        result = self.cache.get(url)
+        if result is None:
+            try:
+                result = await self.download(url, max_bytes)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                # bad URLs, error statuses, timeouts and dropped connections. Not cached, trying again might work
+                return None, None
+            if result[0] is None:
+                self.not_images[url] = True
+            else:
+                self.cache.put(url, *result)
+
+        data, content_type = result
+        if data is not None and len(data) > max_bytes:
+            # cached by a caller that allows bigger images
+            raise commands.BadArgument(f"Image was too big ({int(len(data)/1000)}KB)")
+        return data, content_type
+
+    async def download(self, url: str, max_bytes: int) -> tuple:
+        async with self.get_session().get(url) as resp:
+            # error statuses are usually temporary, so they go the same way as network errors
+            resp.raise_for_status()
+            if resp.content_length is not None and resp.content_length > max_bytes:
+                raise commands.BadArgument(f"Image was too big ({int(resp.content_length/1000)}KB)")
+
+            data = bytearray()
+            content_type = None
+            async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                data += chunk
+                if content_type is None and len(data) >= SNIFF_SIZE:
+                    content_type = sniff(bytes(data[:SNIFF_SIZE]))
+                    if content_type is None:
+                        return None, None
+                if len(data) > max_bytes:
+                    raise commands.BadArgument(f"Image was too big (over {int(max_bytes/1000)}KB)")
+
+        if content_type is None:
+            content_type = sniff(bytes(data))
+            if content_type is None:
+                return None, None
+        return bytes(data), content_type
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
@@ -0,0 +1,173 @@
+import asyncio
+import time
+
+import discord
+
+# how many channels we edit at the same time. Every channel is its own rate limit bucket,
+# so this mostly keeps us clear of the global rate limit
+LOCK_CONCURRENCY = 10
+
+
+class ChannelResult:
+    """What happened to a single channel during a lockdown.
+    `changed` is False when the channel was already in the state we wanted, `error` is set when editing it failed.
+    """
+
+    __slots__ = ('channel', 'changed', 'elapsed', 'error')
+
+    def __init__(self, channel: discord.TextChannel, changed: bool = False, elapsed: float = 0, error: Exception = None):
+        self.channel = channel
+        self.changed = changed
+        self.elapsed = elapsed
+        self.error = error
+
+
+class LockdownReport:
+    def __init__(self, lock: bool, results: list, elapsed: float):
+        self.lock = lock
+        self.results = results
+        self.elapsed = elapsed
+
+    @property
+    def changed(self) -> list:
+        return [result.channel for result in self.results if result.changed]
+
+    @property
+    def failed(self) -> list:
+        return [result for result in self.results if result.error is not None]
+
+    @property
+    def slowest(self) -> ChannelResult:
+        return max(self.results, key=lambda result: result.elapsed, default=None)
+
+    def summary(self) -> str:
+        action = "Locked" if self.lock else "Unlocked"
+        text = f"{action} {len(self.changed)} channels in {self.elapsed:.1f}s"
+        if self.failed:
+            text += f", failed: {', '.join(f'{result.channel.mention} ({result.error})' for result in self.failed)}"
+        return text
+
+
+class Lockdown:
+    """Locks and unlocks channels so only Member+ can talk in them. The guild's config is only read
+    once, both overwrites of a channel are changed with a single edit, and channels are edited concurrently.
+
+    Parameters
+    ----------
+    guild : discord.Guild
+        The guild
+    settings : data.guild.Guild
+        The guild's config
+    """
+
+    def __init__(self, guild: discord.Guild, settings):
+        self.guild = guild
+        self.default_role = guild.default_role
+        self.member_plus = guild.get_role(settings.role_memberplus)
+
+    def overwrites(self, channel: discord.TextChannel, lock: bool) -> dict:
+        """Work out the overwrites of a channel after locking or unlocking it
+
+        Returns
+        -------
+        dict
+            All overwrites of the channel, or None if it's already in the right state
+        """
+
+        default_perms = channel.overwrites_for(self.default_role)
+        memberplus_perms = channel.overwrites_for(self.member_plus)
+
+        if lock and default_perms.send_messages is None and memberplus_perms.send_messages is None:
+            default_perms.send_messages = False
+            memberplus_perms.send_messages = True
+        elif not lock and (not default_perms.send_messages) and memberplus_perms.send_messages:
+            default_perms.send_messages = None
+            memberplus_perms.send_messages = None
+        else:
+            return None
+
+        overwrites = self.current_overwrites(channel)
+        overwrites[self.default_role] = default_perms
+        overwrites[self.member_plus] = memberplus_perms
+        return overwrites
+
+    def current_overwrites(self, channel: discord.TextChannel) -> dict:
+        """All overwrites of a channel, like channel.overwrites, but keeping the ones of members
+        that aren't cached. channel.overwrites leaves those out, and since edit replaces every
+        overwrite of the channel, they would be deleted. They're kept as discord.Object, which
+        edit sends as a member overwrite.
+
+        Returns
+        -------
+        dict
+            Overwrites by role, member or discord.Object
+        """
+
+        overwrites = {}
+        for overwrite in channel._overwrites:
+            if overwrite.type == 'role':
+                target = self.guild.get_role(overwrite.id)
+                if target is None:
+                    # roles are always cached, so this one was deleted and Discord drops the overwrite anyway
+                    continue
+            else:
+                target = self.guild.get_member(overwrite.id) or discord.Object(id=overwrite.id)
+
+            overwrites[target] = discord.PermissionOverwrite.from_pair(discord.Permissions(overwrite.allow),
+                                                                       discord.Permissions(overwrite.deny))
+        return overwrites
+
+    async def apply(self, channel: discord.TextChannel, lock: bool) -> ChannelResult:
+        result = ChannelResult(channel)
+        overwrites = self.overwrites(channel, lock)
+        if overwrites is None:
+            return result
+
+        start = time.monotonic()
+        try:
+            await channel.edit(overwrites=overwrites, reason="Locked!" if lock else "Unlocked!")
+            result.changed = True
+        except discord.HTTPException as e:
+            result.error = e
+        result.elapsed = time.monotonic() - start
+        return result
+
+    async def run(self, channels: list, lock: bool, concurrency: int = LOCK_CONCURRENCY) -> LockdownReport:
+        """Lock or unlock a list of channels
+
+        Parameters
+        ----------
+        channels : list
+            The channels
+        lock : bool
+            True to lock the channels, False to unlock them
+        concurrency : int, optional
+            How many channels are edited at the same time, by default LOCK_CONCURRENCY
+
+        Returns
+        -------
+        LockdownReport
+            What happened to every channel, and how long it took
+        """
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def apply(channel):
+            async with semaphore:
+                return await self.apply(channel, lock)
+
+        start = time.monotonic()
+        results = await asyncio.gather(*[apply(channel) for channel in channels])
+        report = LockdownReport(lock, list(results), time.monotonic() - start)
+
+        slowest = report.slowest
+        if report.changed or report.failed:
+            print(f"{report.summary()} (slowest: #{slowest.channel.name} in {slowest.elapsed:.1f}s)")
+        return report
+
+    async def run_ids(self, channel_ids: list, lock: bool) -> LockdownReport:
+        """Same as run, but with channel IDs. Channels that don't exist anymore are skipped.
+        """
+
+        channels = [self.guild.get_channel(channel_id) for channel_id in channel_ids]
+        return await self.run([channel for channel in channels if channel is not None], lock)
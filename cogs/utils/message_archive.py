@@ -0,0 +1,328 @@
+import asyncio
+import json
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import discord
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    message_id  INTEGER NOT NULL,
+    channel_id  INTEGER NOT NULL,
+    author_id   INTEGER NOT NULL,
+    created_at  REAL NOT NULL,
+    recorded_at REAL NOT NULL,
+    event       TEXT NOT NULL,
+    content     TEXT,
+    attachments TEXT
+);
+CREATE INDEX IF NOT EXISTS messages_message_id ON messages (message_id);
+CREATE INDEX IF NOT EXISTS messages_author ON messages (author_id, created_at);
+CREATE INDEX IF NOT EXISTS messages_channel ON messages (channel_id, created_at);
+CREATE INDEX IF NOT EXISTS messages_created_at ON messages (created_at);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5 (content, content='messages', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+"""
+
+
+def _timestamp(dt: datetime) -> float:
+    # discord.py hands out naive UTC datetimes, and so do we
+    return dt.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _datetime(timestamp: float) -> datetime:
+    return datetime.utcfromtimestamp(timestamp)
+
+
+class ArchivedMessage:
+    """A single revision of a message as it was stored in the archive.
+    `event` is one of "create", "edit" or "delete". All times are naive UTC, like discord.py's.
+    """
+
+    __slots__ = ('message_id', 'channel_id', 'author_id', 'created_at', 'recorded_at', 'event', 'content', 'attachments', 'deleted')
+
+    def __init__(self, message_id, channel_id, author_id, created_at, recorded_at, event, content=None, attachments=None):
+        self.message_id = message_id
+        self.channel_id = channel_id
+        self.author_id = author_id
+        self.created_at = created_at
+        self.recorded_at = recorded_at
+        self.event = event
+        self.content = content
+        self.attachments = attachments or []
+        # only filled in by MessageArchive.search
+        self.deleted = False
+
+    @classmethod
+    def from_message(cls, message: discord.Message, event: str = "create"):
+        return cls(message.id, message.channel.id, message.author.id, message.created_at, datetime.utcnow(),
+                   event, message.content, [attachment.url for attachment in message.attachments])
+
+    def jump_url(self, guild_id: int) -> str:
+        return f"https://discord.com/channels/{guild_id}/{self.channel_id}/{self.message_id}"
+
+    def to_row(self):
+        return (self.message_id, self.channel_id, self.author_id, _timestamp(self.created_at),
+                _timestamp(self.recorded_at), self.event, self.content, json.dumps(self.attachments))
+
+    @classmethod
+    def from_row(cls, row):
+        message_id, channel_id, author_id, created_at, recorded_at, event, content, attachments = row
+        return cls(message_id, channel_id, author_id, _datetime(created_at),
+                   _datetime(recorded_at), event, content, json.loads(attachments or "[]"))
+
+
+class MessageArchive:
+    """Append-only on-disk archive of messages in the main guild, backed by SQLite with a
+    full text index. Every message is stored when it is sent, and a new revision is appended
+    whenever it's edited or deleted, so we can still tell what a message said long after it
+    dropped out of the message cache.
+
+    Writes are buffered in memory and flushed in batches on a dedicated thread, so the
+    event loop never waits on the disk. Messages older than `retention_days` are removed by `prune`.
+    """
+
+    def __init__(self, path: str = "archive/messages.db", batch_size: int = 200, flush_interval: float = 10.0,
+                 retention_days: int = None):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+
+        self.pending = []
+        self.has_fts = True
+        self._db = None
+        self._flush_task = None
+        # sqlite connections shouldn't be shared between threads, so every query runs on this one
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def _connect(self):
+        if self._db is not None:
+            return self._db
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._db = sqlite3.connect(self.path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        try:
+            self._db.executescript(FTS_SCHEMA)
+        except sqlite3.OperationalError:
+            # sqlite was built without FTS5, fall back to LIKE searches
+            self.has_fts = False
+        self._db.commit()
+        return self._db
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def add(self, record: ArchivedMessage) -> None:
+        """Queue a message revision to be written in the next batch
+
+        Parameters
+        ----------
+        record : ArchivedMessage
+            The revision to store
+        """
+
+        self.pending.append(record)
+        if len(self.pending) >= self.batch_size:
+            asyncio.ensure_future(self.flush())
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Write all queued revisions to disk
+        """
+
+        if not self.pending:
+            return
+
+        batch = self.pending
+        self.pending = []
+        await self._run(self._write, [record.to_row() for record in batch])
+
+    def _write(self, rows):
+        db = self._connect()
+        with db:
+            db.executemany("""INSERT INTO messages (message_id, channel_id, author_id, created_at, recorded_at, event, content, attachments)
+                              VALUES (?, ?, ?, ?, ?, ?, ?, ?)""", rows)
+
+    async def prune(self) -> int:
+        """Remove every revision of messages sent more than `retention_days` ago.
+        The full text index is cleaned up along with them by a trigger.
+
+        Returns
+        -------
+        int
+            How many revisions were removed
+        """
+
+        if not self.retention_days:
+            return 0
+
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        return await self._run(self._prune, _timestamp(cutoff))
+
+    def _prune(self, cutoff):
+        db = self._connect()
+        with db:
+            return db.execute("DELETE FROM messages WHERE created_at < ?", (cutoff,)).rowcount
+
+    async def lookup(self, message_id: int) -> ArchivedMessage:
+        """Find the most recent content we know of for a message.
+
+        Parameters
+        ----------
+        message_id : int
+            ID of the message
+
+        Returns
+        -------
+        ArchivedMessage
+            The latest revision that had content, or None if we never saw this message
+        """
+
+        for record in reversed(self.pending):
+            if record.message_id == message_id and record.event != "delete":
+                return record
+
+        row = await self._run(self._lookup, message_id)
+        return ArchivedMessage.from_row(row) if row is not None else None
+
+    def _lookup(self, message_id):
+        db = self._connect()
+        return db.execute("""SELECT message_id, channel_id, author_id, created_at, recorded_at, event, content, attachments
+                             FROM messages WHERE message_id = ? AND event != 'delete'
+                             ORDER BY id DESC LIMIT 1""", (message_id,)).fetchone()
+
+    async def lookup_many(self, message_ids: list) -> dict:
+        """Same as lookup, for a lot of messages at once
+
+        Parameters
+        ----------
+        message_ids : list
+            IDs of the messages
+
+        Returns
+        -------
+        dict
+            The latest revision that had content by message ID, messages we never saw are left out
+        """
+
+        found = {}
+        wanted = set(message_ids)
+        for record in self.pending:
+            if record.message_id in wanted and record.event != "delete":
+                found[record.message_id] = record
+
+        missing = [message_id for message_id in wanted if message_id not in found]
+        if missing:
+            for row in await self._run(self._lookup_many, missing):
+                found[row[0]] = ArchivedMessage.from_row(row)
+        return found
+
+    def _lookup_many(self, message_ids):
+        db = self._connect()
+        # rows come oldest first, so later revisions overwrite earlier ones in lookup_many
+        return db.execute(f"""SELECT message_id, channel_id, author_id, created_at, recorded_at, event, content, attachments
+                              FROM messages WHERE message_id IN ({", ".join("?" * len(message_ids))}) AND event != 'delete'
+                              ORDER BY id""", message_ids).fetchall()
+
+    async def search(self, text: str = None, author_id: int = None, channel_id: int = None,
+                     after: datetime = None, before: datetime = None, limit: int = 10) -> list:
+        """Search the archive, newest messages first. Every revision of a message is a separate result.
+        All filters are optional.
+
+        Parameters
+        ----------
+        text : str, optional
+            Words the message has to contain
+        author_id : int, optional
+            Only messages by this user
+        channel_id : int, optional
+            Only messages in this channel
+        after : datetime, optional
+            Only messages sent after this time
+        before : datetime, optional
+            Only messages sent before this time
+        limit : int, optional
+            Maximum amount of results, by default 10
+
+        Returns
+        -------
+        list
+            List of ArchivedMessage
+        """
+
+        await self.flush()
+        rows = await self._run(self._search, text, author_id, channel_id, after, before, limit)
+        results = []
+        for row in rows:
+            record = ArchivedMessage.from_row(row[:-1])
+            record.deleted = bool(row[-1])
+            results.append(record)
+        return results
+
+    def _search(self, text, author_id, channel_id, after, before, limit):
+        db = self._connect()
+        query = """SELECT m.message_id, m.channel_id, m.author_id, m.created_at, m.recorded_at, m.event, m.content, m.attachments,
+                          EXISTS (SELECT 1 FROM messages d WHERE d.message_id = m.message_id AND d.event = 'delete')
+                   FROM messages m"""
+        where = ["m.event != 'delete'"]
+        args = []
+
+        if text:
+            if self.has_fts:
+                query += " JOIN messages_fts f ON f.rowid = m.id"
+                where.append("messages_fts MATCH ?")
+                # quote every word so user input can't be interpreted as FTS syntax
+                args.append(" ".join('"' + word.replace('"', '""') + '"' for word in text.split()))
+            else:
+                where.append("m.content LIKE ?")
+                args.append(f"%{text}%")
+        if author_id is not None:
+            where.append("m.author_id = ?")
+            args.append(author_id)
+        if channel_id is not None:
+            where.append("m.channel_id = ?")
+            args.append(channel_id)
+        if after is not None:
+            where.append("m.created_at >= ?")
+            args.append(_timestamp(after))
+        if before is not None:
+            where.append("m.created_at <= ?")
+            args.append(_timestamp(before))
+
+        query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY m.created_at DESC, m.id DESC LIMIT ?"
+        args.append(limit)
+
+        return db.execute(query, args).fetchall()
+
+    async def close(self) -> None:
+        """Flush everything that's still queued and close the database
+        """
+
+        await self.flush()
+        if self._db is not None:
+            await self._run(self._db.close)
+            self._db = None
@@ -0,0 +1,148 @@
+import sys
+
+import discord
+
+
+class CachedMessage:
+    """The parts of a message the logging and filter monitors need, and nothing else.
+    A full discord.Message keeps embeds, mentions, reactions and references to the member around,
+    this keeps about a tenth of that.
+    """
+
+    __slots__ = ('id', 'author_id', 'channel_id', 'content', 'attachments', 'size')
+
+    def __init__(self, id: int, author_id: int, channel_id: int, content: str, attachments: tuple):
+        self.id = id
+        self.author_id = author_id
+        self.channel_id = channel_id
+        self.content = content
+        self.attachments = attachments
+        self.size = _size(content, attachments)
+
+    @classmethod
+    def from_message(cls, message: discord.Message):
+        return cls(message.id, message.author.id, message.channel.id, message.content,
+                   tuple(attachment.url for attachment in message.attachments))
+
+    @property
+    def created_at(self):
+        return discord.utils.snowflake_time(self.id)
+
+
+# rough cost of a record besides its content: the object itself, its three IDs
+# and its entries in the two dicts of the cache
+_OVERHEAD = sys.getsizeof(object.__new__(CachedMessage)) + 3 * sys.getsizeof(2 ** 62) + 2 * 100
+
+
+def _size(content, attachments):
+    return _OVERHEAD + sys.getsizeof(content) + sys.getsizeof(attachments) + sum(sys.getsizeof(url) for url in attachments)
+
+
+class MessageCache:
+    """A compact message cache with a total memory budget and a quota per channel.
+    When a channel goes over its quota its oldest message is dropped, and when the whole
+    cache goes over budget the oldest messages overall are dropped, so a single busy channel
+    can't push everything else out.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Approximate upper bound for the memory used by the cache
+    channel_quota : int
+        Maximum amount of messages kept per channel
+    """
+
+    def __init__(self, max_bytes: int, channel_quota: int):
+        self.max_bytes = max_bytes
+        self.channel_quota = channel_quota
+        self.size = 0
+
+        # dicts keep insertion order, so the first key is always the oldest message
+        self._messages = {}
+        self._channels = {}
+
+    def __len__(self):
+        return len(self._messages)
+
+    def __contains__(self, message_id):
+        return message_id in self._messages
+
+    def add(self, message: discord.Message) -> CachedMessage:
+        """Cache a new message
+
+        Parameters
+        ----------
+        message : discord.Message
+            The message to cache
+        """
+
+        record = CachedMessage.from_message(message)
+        self.pop(record.id)
+
+        self._messages[record.id] = record
+        channel = self._channels.setdefault(record.channel_id, {})
+        channel[record.id] = None
+        self.size += record.size
+
+        if len(channel) > self.channel_quota:
+            self.pop(next(iter(channel)))
+        while self.size > self.max_bytes and self._messages:
+            self.pop(next(iter(self._messages)))
+
+        return record
+
+    def get(self, message_id: int) -> CachedMessage:
+        return self._messages.get(message_id)
+
+    def update(self, message_id: int, content: str, attachments: tuple = None) -> CachedMessage:
+        """Replace the content of a cached message after it's edited. The message keeps its place in the cache.
+
+        Parameters
+        ----------
+        message_id : int
+            ID of the message
+        content : str
+            New content of the message
+        attachments : tuple, optional
+            New attachment URLs, by default the attachments are kept
+
+        Returns
+        -------
+        CachedMessage
+            The record before the edit, or None if the message wasn't cached
+        """
+
+        old = self._messages.get(message_id)
+        if old is None:
+            return None
+
+        new = CachedMessage(old.id, old.author_id, old.channel_id, content, old.attachments if attachments is None else attachments)
+        self._messages[message_id] = new
+        self.size += new.size - old.size
+        return old
+
+    def pop(self, message_id: int) -> CachedMessage:
+        """Remove a message from the cache
+
+        Parameters
+        ----------
+        message_id : int
+            ID of the message
+
+        Returns
+        -------
+        CachedMessage
+            The removed message, or None if it wasn't cached
+        """
+
+        record = self._messages.pop(message_id, None)
+        if record is None:
+            return None
+
+        channel = self._channels.get(record.channel_id)
+        if channel is not None:
+            channel.pop(message_id, None)
+            if not channel:
+                del self._channels[record.channel_id]
+        self.size -= record.size
+        return record
@@ -0,0 +1,247 @@
+import asyncio
+import itertools
+from collections import OrderedDict
+from math import ceil
+
+from discord.ext import menus
+
+
+class MenuPages(menus.MenuPages):
+    """MenuPages that removes the reactions people add, so they can keep clicking the same button.
+    """
+
+    async def update(self, payload):
+        if self._can_remove_reactions:
+            if payload.event_type == 'REACTION_ADD':
+                await self.message.remove_reaction(payload.emoji, payload.member)
+            elif payload.event_type == 'REACTION_REMOVE':
+                return
+        await super().update(payload)
+
+
+async def _run(func):
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, func)
+
+
+def _consume(task):
+    # prefetched pages nobody asks for shouldn't warn about their exceptions
+    if not task.cancelled():
+        task.exception()
+
+
+class LazyPageSource(menus.PageSource):
+    """Base class for page sources that fetch a page when it's shown instead of getting every
+    entry up front. The last few pages are kept, and the next page is fetched in the background
+    while the current one is being read.
+
+    Subclasses implement `count` and `fetch`, and `format_page` like any other page source.
+
+    Parameters
+    ----------
+    per_page : int
+        Entries per page
+    cache_size : int, optional
+        How many pages are kept in memory, by default 4
+    """
+
+    def __init__(self, per_page: int, cache_size: int = 4):
+        self.per_page = per_page
+        self.cache_size = cache_size
+        self.total = None
+        self._pages = OrderedDict()
+
+    async def count(self) -> int:
+        """Total amount of entries, or None if it isn't known until we've seen all of them
+        """
+
+        raise NotImplementedError
+
+    async def fetch(self, page_number: int) -> list:
+        """Get the entries of a page
+        """
+
+        raise NotImplementedError
+
+    async def prepare(self):
+        # commands may prepare the source themselves to check if it's empty
+        if self.total is None:
+            self.total = await self.count()
+
+    def is_paginating(self):
+        return self.total is None or self.total > self.per_page
+
+    def get_max_pages(self):
+        if self.total is None:
+            return None
+        return max(1, ceil(self.total / self.per_page))
+
+    def footer(self, menu) -> str:
+        max_pages = self.get_max_pages()
+        if max_pages is None:
+            return f"Page {menu.current_page + 1}"
+        return f"Page {menu.current_page + 1} of {max_pages}"
+
+    def _load(self, page_number: int) -> asyncio.Task:
+        page = self._pages.get(page_number)
+        if page is not None:
+            self._pages.move_to_end(page_number)
+            return page
+
+        page = asyncio.ensure_future(self.fetch(page_number))
+        page.add_done_callback(_consume)
+        self._pages[page_number] = page
+        while len(self._pages) > self.cache_size:
+            self._pages.popitem(last=False)
+        return page
+
+    async def get_page(self, page_number):
+        try:
+            entries = await self._load(page_number)
+        except Exception:
+            self._pages.pop(page_number, None)
+            raise
+
+        if not entries and page_number > 0:
+            # we went past the end of a source that didn't know its size,
+            # menus ignores this and stays on the current page
+            raise IndexError(page_number)
+
+        max_pages = self.get_max_pages()
+        if max_pages is None or page_number + 1 < max_pages:
+            self._load(page_number + 1)
+        return entries
+
+
+class ListPageSource(LazyPageSource):
+    """Pages over entries that are already in memory, like the tag and filter word indexes.
+
+    Parameters
+    ----------
+    entries : list
+        The entries
+    per_page : int
+        Entries per page
+    """
+
+    def __init__(self, entries: list, per_page: int):
+        super().__init__(per_page)
+        self.entries = entries
+
+    async def count(self):
+        return len(self.entries)
+
+    async def fetch(self, page_number):
+        start = page_number * self.per_page
+        return self.entries[start:start + self.per_page]
+
+
+class QueryPageSource(LazyPageSource):
+    """Pages over the results of a database query. Queries run in an executor, so fetching
+    the next page in the background doesn't hold up the event loop.
+
+    If `cursor_field` is given, the query has to be sorted on it, and every page after the first
+    is fetched starting from the last value of the page before it instead of skipping over
+    all the documents before it.
+
+    Parameters
+    ----------
+    query : mongoengine.QuerySet
+        The query
+    per_page : int
+        Entries per page
+    cursor_field : str, optional
+        Field the query is sorted on, by default None to skip instead
+    descending : bool, optional
+        Whether the query is sorted on `cursor_field` in descending order, by default True
+    """
+
+    def __init__(self, query, per_page: int, cursor_field: str = None, descending: bool = True):
+        super().__init__(per_page)
+        self.query = query
+        self.cursor_field = cursor_field
+        self.descending = descending
+        # page number -> value of `cursor_field` of the last entry on the page before it
+        self.cursors = {}
+
+    async def count(self):
+        return await _run(self.query.count)
+
+    async def fetch(self, page_number):
+        if page_number == 0:
+            query = self.query
+        elif self.cursor_field is not None and page_number in self.cursors:
+            operator = "lt" if self.descending else "gt"
+            query = self.query.filter(**{f"{self.cursor_field}__{operator}": self.cursors[page_number]})
+        else:
+            query = self.query.skip(page_number * self.per_page)
+
+        entries = await _run(lambda: list(query.limit(self.per_page)))
+        if entries and self.cursor_field is not None:
+            self.cursors[page_number + 1] = getattr(entries[-1], self.cursor_field)
+        return entries
+
+
+class FilteredQueryPageSource(LazyPageSource):
+    """Pages over the results of a database query, leaving out results that don't pass a check
+    we can only do on our side, like whether a user is still in the guild. Results are read
+    from the database as far as the pages that are shown need them. Since we don't know how many
+    results pass the check until we've seen them all, the amount of pages is only known at the end.
+
+    Entries are (rank, document) tuples, where rank counts only the documents that passed the check.
+
+    Parameters
+    ----------
+    query : mongoengine.QuerySet
+        The query
+    per_page : int
+        Entries per page
+    check : Callable
+        Called with each document, documents it returns False for are left out
+    limit : int, optional
+        Maximum amount of entries, by default None
+    """
+
+    def __init__(self, query, per_page: int, check, limit: int = None):
+        super().__init__(per_page)
+        self.query = query
+        self.check = check
+        self.limit = limit
+        self.entries = []
+        self._results = None
+        self._exhausted = False
+        # pages can be fetched at the same time, but the results have to be read in order
+        self._lock = asyncio.Lock()
+
+    async def count(self):
+        # reading the first page tells us if there is only one
+        await self.fetch(0)
+        return self.total
+
+    def _read(self):
+        if self._results is None:
+            self._results = iter(self.query)
+        return list(itertools.islice(self._results, self.per_page * 2))
+
+    async def fetch(self, page_number):
+        start = page_number * self.per_page
+        end = start + self.per_page
+        if self.limit is not None:
+            end = min(end, self.limit)
+
+        async with self._lock:
+            while len(self.entries) < end and not self._exhausted:
+                batch = await _run(self._read)
+                if len(batch) < self.per_page * 2:
+                    self._exhausted = True
+                for document in batch:
+                    if self.check(document):
+                        self.entries.append((len(self.entries), document))
+
+            if self.limit is not None and len(self.entries) >= self.limit:
+                del self.entries[self.limit:]
+                self._exhausted = True
+            if self._exhausted:
+                self.total = len(self.entries)
+
+        return self.entries[start:end]
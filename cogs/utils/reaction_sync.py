@@ -0,0 +1,153 @@
+import asyncio
+import time
+
+import discord
+
+# how many messages we work on at the same time in a channel. Adding and removing reactions
+# share a rate limit per channel, so more than this just waits on 429s
+CHANNEL_CONCURRENCY = 2
+# how many messages we work on at the same time overall
+SYNC_CONCURRENCY = 6
+
+
+class MessageResult:
+    """What happened to a single message during a sync.
+    `error` is set when the message couldn't be fetched or edited, whatever was done before that stays done.
+    """
+
+    __slots__ = ('message_id', 'added', 'removed', 'error')
+
+    def __init__(self, message_id: int):
+        self.message_id = message_id
+        self.added = 0
+        self.removed = 0
+        self.error = None
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.removed)
+
+
+class SyncReport:
+    def __init__(self, results: list, elapsed: float):
+        self.results = results
+        self.elapsed = elapsed
+
+    @property
+    def changed(self) -> list:
+        return [result for result in self.results if result.changed]
+
+    @property
+    def failed(self) -> list:
+        return [result for result in self.results if result.error is not None]
+
+    def summary(self) -> str:
+        added = sum(result.added for result in self.results)
+        removed = sum(result.removed for result in self.results)
+        text = (f"Synced {len(self.results)} messages in {self.elapsed:.1f}s: "
+                f"{len(self.changed)} changed, {added} reactions added, {removed} removed")
+        if self.failed:
+            text += f", failed: {', '.join(f'{result.message_id} ({result.error})' for result in self.failed)}"
+        return text
+
+
+def plan(message: discord.Message, emojis: list) -> tuple:
+    """Work out what has to change for a message to have exactly our reactions, in order.
+    Our reactions that are already there in the right order are left alone, so a message that's
+    already in sync needs nothing, and a new emoji at the end is a single add.
+
+    Parameters
+    ----------
+    message : discord.Message
+        The message, with its current reactions
+    emojis : list
+        The emojis we want on it, in order
+
+    Returns
+    -------
+    tuple
+        (emojis to clear, emojis to add, in order)
+    """
+
+    current = [str(reaction.emoji) for reaction in message.reactions if reaction.me]
+    keep = 0
+    while keep < len(current) and keep < len(emojis) and current[keep] == emojis[keep]:
+        keep += 1
+
+    kept = set(emojis[:keep])
+    remove = [reaction.emoji for reaction in message.reactions if str(reaction.emoji) not in kept]
+    return remove, emojis[keep:]
+
+
+class ReactionSync:
+    """Brings the reactions of reaction role messages in line with their mappings. Instead of
+    clearing every message and adding all of its reactions again, only what differs is changed,
+    and messages are worked on concurrently within a budget per channel.
+
+    Since it only looks at what's on the message, running it again after it was interrupted
+    picks up where it stopped: messages that were finished are skipped with a single fetch.
+
+    Parameters
+    ----------
+    progress : Callable, optional
+        Coroutine called with (messages done, total) after every message, by default None
+    """
+
+    def __init__(self, progress=None):
+        self.progress = progress
+        self.semaphore = asyncio.Semaphore(SYNC_CONCURRENCY)
+        self.channels = {}
+        self.done = 0
+        self.total = 0
+
+    def budget(self, channel: discord.TextChannel) -> asyncio.Semaphore:
+        semaphore = self.channels.get(channel.id)
+        if semaphore is None:
+            semaphore = self.channels[channel.id] = asyncio.Semaphore(CHANNEL_CONCURRENCY)
+        return semaphore
+
+    async def sync_message(self, channel: discord.TextChannel, message_id: int, emojis: list) -> MessageResult:
+        result = MessageResult(message_id)
+        async with self.budget(channel), self.semaphore:
+            try:
+                message = await channel.fetch_message(message_id)
+                remove, add = plan(message, emojis)
+                for emoji in remove:
+                    await message.clear_reaction(emoji)
+                    result.removed += 1
+                for emoji in add:
+                    await message.add_reaction(emoji)
+                    result.added += 1
+            except discord.HTTPException as e:
+                result.error = e
+
+        self.done += 1
+        if self.progress is not None:
+            await self.progress(self.done, self.total)
+        return result
+
+    async def run(self, channel: discord.TextChannel, mappings: dict) -> SyncReport:
+        """Sync the reactions of a set of messages
+
+        Parameters
+        ----------
+        channel : discord.TextChannel
+            Channel the messages are in
+        mappings : dict
+            Emojis we want on each message ({emoji: role ID}) by message ID
+
+        Returns
+        -------
+        SyncReport
+            What happened to every message, and how long it took
+        """
+
+        self.total += len(mappings)
+        start = time.monotonic()
+        results = await asyncio.gather(*[self.sync_message(channel, int(message_id), list(mapping))
+                                         for message_id, mapping in mappings.items()])
+        report = SyncReport(list(results), time.monotonic() - start)
+
+        if report.changed or report.failed:
+            print(report.summary())
+        return report
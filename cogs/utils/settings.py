@@ -1,12 +1,21 @@
+import asyncio
+import functools
 import os
+from datetime import datetime
 
 import discord
 import mongoengine
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from cogs.utils.archive import ArchiveStore
+from cogs.utils.blob_cache import BlobCache
+from cogs.utils.message_archive import MessageArchive
 from cogs.utils.tasks import Tasks
 from data.case import Case
-from data.cases import Cases
+from data.caselog import CaseLog
 from data.filterword import FilterWord
 from data.guild import Guild
+from data.raidphrase import RaidPhrase
 from data.tag import Tag
 from data.user import User
 from data.giveaway import Giveaway
@@ -39,11 +48,37 @@ class Settings(commands.Cog):
         self.bot = bot
         self.guild_id = int(os.environ.get("BOTTY_MAINGUILD"))
         self.permissions = Permissions(self.bot, self)
+        self.bulk_archives = ArchiveStore()
+        self.message_archive = MessageArchive(retention_days=int(os.environ.get("BOTTY_MESSAGE_ARCHIVE_DAYS", 90)))
+        self._tags = None
+        self._tag_uses = {}
+        self._filter_words = None
+        self._rero_mappings = None
+        self._rero_channel = None
+        self.tag_images = BlobCache(max_bytes=int(os.environ.get("BOTTY_TAG_IMAGE_CACHE_MB", 32)) * 1024 * 1024)
 
         print("Loaded database")
 
     async def load_tasks(self):
         self.tasks = Tasks(self.bot)
+        if self.message_archive.retention_days:
+            self.tasks.schedule_prune_message_archive(datetime.now())
+
+    async def migrate(self) -> None:
+        """Move data out of the old document layouts the first time the bot starts after an update,
+        so nothing depends on someone running the migration commands by hand.
+        """
+
+        if not Guild.objects(_id=self.guild_id).only('cases_migrated').first().cases_migrated:
+            moved, skipped = await self.migrate_cases()
+            print(f"Moved {moved} cases to their own documents, skipped {skipped}")
+
+        # migrate_guild_content unsets these once they're copied, so this is only true once
+        legacy_content = Guild._get_collection().find_one(
+            {"_id": self.guild_id, "$or": [{"tags": {"$exists": True}}, {"filter_words": {"$exists": True}}]}, {"_id": 1})
+        if legacy_content is not None:
+            tags, words = await self.migrate_guild_content()
+            print(f"Moved {tags} tags and {words} filter words to their own collections")
 
     def guild(self) -> Guild:
         """Returns the state of the main guild from the database.
@@ -87,47 +122,50 @@ class Settings(commands.Cog):
         }
         g.save()
 
+    def rero_mappings(self) -> dict:
+        """Reaction role mappings ({emoji: role ID}) by message ID. They're read from the database
+        the first time they're needed, along with the reaction roles channel, and kept up to date
+        by the methods below, so reactions never need a database read.
+        """
+
+        if self._rero_mappings is None:
+            g = Guild.objects(_id=self.guild_id).only('reaction_role_mapping', 'channel_reaction_roles').first()
+            self._rero_channel = g.channel_reaction_roles
+            self._rero_mappings = {int(message_id): dict(mapping) for message_id, mapping in g.reaction_role_mapping.items()}
+        return self._rero_mappings
+
+    def rero_channel(self) -> int:
+        self.rero_mappings()
+        return self._rero_channel
+
     async def all_rero_mappings(self):
-        g = self.guild()
-        current = g.reaction_role_mapping
-        return current
+        return self.rero_mappings()
 
     async def add_rero_mapping(self, mapping):
-        g = self.guild()
-        current = g.reaction_role_mapping
         the_key = list(mapping.keys())[0]
-        current[str(the_key)] = mapping[the_key]
-        g.reaction_role_mapping = current
-        g.save()
+        Guild.objects(_id=self.guild_id).update_one(**{f"set__reaction_role_mapping__{the_key}": mapping[the_key]})
+        self.rero_mappings()[int(the_key)] = dict(mapping[the_key])
 
     async def append_rero_mapping(self, mapping):
-        g = self.guild()
-        current = g.reaction_role_mapping
         the_key = list(mapping.keys())[0]
-        current[str(the_key)] = current[str(the_key)] | mapping[the_key]
-        g.reaction_role_mapping = current
-        g.save()
+        current = self.rero_mappings()[int(the_key)] | mapping[the_key]
+        Guild.objects(_id=self.guild_id).update_one(**{f"set__reaction_role_mapping__{the_key}": current})
+        self.rero_mappings()[int(the_key)] = current
 
     async def get_rero_mapping(self, id):
-        g = self.guild()
-        if id in g.reaction_role_mapping:
-            return g.reaction_role_mapping[id]
-        else:
-            return None
+        return self.rero_mappings().get(int(id))
 
     async def delete_rero_mapping(self, id):
-        g = self.guild()
-        if str(id) in g.reaction_role_mapping.keys():
-            g.reaction_role_mapping.pop(str(id))
-            g.save()
+        if self.rero_mappings().pop(int(id), None) is not None:
+            Guild.objects(_id=self.guild_id).update_one(**{f"unset__reaction_role_mapping__{id}": 1})
 
     async def save_emoji_webhook(self, id):
         g = Guild.objects(_id=self.guild_id).first()
         g.emoji_logging_webhook = id
         g.save()
 
-    async def leaderboard(self) -> list:
-        return User.objects[0:130].only('_id', 'xp').order_by('-xp', '-_id').select_related()
+    async def leaderboard(self):
+        return User.objects.only('_id', 'xp', 'level').order_by('-xp', '-_id')
 
     async def leaderboard_rank(self, xp):
         users = User.objects().only('_id', 'xp')
@@ -159,10 +197,7 @@ class Settings(commands.Cog):
         User.objects(_id=id).update_one(inc__level=1)
 
     async def add_case(self, _id: int, case: Case) -> None:
-        """Cases holds all the cases for a particular user with id `_id` as an
-        EmbeddedDocumentListField. This function appends a given case object to
-        this list. If this user doesn't have any previous cases, we first add
-        a new Cases document to the database.
+        """Store a new case for the user with id `_id`. Every case is its own document.
 
         Parameters
         ----------
@@ -172,36 +207,208 @@ class Settings(commands.Cog):
             The case we want to add to the user.
         """
 
-        # ensure this user has a cases document before we try to append the new case
-        await self.cases(_id)
-        Cases.objects(_id=_id).update_one(push__cases=case)
+        case.user_id = _id
+        case.save(force_insert=True)
+
+    async def index_case_log(self, case_id: int, message: discord.Message, replace: bool = False) -> None:
+        """Remember which message a case was logged in, so we can find it again without searching the channel.
+        Only the first log of a case in a channel is kept, unless `replace` is set.
+
+        Parameters
+        ----------
+        case_id : int
+            ID of the case
+        message : discord.Message
+            The log message
+        replace : bool, optional
+            Point the case at this message even if it was already logged in the channel, by default False
+        """
+
+        if replace:
+            CaseLog.objects(case_id=case_id, channel_id=message.channel.id).update_one(set__message_id=message.id, upsert=True)
+        else:
+            CaseLog.objects(case_id=case_id, channel_id=message.channel.id).update_one(set_on_insert__message_id=message.id, upsert=True)
+
+    async def case_log(self, case_id: int, channel_id: int) -> CaseLog:
+        return CaseLog.objects(case_id=case_id, channel_id=channel_id).first()
+
+    async def allocate_case_ids(self, count: int) -> int:
+        """Reserve `count` consecutive case IDs with a single increment of Guild.case_id
+
+        Returns
+        -------
+        int
+            The first reserved ID
+        """
+
+        guild = Guild._get_collection().find_one_and_update({"_id": self.guild_id}, {"$inc": {"case_id": count}}, projection={"case_id": 1})
+        return guild["case_id"]
+
+    async def add_cases(self, cases: dict) -> None:
+        """Add one case to each of several users, with a single bulk insert.
+
+        Parameters
+        ----------
+        cases : dict
+            Case to add, by user ID
+        """
+
+        if not cases:
+            return
+
+        documents = []
+        for _id, case in cases.items():
+            case.user_id = _id
+            case.validate()
+            documents.append(case.to_mongo())
+        Case._get_collection().insert_many(documents, ordered=False)
+
+    async def migrate_cases(self) -> tuple:
+        """Move cases out of the old per-user documents, where they were an ever growing embedded list,
+        into one document per case. Cases that were already moved by an earlier run are skipped.
+        The old collection is left as it is.
+
+        Returns
+        -------
+        tuple
+            Number of cases that were moved, and number of cases that were skipped
+        """
+
+        legacy = Case._get_db()["cases"]
+        moved = skipped = 0
+        for document in legacy.find({"cases.0": {"$exists": True}}, batch_size=100):
+            cases = [dict(case, user_id=document["_id"]) for case in document["cases"]]
+            existing = set(Case.objects(_id__in=[case["_id"] for case in cases]).distinct("_id"))
+            cases = [case for case in cases if case["_id"] not in existing]
+            skipped += len(existing)
+            if not cases:
+                continue
+
+            try:
+                moved += len(Case._get_collection().insert_many(cases, ordered=False).inserted_ids)
+            except BulkWriteError as e:
+                # the same case ID ended up in two users' lists
+                moved += e.details["nInserted"]
+                skipped += len(cases) - e.details["nInserted"]
+
+        Case.ensure_indexes()
+        Guild.objects(_id=self.guild_id).update_one(set__cases_migrated=True)
+        return moved, skipped
+
+    def filter_words(self) -> list:
+        """All filtered words. Like tags, they're loaded once and again after they change.
+        """
+
+        if self._filter_words is None:
+            self._filter_words = list(FilterWord.objects)
+        return self._filter_words
 
     async def add_filtered_word(self, fw: FilterWord) -> None:
-        Guild.objects(_id=self.guild_id).update_one(push__filter_words=fw)
+        fw.save()
+        self._filter_words = None
 
     async def remove_filtered_word(self, word: str):
-        return Guild.objects(_id=self.guild_id).update_one(pull__filter_words__word=FilterWord(word=word).word)
+        self._filter_words = None
+        return FilterWord.objects(word=word).delete()
 
     async def update_filtered_word(self, word: FilterWord):
-        return Guild.objects(_id=self.guild_id, filter_words__word=word.word).update_one(set__filter_words__S=word)
-    
+        self._filter_words = None
+        return word.save()
+
+    def tags(self) -> dict:
+        """All tags by name. The index is built from the database the first time it's needed
+        and again after a tag is added, edited or removed.
+        """
+
+        if self._tags is None:
+            self._tags = {tag.name: tag for tag in Tag.objects.order_by('name')}
+        return self._tags
+
     async def add_tag(self, tag: Tag) -> None:
-        Guild.objects(_id=self.guild_id).update_one(push__tags=tag)
+        tag.save()
+        self._tags = None
 
     async def remove_tag(self, tag: str):
-        return Guild.objects(_id=self.guild_id).update_one(pull__tags__name=Tag(name=tag).name)
+        self._tag_uses.pop(tag, None)
+        self._tags = None
+        return Tag.objects(name=tag).delete()
 
     async def edit_tag(self, tag):
-        return Guild.objects(_id=self.guild_id, tags__name=tag.name).update_one(set__tags__S=tag)
+        # the use count we're about to write already includes the uses that weren't flushed yet
+        self._tag_uses.pop(tag.name, None)
+        self._tags = None
+        return tag.save()
 
     async def get_tag(self, name: str):
-        tag = Guild.objects.get(_id=self.guild_id).tags.filter(name=name).first()
+        return self.tags().get(name)
+
+    async def use_tag(self, name: str):
+        """Get a tag to show it, and count the use. Uses are only counted in memory here,
+        they're written to the database in batches by flush_tag_uses.
+
+        Parameters
+        ----------
+        name : str
+            Name of the tag
+
+        Returns
+        -------
+        Tag
+            The tag, or None if it doesn't exist
+        """
+
+        tag = self.tags().get(name)
         if tag is None:
             return
         tag.use_count += 1
-        await self.edit_tag(tag)
+        self._tag_uses[name] = self._tag_uses.get(name, 0) + 1
         return tag
 
+    async def flush_tag_uses(self) -> None:
+        """Write the tag uses counted since the last flush to the database, in a single bulk write
+        """
+
+        if not self._tag_uses:
+            return
+
+        uses = self._tag_uses
+        self._tag_uses = {}
+        requests = [UpdateOne({"name": name}, {"$inc": {"use_count": count}}) for name, count in uses.items()]
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, functools.partial(Tag._get_collection().bulk_write, requests, ordered=False))
+
+    async def migrate_guild_content(self) -> tuple:
+        """Move tags and filter words that are still embedded in the guild document into their
+        own collections. The raw subdocuments are copied as they are, so tag images keep pointing
+        to the same files in GridFS. Anything that was already copied by an earlier run is skipped.
+
+        Returns
+        -------
+        tuple
+            Number of tags and filter words that were moved
+        """
+
+        guilds = Guild._get_collection()
+        legacy = guilds.find_one({"_id": self.guild_id}, {"tags": 1, "filter_words": 1}) or {}
+
+        existing = set(Tag.objects.distinct("name"))
+        tags = [tag for tag in legacy.get("tags", []) if tag.get("name") not in existing]
+        if tags:
+            Tag._get_collection().insert_many(tags)
+
+        existing = set(FilterWord.objects.distinct("word"))
+        words = [word for word in legacy.get("filter_words", []) if word.get("word") not in existing]
+        if words:
+            FilterWord._get_collection().insert_many(words)
+
+        Tag.ensure_indexes()
+        FilterWord.ensure_indexes()
+        guilds.update_one({"_id": self.guild_id}, {"$unset": {"tags": "", "filter_words": ""}})
+
+        self._tags = None
+        self._filter_words = None
+        return len(tags), len(words)
+
     async def add_whitelisted_guild(self, id: int):
         g = Guild.objects(_id=self.guild_id)
         g2 = g.first()
@@ -267,7 +474,6 @@ class Settings(commands.Cog):
 
     async def get_case(self, _id: int, case_id: int) -> Case:
         """Get the case with ID `case_id`, which belongs to the punishee given by ID `_id`.
-        If the user doesn't have a Cases document in the database, first create that.
 
         Parameters
         ----------
@@ -279,13 +485,10 @@ class Settings(commands.Cog):
         Returns
         -------
         Case
-            The Case object representing the case.
+            The Case object representing the case, or None if the user has no such case.
         """
 
-        # first we ensure this user has a Cases document in the database before continuing
-        await self.cases(_id)
-        case = Cases.objects(_id=_id).first()
-        return case
+        return Case.objects(_id=case_id, user_id=_id).first()
 
     async def user(self, id: int) -> User:
         """Look up the User document of a user, whose ID is given by `id`.
@@ -320,22 +523,15 @@ class Settings(commands.Cog):
         u2.level = 0
         u2.save()
         
-        cases = await self.cases(oldmember)
-        cases._id = newmember
-        cases.save()
-        
-        cases2 = await self.cases(oldmember)
-        cases2.cases = []
-        cases2.save()
-        
-        return u, len(cases.cases)
+        case_count = Case.objects(user_id=oldmember).update(set__user_id=newmember)
+
+        return u, case_count
 
     async def retrieve_birthdays(self, date):
-        return User.objects(birthday=date)
+        return User.objects(birthday=date, birthday_excluded=False)
 
-    async def cases(self, id: int) -> Cases:
-        """Return the Document representing the cases of a user, whose ID is given by `id`
-        If the user doesn't have a Cases document in the database, first create that.
+    async def cases(self, id: int):
+        """Return the cases of a user, whose ID is given by `id`, newest first. UNMUTE cases are left out.
 
         Parameters
         ----------
@@ -344,21 +540,14 @@ class Settings(commands.Cog):
 
         Returns
         -------
-        Cases
-            [description]
+        QuerySet
+            The user's cases
         """
 
-        cases = Cases.objects(_id=id).first()
-        # first we ensure this user has a Cases document in the database before continuing
-        if cases is None:
-            cases = Cases()
-            cases._id = id
-            cases.save()
-        return cases
+        return Case.objects(user_id=id, _type__ne="UNMUTE").order_by('-_id')
 
     async def rundown(self, id: int) -> list:
         """Return the 3 most recent cases of a user, whose ID is given by `id`
-        If the user doesn't have a Cases document in the database, first create that.
 
         Parameters
         ----------
@@ -367,24 +556,12 @@ class Settings(commands.Cog):
 
         Returns
         -------
-        Cases
-            [description]
+        list
+            Up to 3 Case objects, newest first
         """
 
-        cases = Cases.objects(_id=id).first()
-        # first we ensure this user has a Cases document in the database before continuing
-        if cases is None:
-            cases = Cases()
-            cases._id = id
-            cases.save()
-            return []
-
-        cases = cases.cases
-        cases = filter(lambda x: x._type != "UNMUTE", cases)
-        cases = sorted(cases, key=lambda i: i['date'])
-        cases.reverse()
-        return cases[0:3]
-    
+        return list(Case.objects(user_id=id, _type__ne="UNMUTE").order_by('-date').limit(3))
+
     async def get_giveaway(self, _id: int) -> Giveaway:
         """
         Return the Document representing a giveaway, whose ID (message ID) is given by `id`
@@ -442,11 +619,11 @@ class Settings(commands.Cog):
         existing = self.guild().raid_phrases.filter(word=phrase)
         if(len(existing) > 0):
             return False
-        Guild.objects(_id=self.guild_id).update_one(push__raid_phrases=FilterWord(word=phrase, bypass=5, notify=True))
+        Guild.objects(_id=self.guild_id).update_one(push__raid_phrases=RaidPhrase(word=phrase, bypass=5, notify=True))
         return True
     
     async def remove_raid_phrase(self, phrase: str):
-        Guild.objects(_id=self.guild_id).update_one(pull__raid_phrases__word=FilterWord(word=phrase).word)
+        Guild.objects(_id=self.guild_id).update_one(pull__raid_phrases__word=RaidPhrase(word=phrase).word)
 
     async def inc_trivia_points(self, _id, points):
         await self.user(_id)
@@ -463,8 +640,8 @@ class Settings(commands.Cog):
                 u.save()
         return count
 
-    async def trivia_leaderboard(self) -> list:
-        return User.objects[0:100].only('_id', 'trivia_points').order_by('-trivia_points', '-_trivia_points').select_related()
+    async def trivia_leaderboard(self):
+        return User.objects(trivia_points__ne=0).only('_id', 'trivia_points').order_by('-trivia_points', '-_id')
 
     async def set_spam_mode(self, mode) -> None:
         Guild.objects(_id=self.guild_id).update_one(set__ban_today_spam_accounts=mode)
@@ -498,7 +675,8 @@ class Permissions:
         self.bot = bot
         self.settings = settings
         guild_id = self.settings.guild_id
-        the_guild = settings.guild()
+        # the role IDs are read the first time a permission is checked instead of while loading
+        self._guild = None
 
         # This dict maps a permission level to a lambda function which, when given the right paramters,
         # will return True or False if a user has that permission level.
@@ -506,19 +684,19 @@ class Permissions:
             0: lambda x, y: True,
 
             1: (lambda guild, m: self.hasAtLeast(guild, m, 2) or (guild.id == guild_id
-                and guild.get_role(the_guild.role_memberplus) in m.roles)),
+                and guild.get_role(self.the_guild.role_memberplus) in m.roles)),
 
             2: (lambda guild, m: self.hasAtLeast(guild, m, 3) or (guild.id == guild_id
-                and guild.get_role(the_guild.role_memberpro) in m.roles)),
+                and guild.get_role(self.the_guild.role_memberpro) in m.roles)),
 
             3: (lambda guild, m: self.hasAtLeast(guild, m, 4) or (guild.id == guild_id
-                and guild.get_role(the_guild.role_memberedition) in m.roles)),
+                and guild.get_role(self.the_guild.role_memberedition) in m.roles)),
 
             4: (lambda guild, m: self.hasAtLeast(guild, m, 5) or (guild.id == guild_id
-                and guild.get_role(the_guild.role_genius) in m.roles)),
+                and guild.get_role(self.the_guild.role_genius) in m.roles)),
 
             5: (lambda guild, m: self.hasAtLeast(guild, m, 6) or (guild.id == guild_id
-                and guild.get_role(the_guild.role_moderator) in m.roles)),
+                and guild.get_role(self.the_guild.role_moderator) in m.roles)),
 
             6: (lambda guild, m: self.hasAtLeast(guild, m, 7) or (guild.id == guild_id
                 and m.guild_permissions.manage_guild)),
@@ -546,6 +724,12 @@ class Permissions:
             10: "Bot owner",
         }
 
+    @property
+    def the_guild(self) -> Guild:
+        if self._guild is None:
+            self._guild = self.settings.guild()
+        return self._guild
+
     def hasAtLeast(self, guild: discord.Guild, member: discord.Member, level: int) -> bool:
         """Checks whether a user given by `member` has at least the permission level `level`
         in guild `guild`. Using the `self.permissions` dict-lambda thing.
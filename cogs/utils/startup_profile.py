@@ -0,0 +1,77 @@
+import os
+import time
+
+
+class StartupProfile:
+    """Times how long every extension takes to import and to set up, so slow startups can be
+    tracked down to a cog. Turned on with BOTTY_STARTUP_PROFILE=1, otherwise extensions are loaded
+    like they always are.
+
+    Parameters
+    ----------
+    enabled : bool
+        Whether to time extensions
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.started_at = time.monotonic()
+        # (extension, seconds spent importing, seconds spent in setup)
+        self.extensions = []
+
+    @classmethod
+    def from_env(cls):
+        return cls(os.environ.get("BOTTY_STARTUP_PROFILE", "0").lower() in ("1", "true", "yes"))
+
+    def load_extension(self, bot, name: str) -> None:
+        """Load an extension, timing it if profiling is on
+
+        Parameters
+        ----------
+        bot : commands.Bot
+            The bot
+        name : str
+            Dotted path of the extension
+        """
+
+        if not self.enabled:
+            bot.load_extension(name)
+            return
+
+        # the module is only run once, by load_extension. Setup builds the cog and hands it to
+        # add_cog, so the first add_cog call is where we split import from setup. That puts the
+        # cog's __init__ under import, what's left for setup is registering its commands and listeners
+        added = []
+        add_cog = bot.add_cog
+
+        def timed_add_cog(cog):
+            if not added:
+                added.append(time.perf_counter())
+            add_cog(cog)
+
+        bot.add_cog = timed_add_cog
+        start = time.perf_counter()
+        try:
+            bot.load_extension(name)
+        finally:
+            del bot.add_cog
+        end = time.perf_counter()
+
+        imported = added[0] if added else end
+        self.extensions.append((name, imported - start, end - imported))
+
+    def report(self) -> None:
+        """Print the extensions we loaded so far, slowest first
+        """
+
+        if not self.enabled:
+            return
+
+        print(f"{'Extension':<40} {'Import':>8} {'Setup':>8}")
+        for name, imported, setup in sorted(self.extensions, key=lambda extension: extension[1] + extension[2], reverse=True):
+            print(f"{name:<40} {imported * 1000:>6.0f}ms {setup * 1000:>6.0f}ms")
+
+        total_import = sum(extension[1] for extension in self.extensions)
+        total_setup = sum(extension[2] for extension in self.extensions)
+        print(f"{len(self.extensions)} extensions imported in {total_import:.2f}s and set up in {total_setup:.2f}s, "
+              f"{time.monotonic() - self.started_at:.2f}s since startup")
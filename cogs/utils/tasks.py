@@ -1,31 +1,66 @@
-import logging
-from datetime import datetime
+import asyncio
+import heapq
+import pickle
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta, timezone
 
 import discord
 import random
-from apscheduler.executors.pool import ThreadPoolExecutor
-from apscheduler.jobstores.mongodb import MongoDBJobStore
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from cogs.utils.logs import prepare_unmute_log
 from data.case import Case
+from data.giveaway import Giveaway
+from data.job import Job
+from data.user import User
+from mongoengine.errors import NotUniqueError
+from pymongo.errors import BulkWriteError
 
-jobstores = {
-    'default': MongoDBJobStore(database="botty", collection="jobs", host="127.0.0.1"),
-}
+BOT_GLOBAL = None
 
-executors = {
-    'default': ThreadPoolExecutor(20)
-}
+# jobs due within this window are kept in memory, everything later stays in the database
+WINDOW = timedelta(minutes=15)
+# overdue jobs are run this many at a time when we start up
+CATCH_UP_BATCH = 25
+# how many role removals run at the same time when catching up on expired mutes
+UNMUTE_CONCURRENCY = 5
+# giveaway entrants are saved this many at a time while we page through the reactions
+ENTRY_BATCH = 1000
+# how often messages past their retention are removed from the message archive
+PRUNE_INTERVAL = timedelta(days=1)
 
-job_defaults = {
-    # 'coalesce': True
-}
 
-BOT_GLOBAL = None
+class ConflictingJobError(Exception):
+    """Raised when scheduling a job whose ID is already taken, i.e the user is already muted
+    """
+
+
+class JobNotFoundError(Exception):
+    """Raised when cancelling a job that doesn't exist
+    """
+
+
+def _to_timestamp(date: datetime) -> float:
+    # naive datetimes are local time, like datetime.now() gives us
+    return date.timestamp()
+
+
+def _to_utc(date: datetime) -> datetime:
+    # Mongo stores naive UTC datetimes
+    return datetime.utcfromtimestamp(_to_timestamp(date))
+
+
+def _from_utc(date: datetime) -> float:
+    return date.replace(tzinfo=timezone.utc).timestamp()
 
 
 class Tasks():
-    """Job scheduler for unmute, using APScheduler
+    """Scheduler for unmutes, reminders, giveaways and so on. Jobs are persisted in Mongo, and only
+    the ones due in the next `WINDOW` are kept in an in-memory heap which a single asyncio task
+    sleeps on, so jobs far in the future cost nothing until they come close.
+
+    Job IDs are `<kind>:<key>`, e.g `unmute:<user ID>`, so scheduling the same thing twice
+    raises ConflictingJobError instead of silently colliding with an unrelated job.
     """
 
     def __init__(self, bot: discord.Client):
@@ -40,12 +75,343 @@ class Tasks():
         global BOT_GLOBAL
         BOT_GLOBAL = bot
 
-        logging.basicConfig()
-        logging.getLogger('apscheduler').setLevel(logging.DEBUG)
+        self.bot = bot
+        # (timestamp, job ID) pairs. Cancelled jobs are left in the heap and skipped
+        # when they come up, `loaded` is what decides whether a job is still live
+        self.heap = []
+        self.loaded = {}
+        self.window_end = 0
+        self.wakeup = asyncio.Event()
+
+        self.import_apscheduler_jobs()
+        self.runner = bot.loop.create_task(self.run())
+
+    def import_apscheduler_jobs(self) -> None:
+        """Move jobs left over from the old APScheduler job store into our own collection.
+        The job state is pickled by APScheduler, so this needs it installed until every
+        deployment has been migrated.
+        """
+
+        old_jobs = Job._get_collection().database["jobs"]
+        if old_jobs.estimated_document_count() == 0:
+            return
+
+        kinds = {
+            "unmute_callback": "unmute",
+            "reminder_callback": "remind",
+            "remove_bday_callback": "remove_bday",
+            "end_giveaway_callback": "end_giveaway",
+            "remove_raid_phrase": "remove_raid_phrase",
+        }
+
+        for document in old_jobs.find():
+            try:
+                state = pickle.loads(document["job_state"])
+                kind = kinds[state["func"].split(":")[-1]]
+                args = list(state["args"])
+                key = self._key(kind, args)
+                run_at = datetime.utcfromtimestamp(document["next_run_time"])
+                Job(_id=f"{kind}:{key}", kind=kind, run_at=run_at, args=args).save(force_insert=True)
+            except NotUniqueError:
+                pass
+            except Exception:
+                traceback.print_exc()
+                continue
+            old_jobs.delete_one({"_id": document["_id"]})
+
+    @staticmethod
+    def _key(kind: str, args: list) -> str:
+        if kind in ["unmute", "remove_bday", "remove_raid_phrase"]:
+            return str(args[0])
+        if kind == "end_giveaway":
+            return str(args[1])
+        return uuid.uuid4().hex
+
+    async def run(self) -> None:
+        try:
+            await self.reconcile_unmutes()
+            await self.catch_up()
+        except Exception:
+            traceback.print_exc()
+
+        while True:
+            now = time.time()
+            try:
+                if now >= self.window_end:
+                    self.load_window(now)
+
+                while self.heap and self.heap[0][0] <= now:
+                    run_at, job_id = heapq.heappop(self.heap)
+                    job = self.loaded.get(job_id)
+                    if job is None or job[0] != run_at:
+                        # cancelled
+                        continue
+                    del self.loaded[job_id]
+                    self.fire(job_id, job[1], job[2])
+            except Exception:
+                # most likely the database went away, try again in a bit
+                traceback.print_exc()
+                await asyncio.sleep(10)
+                continue
+
+            next_run = self.window_end
+            if self.heap:
+                next_run = min(next_run, self.heap[0][0])
+
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=max(0, next_run - time.time()))
+            except asyncio.TimeoutError:
+                pass
+
+    def load_window(self, now: float) -> None:
+        window_end = now + WINDOW.total_seconds()
+        for job in Job.objects(run_at__lt=datetime.utcfromtimestamp(window_end)):
+            if job._id not in self.loaded:
+                self._push(job._id, _from_utc(job.run_at), job.kind, job.args)
+        self.window_end = window_end
+
+    def _push(self, job_id: str, run_at: float, kind: str, args: list) -> None:
+        self.loaded[job_id] = (run_at, kind, args)
+        heapq.heappush(self.heap, (run_at, job_id))
+
+    def fire(self, job_id: str, kind: str, args: list) -> None:
+        # deleting the job claims it, if it's gone it was cancelled in the meantime
+        if Job.objects(_id=job_id).delete() == 0:
+            return
+        self.bot.loop.create_task(self.execute(job_id, kind, args))
+
+    async def execute(self, job_id: str, kind: str, args: list) -> None:
+        try:
+            await HANDLERS[kind](*args)
+        except Exception:
+            print(f"Job {job_id} failed")
+            traceback.print_exc()
+
+    async def catch_up(self) -> None:
+        """Run jobs that came due while the bot was offline, a batch at a time so a long downtime
+        doesn't flood the API all at once.
+        """
+
+        while True:
+            now = datetime.utcnow()
+            batch = list(Job.objects(run_at__lte=now).order_by('run_at').limit(CATCH_UP_BATCH))
+            if not batch:
+                return
+
+            Job.objects(_id__in=[job._id for job in batch]).delete()
+            await asyncio.gather(*[self.execute(job._id, job.kind, job.args) for job in batch])
+
+    async def reconcile_unmutes(self) -> None:
+        """Lift every mute that expired while the bot was offline in one pass, instead of running
+        each unmute job on its own: the expired jobs are fetched with one query, the case IDs
+        are reserved with one increment, the cases and mute flags are written with one bulk write
+        each, and a single log is posted. Afterwards, users whose mute flag doesn't match their
+        roles are reported to the private logs.
+        """
+
+        await self.bot.cache_profile.members_ready.wait()
+
+        expired = list(Job.objects(kind="unmute", run_at__lte=datetime.utcnow()))
+        if len(expired) > 1:
+            Job.objects(_id__in=[job._id for job in expired]).delete()
+            await self.bulk_unmute([job.args[0] for job in expired])
+
+        await self.report_mute_drift()
+
+    async def bulk_unmute(self, ids: list) -> None:
+        settings = self.bot.settings
+        db_guild = settings.guild()
+        guild = self.bot.get_guild(settings.guild_id)
+        if guild is None:
+            return
+
+        mute_role = guild.get_role(db_guild.role_mute)
+        semaphore = asyncio.Semaphore(UNMUTE_CONCURRENCY)
+        failed = []
+
+        async def remove_role(member):
+            async with semaphore:
+                try:
+                    await member.remove_roles(mute_role, reason="Temporary mute expired.")
+                except discord.HTTPException:
+                    failed.append(member)
+
+        members = [guild.get_member(id) for id in ids]
+        if mute_role is not None:
+            await asyncio.gather(*[remove_role(member) for member in members if member is not None and mute_role in member.roles])
+
+        first_id = await settings.allocate_case_ids(len(ids))
+        cases = {}
+        for i, id in enumerate(ids):
+            cases[id] = Case(
+                _id=first_id + i,
+                _type="UNMUTE",
+                mod_id=self.bot.user.id,
+                mod_tag=str(self.bot.user),
+                reason="Temporary mute expired.",
+            )
+        await settings.add_cases(cases)
+        User.objects(_id__in=ids).update(set__is_muted=False)
+
+        public_chan = guild.get_channel(db_guild.channel_public)
+        if public_chan is None:
+            return
+
+        lines = []
+        for id, member in zip(ids, members):
+            lines.append(f"{member if member is not None else id} (<@{id}>) | Case #{cases[id]._id}")
+
+        embed = discord.Embed(title="Members Unmuted")
+        embed.color = discord.Color.green()
+        embed.description = "Temporary mutes that expired while I was offline:\n\n" + "\n".join(lines)
+        if len(embed.description) > 2000:
+            embed.description = embed.description[:2000] + "..."
+        if failed:
+            embed.add_field(name="Couldn't remove the mute role from", value=", ".join(member.mention for member in failed)[:1024])
+        embed.add_field(name="Mod", value=f'{self.bot.user} ({self.bot.user.mention})', inline=True)
+        embed.add_field(name="Reason", value="Temporary mute expired.", inline=True)
+        embed.timestamp = datetime.now()
+        await public_chan.send(embed=embed)
+
+    async def report_mute_drift(self) -> None:
+        """Find users whose is_muted flag disagrees with whether they have the mute role,
+        and list them in the private logs so a mod can fix them up.
+        """
+
+        settings = self.bot.settings
+        db_guild = settings.guild()
+        guild = self.bot.get_guild(settings.guild_id)
+        if guild is None:
+            return
+        mute_role = guild.get_role(db_guild.role_mute)
+        if mute_role is None:
+            return
+
+        flagged = {user._id for user in User.objects(is_muted=True).only('_id')}
+        with_role = {member.id for member in mute_role.members}
+
+        # users who left the server can't have the role, so we can't say anything about them
+        flag_only = [id for id in flagged - with_role if guild.get_member(id) is not None]
+        role_only = list(with_role - flagged)
+        if not flag_only and not role_only:
+            return
+
+        channel = guild.get_channel(db_guild.channel_private)
+        if channel is None:
+            return
+
+        embed = discord.Embed(title="Mute State Mismatch")
+        embed.color = discord.Color.orange()
+        if flag_only:
+            embed.add_field(name="Marked as muted, but don't have the mute role", value=" ".join(f"<@{id}>" for id in flag_only)[:1024], inline=False)
+        if role_only:
+            embed.add_field(name="Have the mute role, but aren't marked as muted", value=" ".join(f"<@{id}>" for id in role_only)[:1024], inline=False)
+        embed.timestamp = datetime.now()
+        await channel.send(embed=embed)
+
+    def schedule(self, kind: str, key: str, date: datetime, args: list) -> str:
+        """Schedule a job
+
+        Parameters
+        ----------
+        kind : str
+            What to run, one of the keys of HANDLERS
+        key : str
+            Identifies this job among jobs of the same kind
+        date : datetime.datetime
+            When to run it
+        args : list
+            Arguments to pass to the handler
+
+        Returns
+        -------
+        str
+            ID of the job
+
+        Raises
+        ------
+        ConflictingJobError
+            If a job with the same kind and key is already scheduled
+        """
+
+        job_id = f"{kind}:{key}"
+        try:
+            Job(_id=job_id, kind=kind, run_at=_to_utc(date), args=args).save(force_insert=True)
+        except NotUniqueError:
+            raise ConflictingJobError(f"Job {job_id} is already scheduled")
+
+        self._loaded_if_due(job_id, _to_timestamp(date), kind, args)
+        return job_id
+
+    def schedule_many(self, jobs: list) -> list:
+        """Schedule several jobs with a single write
+
+        Parameters
+        ----------
+        jobs : list
+            (kind, key, date, args) tuples
+
+        Returns
+        -------
+        list
+            IDs of the jobs that were scheduled. Jobs whose ID was already taken are skipped
+        """
+
+        if not jobs:
+            return []
+
+        documents = [{"_id": f"{kind}:{key}", "kind": kind, "run_at": _to_utc(date), "args": args} for kind, key, date, args in jobs]
+        failed = set()
+        try:
+            Job._get_collection().insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            failed = {error["index"] for error in e.details["writeErrors"]}
+
+        scheduled = []
+        for i, (kind, key, date, args) in enumerate(jobs):
+            if i in failed:
+                continue
+            self._loaded_if_due(documents[i]["_id"], _to_timestamp(date), kind, args)
+            scheduled.append(documents[i]["_id"])
+        return scheduled
+
+    def _loaded_if_due(self, job_id: str, run_at: float, kind: str, args: list) -> None:
+        if run_at < self.window_end:
+            self._push(job_id, run_at, kind, args)
+            self.wakeup.set()
+
+    def cancel(self, kind: str, key: str) -> None:
+        """Cancel a scheduled job
+
+        Raises
+        ------
+        JobNotFoundError
+            If there was no such job
+        """
+
+        job_id = f"{kind}:{key}"
+        self.loaded.pop(job_id, None)
+        if Job.objects(_id=job_id).delete() == 0:
+            raise JobNotFoundError(f"Job {job_id} was not found")
+
+    def cancel_many(self, job_ids: list) -> int:
+        """Cancel several jobs with a single write
+
+        Parameters
+        ----------
+        job_ids : list
+            IDs of the jobs to cancel
+
+        Returns
+        -------
+        int
+            How many jobs were cancelled
+        """
 
-        self.tasks = AsyncIOScheduler(
-            jobstores=jobstores, executors=executors, job_defaults=job_defaults, event_loop=bot.loop)
-        self.tasks.start()
+        for job_id in job_ids:
+            self.loaded.pop(job_id, None)
+        return Job.objects(_id__in=list(job_ids)).delete()
 
     def schedule_unmute(self, id: int, date: datetime) -> None:
         """Create a task to unmute user given by ID `id`, at time `date`
@@ -58,8 +424,7 @@ class Tasks():
             When to unmute
         """
 
-        self.tasks.add_job(unmute_callback, 'date', id=str(
-            id), next_run_time=date, args=[id], misfire_grace_time=3600)
+        self.schedule("unmute", id, date, [id])
 
     def schedule_remove_bday(self, id: int, date: datetime) -> None:
         """Create a task to remove birthday role from user given by ID `id`, at time `date`
@@ -72,8 +437,7 @@ class Tasks():
             When to remove role
         """
 
-        self.tasks.add_job(remove_bday_callback, 'date', id=str(
-            id+1), next_run_time=date, args=[id], misfire_grace_time=3600)
+        self.schedule("remove_bday", id, date, [id])
 
     def cancel_unmute(self, id: int) -> None:
         """When we manually unmute a user given by ID `id`, stop the task to unmute them.
@@ -84,7 +448,7 @@ class Tasks():
             User whose unmute task we want to cancel
         """
 
-        self.tasks.remove_job(str(id), 'default')
+        self.cancel("unmute", id)
 
     def cancel_unbirthday(self, id: int) -> None:
         """When we manually unset the birthday of a user given by ID `id`, stop the task to remove the role.
@@ -93,7 +457,7 @@ class Tasks():
         id : int
             User whose task we want to cancel
         """
-        self.tasks.remove_job(str(id+1), 'default')
+        self.cancel("remove_bday", id)
         
     def schedule_end_giveaway(self, channel_id: int, message_id: int, date: datetime, winners: int) -> None:
         """
@@ -109,7 +473,18 @@ class Tasks():
             When to end the giveaway
         """
 
-        self.tasks.add_job(end_giveaway_callback, 'date', id=str(message_id+2), next_run_time=date, args=[channel_id, message_id, winners], misfire_grace_time=3600)
+        self.schedule("end_giveaway", message_id, date, [channel_id, message_id, winners])
+
+    def cancel_end_giveaway(self, message_id: int) -> None:
+        """Stop the task to end a giveaway, when it's ended early
+
+        Parameters
+        ----------
+        message_id : int
+            Giveaway message ID
+        """
+
+        self.cancel("end_giveaway", message_id)
 
     def schedule_reminder(self, id: int, reminder: str, date: datetime) -> None:
         """Create a task to remind someone of id `id` of something `reminder` at time `date`
@@ -124,8 +499,7 @@ class Tasks():
             When to remind
         """
 
-        self.tasks.add_job(reminder_callback, 'date', id=str(
-            id+random.randint(5, 100)), next_run_time=date, args=[id, reminder], misfire_grace_time=3600)
+        self.schedule("remind", uuid.uuid4().hex, date, [id, reminder])
 
     def schedule_remove_raid_phrase(self, phrase: str, date: datetime) -> None:
         """Create a task to remove a raid phrase
@@ -138,21 +512,22 @@ class Tasks():
             When to remove the phrase
         """
 
-        self.tasks.add_job(remove_raid_phrase, 'date', id=str(random.getrandbits(64)), next_run_time=date, args=[phrase], misfire_grace_time=3600)
-
-
+        self.schedule("remove_raid_phrase", phrase, date, [phrase])
 
-def unmute_callback(id: int) -> None:
-    """Callback function for actually unmuting. Creates asyncio task
-    to do the actual unmute.
+    def schedule_prune_message_archive(self, date: datetime) -> None:
+        """Create a task to remove old messages from the message archive, unless there already is one.
+        The task schedules the next one itself, every PRUNE_INTERVAL.
 
-    Parameters
-    ----------
-    id : int
-        User who we want to unmute
-    """
+        Parameters
+        ----------
+        date : datetime.datetime
+            When to prune
+        """
 
-    BOT_GLOBAL.loop.create_task(remove_mute(id))
+        try:
+            self.schedule("prune_message_archive", "archive", date, [])
+        except ConflictingJobError:
+            pass
 
 
 async def remove_mute(id: int) -> None:
@@ -200,7 +575,8 @@ async def remove_mute(id: int) -> None:
                 except Exception:
                     dmed = False
                     
-                await public_chan.send(user.mention if not dmed else "", embed=log)
+                message = await public_chan.send(user.mention if not dmed else "", embed=log)
+                await BOT_GLOBAL.settings.index_case_log(case._id, message)
 
             else:
                 case = Case(
@@ -217,9 +593,6 @@ async def remove_mute(id: int) -> None:
                 u.is_muted = False
                 u.save()
 
-def reminder_callback(id: int, reminder: str):
-    BOT_GLOBAL.loop.create_task(remind(id, reminder))
-
 async def remind(id, reminder):
     """Remind the user callback
 
@@ -245,19 +618,6 @@ async def remind(id, reminder):
         channel = guild.get_channel(BOT_GLOBAL.settings.guild().channel_botspam)
         await channel.send(member.mention, embed=embed)
 
-def remove_bday_callback(id: int) -> None:
-    """Callback function for actually unmuting. Creates asyncio task
-    to do the actual unmute.
-
-    Parameters
-    ----------
-    id : int
-        User who we want to unmute
-    """
-
-    BOT_GLOBAL.loop.create_task(remove_bday(id))
-
-
 async def remove_bday(id: int) -> None:
     """Remove the bday role of the user given by ID `id`
 
@@ -279,19 +639,46 @@ async def remove_bday(id: int) -> None:
     user = guild.get_member(id)
     await user.remove_roles(bday_role)
 
-def end_giveaway_callback(channel_id: int, message_id: int, winners: int) -> None:
-    """
-    Callback function for ending a giveaway
+async def collect_entrants(reaction: discord.Reaction, giveaway_id: int, guild: discord.Guild) -> list:
+    """Page through everyone who entered a giveaway, saving them to the database in batches
+    as we go instead of loading every user first.
 
     Parameters
     ----------
-    channel_id : int
-        ID of the channel that the giveaway is in
-    message_id : int
-        Message ID of the giveaway
+    reaction : discord.Reaction
+        The giveaway reaction
+    giveaway_id : int
+        ID of the giveaway, to save the entries to
+    guild : discord.Guild
+        The guild, to check who is still a member
+
+    Returns
+    -------
+    list
+        IDs of the entrants who are still in the guild
     """
 
-    BOT_GLOBAL.loop.create_task(end_giveaway(channel_id, message_id, winners))
+    Giveaway.objects(_id=giveaway_id).update_one(set__entries=[])
+
+    eligible = []
+    batch = []
+    async for user in reaction.users(limit=None):
+        if user.bot:
+            continue
+
+        batch.append(user.id)
+        if guild.get_member(user.id) is not None:
+            eligible.append(user.id)
+
+        if len(batch) >= ENTRY_BATCH:
+            Giveaway.objects(_id=giveaway_id).update_one(push_all__entries=batch)
+            batch = []
+
+    if batch:
+        Giveaway.objects(_id=giveaway_id).update_one(push_all__entries=batch)
+
+    return eligible
+
 
 async def end_giveaway(channel_id: int, message_id: int, winners: int) -> None:
     """
@@ -321,36 +708,18 @@ async def end_giveaway(channel_id: int, message_id: int, winners: int) -> None:
     embed.timestamp = datetime.now()
     embed.color = discord.Color.default()
 
-    reaction = message.reactions[0]
-    reacted_users = await reaction.users().flatten()
-    reacted_ids = [user.id for user in reacted_users]
-    reacted_ids.remove(BOT_GLOBAL.user.id)
-
-    if len(reacted_ids) < winners:
-        winners = len(reacted_ids)
-
-    rand_ids = random.sample(reacted_ids, winners)
-    winner_ids = []
-    mentions = []
-    tries = 0
-    for user_id in rand_ids:
-        tries += 1
-        member = guild.get_member(user_id)
-        while member is None or member.mention in mentions: # ensure that member hasn't left the server while simultaneously ensuring that we don't add duplicate members if we select a new random one
-            tries += 1
-            if tries > winners + 20:
-                member = None
-                break
-            member = guild.get_member(random.choice(reacted_ids))
-        if member is not None:
-            mentions.append(member.mention)
-            winner_ids.append(member.id)
-
     g = await BOT_GLOBAL.settings.get_giveaway(_id=message.id)
-    g.entries = reacted_ids
-    g.is_ended = True
-    g.previous_winners = winner_ids
-    g.save()
+    if g is None:
+        return
+
+    await BOT_GLOBAL.cache_profile.members_ready.wait()
+    eligible = await collect_entrants(message.reactions[0], g._id, guild)
+
+    winner_ids = random.sample(eligible, min(winners, len(eligible)))
+    mentions = [f"<@{user_id}>" for user_id in winner_ids]
+
+    Giveaway.objects(_id=g._id).update_one(set__is_ended=True, set__previous_winners=winner_ids)
+    BOT_GLOBAL.dispatch('giveaway_end', message.id)
 
     await message.edit(embed=embed)
     await message.clear_reactions()
@@ -359,10 +728,31 @@ async def end_giveaway(channel_id: int, message_id: int, winners: int) -> None:
         await channel.send(f"No winner was selected for the giveaway of **{g.name}** because nobody entered.")
         return
 
-    if winners == 1:
+    if len(mentions) == 1:
         await channel.send(f"Congratulations {mentions[0]}! You won the giveaway of **{g.name}**! Please DM or contact <@{g.sponsor}> to collect.")
     else:
         await channel.send(f"Congratulations {', '.join(mentions)}! You won the giveaway of **{g.name}**! Please DM or contact <@{g.sponsor}> to collect.")
 
 async def remove_raid_phrase(phrase: str):
-    await BOT_GLOBAL.settings.remove_raid_phrase(phrase)
\ No newline at end of file
+    await BOT_GLOBAL.settings.remove_raid_phrase(phrase)
+
+async def prune_message_archive():
+    """Remove messages past their retention from the message archive, and schedule the next prune
+    """
+
+    try:
+        removed = await BOT_GLOBAL.settings.message_archive.prune()
+        if removed:
+            print(f"Pruned {removed} old messages from the message archive")
+    finally:
+        BOT_GLOBAL.settings.tasks.schedule_prune_message_archive(datetime.now() + PRUNE_INTERVAL)
+
+
+HANDLERS = {
+    "unmute": remove_mute,
+    "remind": remind,
+    "remove_bday": remove_bday,
+    "end_giveaway": end_giveaway,
+    "remove_raid_phrase": remove_raid_phrase,
+    "prune_message_archive": prune_message_archive,
+}
@@ -0,0 +1,124 @@
+import asyncio
+import functools
+
+from expiringdict import ExpiringDict
+
+# how many Lavalink searches we run at the same time when resolving a playlist
+SEARCH_CONCURRENCY = 5
+
+
+class TrackResolver:
+    """Turns queries and Spotify links into Lavalink tracks without blocking the event loop.
+    Spotify's client is synchronous, so it's called from an executor, and Lavalink searches
+    for the tracks of a playlist run concurrently. Search results are cached for a while,
+    so queueing the same songs over and over doesn't hit YouTube every time.
+
+    Parameters
+    ----------
+    sp : spotipy.Spotify
+        The Spotify client
+    concurrency : int, optional
+        Maximum amount of Lavalink searches running at the same time, by default SEARCH_CONCURRENCY
+    """
+
+    def __init__(self, sp, concurrency: int = SEARCH_CONCURRENCY):
+        self.sp = sp
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.cache = ExpiringDict(max_len=500, max_age_seconds=3600)
+
+    async def _spotify(self, func, *args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+    @staticmethod
+    def search_query(track: dict) -> str:
+        return f"ytsearch:{track['name']} - {track['artists'][0]['name']}"
+
+    async def spotify_track(self, url: str) -> str:
+        """Get the YouTube search query for a Spotify track
+
+        Parameters
+        ----------
+        url : str
+            Spotify URL or URI of the track
+
+        Returns
+        -------
+        str
+            The query to give to Lavalink
+        """
+
+        track = await self._spotify(self.sp.track, url)
+        return self.search_query(track)
+
+    async def spotify_playlist(self, url: str) -> tuple:
+        """Get the YouTube search queries for every track of a Spotify playlist
+
+        Parameters
+        ----------
+        url : str
+            Spotify URL or URI of the playlist
+
+        Returns
+        -------
+        tuple
+            (name of the playlist, list of queries in playlist order)
+        """
+
+        playlist = await self._spotify(self.sp.playlist, url, fields='name,tracks.items.track.name,tracks.items.track.artists')
+        queries = [self.search_query(item['track']) for item in playlist['tracks']['items'] if item.get('track')]
+        return playlist['name'], queries
+
+    async def get_tracks(self, node, query: str) -> dict:
+        """Search Lavalink, or return the cached results of an earlier search
+
+        Parameters
+        ----------
+        node : lavalink.Node
+            The node to search with
+        query : str
+            The query, a URL or ytsearch:/scsearch: search
+
+        Returns
+        -------
+        dict
+            Lavalink's results, or None if it gave an invalid response
+        """
+
+        results = self.cache.get(query)
+        if results is not None:
+            return results
+
+        async with self.semaphore:
+            results = await node.get_tracks(query)
+
+        if results and results.get('tracks'):
+            self.cache[query] = results
+        return results
+
+    async def resolve(self, node, queries: list):
+        """Search for a list of queries concurrently, yielding the first track found for each
+        in the order of the list as soon as it and everything before it is resolved.
+        Queries without any results are skipped.
+
+        Parameters
+        ----------
+        node : lavalink.Node
+            The node to search with
+        queries : list
+            The queries to search for
+        """
+
+        searches = [asyncio.ensure_future(self.get_tracks(node, query)) for query in queries]
+        try:
+            for search in searches:
+                try:
+                    results = await search
+                except Exception:
+                    continue
+
+                if results and results.get('tracks'):
+                    yield results['tracks'][0]
+        finally:
+            for search in searches:
+                search.cancel()
@@ -0,0 +1,12 @@
+import mongoengine
+
+class CaseLog(mongoengine.Document):
+    case_id    = mongoengine.IntField(required=True)
+    channel_id = mongoengine.IntField(required=True)
+    message_id = mongoengine.IntField(required=True)
+
+    meta = {
+        'db_alias': 'default',
+        'collection': 'case_logs',
+        'indexes': [{'fields': ['case_id', 'channel_id'], 'unique': True}]
+    }
@@ -1,10 +0,0 @@
-import mongoengine
-from data.case import Case
-
-class Cases(mongoengine.Document):
-    _id   = mongoengine.IntField(required=True)
-    cases = mongoengine.EmbeddedDocumentListField(Case, default=[])
-    meta = {
-        'db_alias': 'default',
-        'collection': 'cases'
-    }
\ No newline at end of file
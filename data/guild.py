@@ -1,6 +1,5 @@
 import mongoengine
-from data.filterword import FilterWord
-from data.tag import Tag
+from data.raidphrase import RaidPhrase
 
 class Guild(mongoengine.Document):
     _id                       = mongoengine.IntField(required=True)
@@ -37,16 +36,19 @@ class Guild(mongoengine.Document):
     locked_channels           = mongoengine.ListField(default=[])
     filter_excluded_channels  = mongoengine.ListField(default=[])
     filter_excluded_guilds    = mongoengine.ListField(default=[349243932447604736])
-    filter_words              = mongoengine.EmbeddedDocumentListField(FilterWord, default=[])
-    raid_phrases              = mongoengine.EmbeddedDocumentListField(FilterWord, default=[])
+    raid_phrases              = mongoengine.EmbeddedDocumentListField(RaidPhrase, default=[])
     logging_excluded_channels = mongoengine.ListField(default=[])
     nsa_guild_id              = mongoengine.IntField()
     nsa_mapping               = mongoengine.DictField(default={})
-    tags                      = mongoengine.EmbeddedDocumentListField(Tag, default=[])
     ban_today_spam_accounts   = mongoengine.BooleanField(default=False)
+    # set once the cases embedded in user documents were moved to their own collection
+    cases_migrated            = mongoengine.BooleanField(default=False)
     
     meta = {
         'db_alias': 'default',
-        'collection': 'guilds'
+        'collection': 'guilds',
+        # tags and filter words live in their own collections now, but guilds that
+        # haven't been migrated yet still have them embedded (see !migratecontent)
+        'strict': False
     }
 
@@ -1,7 +1,7 @@
 import mongoengine
 from datetime import datetime
 
-class Tag(mongoengine.EmbeddedDocument):
+class Tag(mongoengine.Document):
     name         = mongoengine.StringField(required=True)
     content      = mongoengine.StringField(required=True)
     added_by_tag = mongoengine.StringField()
@@ -9,3 +9,9 @@ class Tag(mongoengine.EmbeddedDocument):
     added_date   = mongoengine.DateTimeField(default=datetime.now)
     use_count    = mongoengine.IntField(default=0)
     image        = mongoengine.FileField(default=None)
+
+    meta = {
+        'db_alias': 'default',
+        'collection': 'tags',
+        'indexes': ['name']
+    }
@@ -20,5 +20,6 @@ class User(mongoengine.Document):
 
     meta = {
         'db_alias': 'default',
-        'collection': 'users'
+        'collection': 'users',
+        'indexes': ['birthday']
     }
\ No newline at end of file
@@ -15,6 +15,10 @@ from dotenv import find_dotenv, load_dotenv
 from fold_to_ascii import fold
 
 from cogs.monitors.report import Report
+from cogs.utils.cache_profile import CacheProfile
+from cogs.utils.image_ingest import ImageIngest
+from cogs.utils.message_cache import MessageCache
+from cogs.utils.startup_profile import StartupProfile
 
 logging.basicConfig(level=logging.INFO)
 
@@ -58,6 +62,9 @@ initial_extensions = [
                     'cogs.commands.misc.activities',
 ]
 
+cache_profile = CacheProfile.from_env()
+startup_profile = StartupProfile.from_env()
+
 intents = discord.Intents.default()
 intents.members = True
 intents.messages = True
@@ -67,11 +74,21 @@ mentions = discord.AllowedMentions(everyone=False, users=True, roles=False)
 class Bot(commands.Bot):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.load_extension('cogs.utils.settings')
+        startup_profile.load_extension(self, 'cogs.utils.settings')
         self.settings = self.get_cog("Settings")
         self.spoiler_filter = r'\|\|(.*?)\|\|'
         self.invite_filter = r'(?:https?://)?discord(?:(?:app)?\.com/invite|\.gg)\/{1,}[a-zA-Z0-9]+/?'
         self.spam_cooldown = commands.CooldownMapping.from_cooldown(2, 10.0, commands.BucketType.user)
+        # compact cache used by the logging and filter monitors, see README for the settings
+        self.message_cache = MessageCache(
+            max_bytes=int(os.environ.get("BOTTY_MESSAGE_CACHE_MB", 64)) * 1024 * 1024,
+            channel_quota=int(os.environ.get("BOTTY_MESSAGE_CACHE_CHANNEL_QUOTA", 5000)))
+        # shared by every cog that downloads images people send us
+        self.image_ingest = ImageIngest(cache_bytes=int(os.environ.get("BOTTY_IMAGE_CACHE_MB", 16)) * 1024 * 1024)
+
+    async def close(self):
+        await self.image_ingest.close()
+        await super().close()
     
     async def on_message(self, message):
         if message.author.bot:
@@ -123,7 +140,7 @@ class Bot(commands.Bot):
         
         if folded_message:
             reported = False
-            for word in guild.filter_words:
+            for word in self.settings.filter_words():
                 if not self.settings.permissions.hasAtLeast(message.guild, message.author, word.bypass):
                     if (word.word.lower() in folded_message) or \
                         (not word.false_positive and word.word.lower() in folded_without_spaces) or \
@@ -274,7 +291,8 @@ class Bot(commands.Bot):
         if public_chan:
             log.remove_author()
             log.set_thumbnail(url=user.avatar_url)
-            await public_chan.send(embed=log)
+            message = await public_chan.send(embed=log)
+            await self.settings.index_case_log(case._id, message)
 
         try:
             await user.send(f"You have been muted in {ctx.guild.name}", embed=log)
@@ -290,9 +308,15 @@ class Bot(commands.Bot):
             await self.mute(ctx, message.author)
 
 
+# discord.py's own cache is only needed for reaction and bulk delete events now,
+# everything else goes through bot.message_cache
 bot = Bot(command_prefix=get_prefix,
-                   intents=intents, allowed_mentions=mentions)
-bot.max_messages = 10000
+                   intents=intents, allowed_mentions=mentions,
+                   max_messages=int(os.environ.get("BOTTY_MAX_MESSAGES", 1000)),
+                   **cache_profile.client_options())
+bot.cache_profile = cache_profile
+bot.startup_profile = startup_profile
+cache_profile.install(bot)
 
 # Here we load our extensions(cogs) listed above in [initial_extensions].
 if __name__ == '__main__':
@@ -300,17 +324,21 @@ if __name__ == '__main__':
     bot.remove_command("help")
     bot.report = Report(bot)
     for extension in initial_extensions:
-        bot.load_extension(extension)
+        startup_profile.load_extension(bot, extension)
 
 
 async def run_once_when_ready():
     await bot.wait_until_ready()
+    # before anything reads cases, tags or filter words
+    await bot.settings.migrate()
 
     print(
         f'\n\nLogged in as: {bot.user.name} - {bot.user.id}\nVersion: {discord.__version__}\n')
-    bot.load_extension('cogs.commands.misc.music')
+    await bot.cache_profile.on_ready(bot)
+    startup_profile.load_extension(bot, 'cogs.commands.misc.music')
     await bot.settings.load_tasks()
     print(f'Successfully logged in and booted...!')
+    startup_profile.report()
 
 
 bot.loop.create_task(run_once_when_ready())
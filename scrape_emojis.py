@@ -1,32 +1,195 @@
-import aiohttp
-from bs4 import BeautifulSoup
+import argparse
 import asyncio
+import base64
+import binascii
+import codecs
 import json
+import os
+import time
+from html.parser import HTMLParser
+
+from cogs.utils.emoji_pack import EmojiPack, write_pack
+
+URL = 'https://unicode.org/emoji/charts/full-emoji-list.html'
+PACK = 'emojis.pack'
+# validators of the page the pack was built from, so the next run can ask if it changed
+META = 'emojis.pack.json'
+PNG_MAGIC = b'\x89PNG\r\n\x1a\n'
+DATA_URI = 'data:image/png;base64,'
+CHUNK_SIZE = 64 * 1024
+
+
+class EmojiChartParser(HTMLParser):
+    """Reads the emoji chart as it streams in, keeping only the row it's in the middle of.
+    Every cell is either the src of its first image or its text, like the columns of the chart:
+    number, code points, the emoji itself, then the image of each vendor, Apple first.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.emojis = {}
+        self.row = None
+        self.cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'tr':
+            self.row = []
+        elif tag == 'td' and self.row is not None:
+            self.cell = []
+        elif tag == 'img' and self.cell is not None and not isinstance(self.cell, str):
+            self.cell = dict(attrs).get('src') or ''
+
+    def handle_data(self, data):
+        if isinstance(self.cell, list):
+            self.cell.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == 'td' and self.cell is not None:
+            self.row.append(self.cell if isinstance(self.cell, str) else ''.join(self.cell))
+            self.cell = None
+        elif tag == 'tr' and self.row is not None:
+            self.add_row(self.row)
+            self.row = None
+
+    def add_row(self, row):
+        if len(row) <= 4 or not row[3].startswith(DATA_URI):
+            # headers, and emojis Apple has no image for
+            return
+
+        try:
+            png = base64.b64decode(row[3][len(DATA_URI):].replace('…', '').strip(), validate=True)
+        except binascii.Error:
+            return
+        if png.startswith(PNG_MAGIC):
+            self.emojis[row[2]] = png
+
+
+def load_meta():
+    if not os.path.exists(PACK):
+        # validators are useless without the pack they describe
+        return {}
+    try:
+        with open(META) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+
+def save_meta(meta):
+    tmp = f'{META}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp, META)
+
+
+def load_pack():
+    try:
+        pack = EmojiPack(PACK)
+    except (IOError, ValueError):
+        return {}
+
+    emojis = {emoji: pack.get(emoji) for emoji in pack}
+    pack.close()
+    return emojis
+
+
+async def fetch(parser):
+    """Stream the chart into the parser, asking the server to skip it if it hasn't changed
+    since the last run.
+
+    Returns
+    -------
+    dict
+        The validators of the new page, or None if the pack is already up to date
+    """
+
+    # only needed to download the chart, parsing a saved copy works without it
+    import aiohttp
+
+    meta = load_meta()
+    headers = {}
+    if meta.get('etag'):
+        headers['If-None-Match'] = meta['etag']
+    if meta.get('last_modified'):
+        headers['If-Modified-Since'] = meta['last_modified']
 
-async def emoji_thing():
-    emojis = None
     async with aiohttp.ClientSession() as client:
-        async with client.get('https://unicode.org/emoji/charts/full-emoji-list.html') as resp:
+        async with client.get(URL, headers=headers) as resp:
+            if resp.status == 304:
+                return None
             assert resp.status == 200
-            soup = BeautifulSoup(await resp.text(), 'html.parser')
-            tables = [
-                [
-                    [td.find('img')['src'] if td.find('img') is not None else td.get_text(strip=False) for td in tr.find_all('td')] 
-                    for tr in table.find_all('tr')
-                ] 
-                for table in soup.find_all('table')
-            ]
-            emojis = {}
-            for table in tables:
-                for row in table:
-                    if len(row) > 4:
-                        moji = row[3].replace('…', '').strip()
-                        emojis[row[2]] = moji.replace('data:image/png;base64,', '')
-                        
-    if emojis:
-        with open('emojis.json', 'w') as f:
-            f.write(json.dumps(emojis))
+
+            # chunks can end in the middle of a character
+            decoder = codecs.getincrementaldecoder(resp.get_encoding())()
+            async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                parser.feed(decoder.decode(chunk))
+            parser.feed(decoder.decode(b'', final=True))
+            parser.close()
+
+            return {'etag': resp.headers.get('ETag'), 'last_modified': resp.headers.get('Last-Modified')}
+
+
+def parse_file(parser, path):
+    with open(path, encoding='utf-8') as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            parser.feed(chunk)
+    parser.close()
+
+
+def update_pack(emojis):
+    """Write the scraped emojis to the pack, unless none of them changed.
+
+    Returns
+    -------
+    tuple
+        (added, changed, removed) emoji counts
+    """
+
+    old = load_pack()
+    added = sum(1 for emoji in emojis if emoji not in old)
+    changed = sum(1 for emoji, png in emojis.items() if emoji in old and old[emoji] != png)
+    removed = sum(1 for emoji in old if emoji not in emojis)
+
+    if added or changed or removed:
+        write_pack(PACK, emojis)
+    return added, changed, removed
+
+
+async def emoji_thing(path=None, benchmark=False):
+    parser = EmojiChartParser()
+    start = time.perf_counter()
+
+    if path is None:
+        meta = await fetch(parser)
+        if meta is None:
+            print(f'{PACK} is up to date')
+            return
+    else:
+        meta = None
+        parse_file(parser, path)
+
+    parsed = time.perf_counter()
+    if not parser.emojis:
+        print('No emojis found, keeping the current pack')
+        return
+
+    added, changed, removed = update_pack(parser.emojis)
+    if meta is not None:
+        save_meta(meta)
+
+    print(f'{len(parser.emojis)} emojis: {added} added, {changed} changed, {removed} removed')
+    if benchmark:
+        print(f'Parsed in {parsed - start:.2f}s, wrote the pack in {time.perf_counter() - parsed:.2f}s')
+
 
 if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description='Build emojis.pack from the Unicode emoji chart')
+    argparser.add_argument('--file', help='parse a saved copy of full-emoji-list.html instead of downloading it')
+    argparser.add_argument('--benchmark', action='store_true', help='print how long parsing and writing took')
+    args = argparser.parse_args()
+
     loop = asyncio.get_event_loop()
-    loop.run_until_complete(emoji_thing())
\ No newline at end of file
+    loop.run_until_complete(emoji_thing(args.file, args.benchmark))
@@ -0,0 +1,83 @@
+import asyncio
+import unittest
+
+import discord
+from discord.abc import GuildChannel, _Overwrites
+
+from cogs.utils.lockdown import Lockdown
+
+GUILD_ID = 1
+MEMBERPLUS_ID = 2
+CACHED_MEMBER_ID = 3
+UNCACHED_MEMBER_ID = 4
+
+
+class FakeGuild:
+    def __init__(self):
+        self.default_role = discord.Object(id=GUILD_ID)
+        self.roles = {GUILD_ID: self.default_role, MEMBERPLUS_ID: discord.Object(id=MEMBERPLUS_ID)}
+        self.members = {CACHED_MEMBER_ID: discord.Object(id=CACHED_MEMBER_ID)}
+
+    def get_role(self, role_id):
+        return self.roles.get(role_id)
+
+    def get_member(self, member_id):
+        return self.members.get(member_id)
+
+
+class FakeChannel:
+    def __init__(self, guild, overwrites):
+        self.guild = guild
+        self._overwrites = [_Overwrites(id=id, type=type, allow_new=allow, deny_new=deny)
+                            for id, type, allow, deny in overwrites]
+        self.edits = []
+
+    def overwrites_for(self, obj):
+        return GuildChannel.overwrites_for(self, obj)
+
+    async def edit(self, **options):
+        self.edits.append(options)
+
+
+class FakeSettings:
+    role_memberplus = MEMBERPLUS_ID
+
+
+class LockdownTest(unittest.TestCase):
+    def setUp(self):
+        self.guild = FakeGuild()
+        self.lockdown = Lockdown(self.guild, FakeSettings())
+
+    def test_keeps_overwrites_of_uncached_members(self):
+        read_messages = discord.Permissions(read_messages=True).value
+        channel = FakeChannel(self.guild, [
+            (GUILD_ID, "role", 0, 0),
+            (CACHED_MEMBER_ID, "member", read_messages, 0),
+            (UNCACHED_MEMBER_ID, "member", 0, read_messages),
+        ])
+
+        result = asyncio.run(self.lockdown.apply(channel, True))
+
+        self.assertTrue(result.changed)
+        overwrites = {target.id: overwrite for target, overwrite in channel.edits[0]["overwrites"].items()}
+        self.assertEqual(set(overwrites), {GUILD_ID, MEMBERPLUS_ID, CACHED_MEMBER_ID, UNCACHED_MEMBER_ID})
+        self.assertIs(overwrites[GUILD_ID].send_messages, False)
+        self.assertIs(overwrites[MEMBERPLUS_ID].send_messages, True)
+        self.assertIs(overwrites[CACHED_MEMBER_ID].read_messages, True)
+        self.assertIs(overwrites[UNCACHED_MEMBER_ID].read_messages, False)
+
+    def test_drops_overwrites_of_deleted_roles(self):
+        channel = FakeChannel(self.guild, [(99, "role", 0, 0)])
+
+        overwrites = self.lockdown.overwrites(channel, True)
+
+        self.assertEqual({target.id for target in overwrites}, {GUILD_ID, MEMBERPLUS_ID})
+
+    def test_already_locked(self):
+        channel = FakeChannel(self.guild, [(GUILD_ID, "role", 0, discord.Permissions(send_messages=True).value)])
+
+        self.assertIsNone(self.lockdown.overwrites(channel, True))
+
+
+if __name__ == "__main__":
+    unittest.main()
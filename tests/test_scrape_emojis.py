@@ -0,0 +1,92 @@
+import base64
+import os
+import tempfile
+import time
+import unittest
+
+import scrape_emojis
+from cogs.utils.emoji_pack import EmojiPack
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "full-emoji-list.html")
+
+
+def read_fixture():
+    with open(FIXTURE, encoding="utf-8") as f:
+        return f.read()
+
+
+def parse(html, chunk_size):
+    parser = scrape_emojis.EmojiChartParser()
+    for i in range(0, len(html), chunk_size):
+        parser.feed(html[i:i + chunk_size])
+    parser.close()
+    return parser.emojis
+
+
+class EmojiChartParserTest(unittest.TestCase):
+    def test_parses_fixture(self):
+        emojis = parse(read_fixture(), len(read_fixture()))
+
+        self.assertEqual(list(emojis), ["😀", "😃", "👨‍👩‍👧", "👍🏽"])
+        for png in emojis.values():
+            self.assertTrue(png.startswith(scrape_emojis.PNG_MAGIC))
+        # the fixture's images end with a tag so we can tell them apart
+        self.assertTrue(emojis["👨‍👩‍👧"].endswith(b"family"))
+
+    def test_skips_emojis_without_apple_image(self):
+        self.assertNotIn("🫠", parse(read_fixture(), 4096))
+
+    def test_same_result_in_any_chunk_size(self):
+        html = read_fixture()
+        expected = parse(html, len(html))
+        # small chunks split tags, attributes and the base64 of the images
+        for chunk_size in (1, 7, 64, 1000):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(parse(html, chunk_size), expected)
+
+    def test_benchmark(self):
+        # the real chart has a few thousand rows, so repeat the fixture's rows until we have as many
+        html = read_fixture()
+        rows = [line for line in html.splitlines() if line.startswith("<tr><td")]
+        body = "\n".join(row.replace("<td class='chars'>", f"<td class='chars'>{i}:") for i, row in enumerate(rows * 1000))
+        document = f"<html><body><table>\n{body}\n</table></body></html>"
+
+        start = time.perf_counter()
+        emojis = parse(document, scrape_emojis.CHUNK_SIZE)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(len(emojis), 4000)
+        print(f"\nParsed {len(rows) * 1000} rows ({len(document) // 1000}KB) in {elapsed:.2f}s")
+
+
+class UpdatePackTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_only_rewrites_when_something_changed(self):
+        emojis = parse(read_fixture(), 4096)
+        self.assertEqual(scrape_emojis.update_pack(emojis), (4, 0, 0))
+        written = os.stat(scrape_emojis.PACK).st_mtime_ns
+
+        self.assertEqual(scrape_emojis.update_pack(emojis), (0, 0, 0))
+        self.assertEqual(os.stat(scrape_emojis.PACK).st_mtime_ns, written)
+
+        emojis = dict(emojis)
+        emojis["😀"] = scrape_emojis.PNG_MAGIC + b"new"
+        del emojis["😃"]
+        self.assertEqual(scrape_emojis.update_pack(emojis), (0, 1, 1))
+
+        pack = EmojiPack(scrape_emojis.PACK)
+        self.assertEqual(pack.get("😀"), scrape_emojis.PNG_MAGIC + b"new")
+        self.assertIsNone(pack.get("😃"))
+        pack.close()
+
+
+if __name__ == "__main__":
+    unittest.main()